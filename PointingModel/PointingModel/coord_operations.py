@@ -3,8 +3,10 @@ import numpy as np
 
 import matplotlib.pyplot as plt
 
+from observatory import WALTZ
+
 #Define Latitude in radians
-lat=radians(49.3978620896919)
+lat=WALTZ.lat
 
 #Define hoirzontal limit in altitude in degree 
 horizon_limit=12
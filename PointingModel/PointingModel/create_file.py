@@ -1,18 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import hipparcos
 from skyfield.api import utc
-from skyfield.api import Star, load
-from skyfield.api import Topos
 import numpy as np
 from datetime import datetime
 import pathlib
 import sidereal
-import math
 import matplotlib.pyplot as plt
 import csv
 
 from coord_operations import calculate_apparent_pos_from_true_pos
+from hip_position_func import get_observer, hip_positions
+from observatory import WALTZ
 
 ###Content of ReadingFile, otheriwese problems at importing at fit_pointing_term2
 
@@ -94,24 +92,17 @@ LST_float=LSThour+LSTmin/60.+LSTsec/3600.
 
 ###Actual Content of check_pointing_new.py
 
-#load list of planets and specify to earth to get obersver, then specify to location of Waltz
-planets=load('de421.bsp')
-earth=planets['earth']
-waltz=earth+Topos('49.3978620896919 N','8.724700212478638 E', elevation_m=562.0 )
-
-
-ts= load.timescale()
-t=ts.now()
+#Shared observer context (ephemeris, timescale and location of Waltz)
+observer=get_observer()
+ts=observer.ts
 
 
 ###Compute UTC times of observations###
 #Longitude in radian
-elong=8.724700212478638/360*2*math.pi
-
-julian_dates=np.array([])
-ra_calc_topo=np.zeros(len(LST_float))
-dec_calc_topo=np.zeros(len(LST_float))
+elong=WALTZ.longitude_rad
 
+#UTC times of all observations
+utc_times=[]
 
 for index in range(len(LST_float)):
     #SiderealTime doesn't seem to work with numpy. 
@@ -122,30 +113,15 @@ for index in range(len(LST_float)):
     UTC=GST.utc(Date[index])
     #Give UTC the timezoneinfo=utc, important for skyfield utc
     UTC = UTC.replace(tzinfo=utc)
+    utc_times.append(UTC)
     
-    #create a skyfield utc time
-    t=ts.utc(UTC)
-    
-    #Build array julian_dates with observing times as julian dates
-    julian_dates=np.append(julian_dates,t)
+#create one skyfield utc time array with all observing times
+julian_dates=ts.utc(utc_times)
 
-    #Load star from hipparcos.py
-    stars=hipparcos.get(HIPnr[index])
-    print(index)
-    
-    #Compute astrometric and apparent coordinates for Waltz at time t 
-    astrometric= waltz.at(t).observe(stars)
-    apparent= astrometric.apparent()
-    
-    #Calculate topocentric place 
-    #(From apparent coordinates account for diurnal abberation but not for refraction)
-    ra,dec,distance =apparent.radec(epoch='date')
-    
-    #RA,DEC,Dist of refraction corrected positions
-    
-    #ra_calc and dec_calc contain all the info needed for the pointing model
-    ra_calc_topo[index]=ra.hours
-    dec_calc_topo[index]=dec.degrees
+#Compute topocentric places of all stars in one vectorized call
+#(From apparent coordinates account for diurnal abberation but not for refraction)
+#ra_calc and dec_calc contain all the info needed for the pointing model
+ra_calc_topo,dec_calc_topo=hip_positions(HIPnr,julian_dates)[2:]
     
 #Compute hour angles, it should be in the interval [-12,12]
 ha_obs=LST_float-ra_obs
@@ -4,6 +4,7 @@ np.set_printoptions(threshold=np.inf)
 import math
 import pathlib
 
+from observatory import WALTZ
 
 def reading_in_data(refr_corr=True):
     """Reads in Pointing data from file.
@@ -898,7 +899,8 @@ def apply_DLIN(dec_corr_first, dec_corr_first_error,
 def apply_TF(ha_corr_first, ha_corr_first_error,
              dec_corr_first, dec_corr_first_error,
              ha_diff_corr, ha_diff_corr_error,
-             dec_diff_corr, dec_diff_corr_error):
+             dec_diff_corr, dec_diff_corr_error,
+             site=WALTZ):
     """Calculates TF correction.
        According to formulas ha_diff=-TF*cos(phi)*sin(ha)*1/cos(dec)
                              dec_diff=-TF*(cos(phi)*cos(ha)*sin(dec)
@@ -912,6 +914,7 @@ def apply_TF(ha_corr_first, ha_corr_first_error,
               (Index corrected calculated hour angle differences with errors)
               dec_diff_corr, dec_diff_corr_error:
               (Index corrected calculated declination differences with errors)
+              site: Site of the telescope (default WALTZ)
          
        Output: ha_corr, ha_corr_error:
                (NP corrected hour angles with errors)
@@ -927,51 +930,35 @@ def apply_TF(ha_corr_first, ha_corr_first_error,
     #We calculate  TF in degree. 
     #For that reason we introduce a factor of 15 
     #in all calculations with hour angles
-    #It would look nicer 
-    #if we would make this calculation just once in the beginning
-    
-    #Define site's latitude
-    phi=49.3978620896919
     
-    sxxh = sum((np.cos(np.radians(phi))*
-                np.sin(np.radians(ha_corr_first*15.))*
-                1/np.cos(np.radians(dec_corr_first)))**2*
-                1/(ha_diff_corr_error*15.)**2)
-    sxyh = sum(ha_diff_corr*15*
-               np.cos(np.radians(phi))*
-               np.sin(np.radians(ha_corr_first*15.))*
-               1/np.cos(np.radians(dec_corr_first))*
-               1/(ha_diff_corr_error*15.)**2)
-    
-    sxxd = sum((np.cos(np.radians(phi))*
-               np.cos(np.radians(ha_corr_first*15.))*
-               np.sin(np.radians(dec_corr_first))-
-               np.sin(np.radians(phi))*
-               np.cos(np.radians(dec_corr_first)))**2*
-               1/(dec_diff_corr_error)**2)
-    sxyd = sum(dec_diff_corr*
-               (np.cos(np.radians(phi))*
-               np.cos(np.radians(ha_corr_first*15.))*
-               np.sin(np.radians(dec_corr_first))-
-               np.sin(np.radians(phi))*
-               np.cos(np.radians(dec_corr_first)))*
-               1/(dec_diff_corr_error)**2)
+    #Trigonometric terms of site's latitude and of all stars
+    #are computed once and shared by all sums below
+    cos_phi=site.cos_lat
+    sin_phi=site.sin_lat
+    ha_rad=np.radians(ha_corr_first*15.)
+    dec_rad=np.radians(dec_corr_first)
+    sin_ha=np.sin(ha_rad)
+    cos_ha=np.cos(ha_rad)
+    sin_dec=np.sin(dec_rad)
+    cos_dec=np.cos(dec_rad)
+    #ha_diff=-TF*x_h, dec_diff=-TF*x_d
+    x_h=cos_phi*sin_ha*1/cos_dec
+    x_d=cos_phi*cos_ha*sin_dec-sin_phi*cos_dec
+    #Weights
+    w_h=1/(ha_diff_corr_error*15.)**2
+    w_d=1/(dec_diff_corr_error)**2
+    
+    sxxh = sum(x_h**2*w_h)
+    sxyh = sum(ha_diff_corr*15*x_h*w_h)
+    
+    sxxd = sum(x_d**2*w_d)
+    sxyd = sum(dec_diff_corr*x_d*w_d)
 
     TF= -(sxyh+sxyd)/(sxxh+sxxd)
     
     #Calculating chi^2 for ha and dec seperately
-    chi_2_h=np.sum((ha_diff_corr+
-                     TF*(np.cos(np.radians(phi))*
-                         np.sin(np.radians(ha_corr_first*15.))*
-                         1/np.cos(np.radians(dec_corr_first)))
-                     /ha_diff_corr_error)**2)
-    chi_2_d=np.sum((dec_diff_corr+
-                    TF*(np.cos(np.radians(phi))*
-                        np.cos(np.radians(ha_corr_first*15.))*
-                        np.sin(np.radians(dec_corr_first))-
-                        np.sin(np.radians(phi))*
-                        np.cos(np.radians(dec_corr_first)))
-                    /dec_diff_corr_error)**2)
+    chi_2_h=np.sum((ha_diff_corr+TF*x_h/ha_diff_corr_error)**2)
+    chi_2_d=np.sum((dec_diff_corr+TF*x_d/dec_diff_corr_error)**2)
     #Now we can add these up
     chi_2=chi_2_h+chi_2_d
     #Calculating Degrees of freedom (we have one parameter (NP))
@@ -981,19 +968,11 @@ def apply_TF(ha_corr_first, ha_corr_first_error,
     chi_2_red=chi_2/deg_free
     
     #For calculating the error    
-    sh=sum(1/(ha_diff_corr_error*15.)**2)
-    sxh=sum(np.cos(np.radians(phi))*
-            np.sin(np.radians(ha_corr_first*15.))*
-            1/np.cos(np.radians(dec_corr_first))/
-            (ha_diff_corr_error*15.)**2)
+    sh=sum(w_h)
+    sxh=sum(x_h*w_h)
         
-    sd=sum(1/(dec_diff_corr_error)**2)
-    sxd=sum((np.cos(np.radians(phi))*
-             np.cos(np.radians(ha_corr_first*15.))*
-             np.sin(np.radians(dec_corr_first))-
-             np.sin(np.radians(phi))*
-             np.cos(np.radians(dec_corr_first)))
-             /(dec_diff_corr_error)**2)
+    sd=sum(w_d)
+    sxd=sum(x_d*w_d)
         
     s=sh+sd
     sx=sxh+sxd
@@ -1004,17 +983,9 @@ def apply_TF(ha_corr_first, ha_corr_first_error,
     TF_error=s/Delta
     
     #Calculate correction arrays
-    TF_correction_ha = (-TF/15.*
-                        np.cos(np.radians(phi))*
-                        np.sin(np.radians(ha_corr_first*15.))*
-                        1/np.cos(np.radians(dec_corr_first)))
+    TF_correction_ha = -TF/15.*x_h
     
-    TF_correction_dec = (-TF*
-                         (np.cos(np.radians(phi))*
-                          np.cos(np.radians(ha_corr_first*15.))*
-                          np.sin(np.radians(dec_corr_first))-
-                          np.sin(np.radians(phi))*
-                          np.cos(np.radians(dec_corr_first))))
+    TF_correction_dec = -TF*x_d
                
     #Calculate corrected HA and DEC and their errors
         
@@ -1023,36 +994,20 @@ def apply_TF(ha_corr_first, ha_corr_first_error,
     
         
     ha_corr_error=np.sqrt(ha_corr_first_error**2+
-                          (np.cos(np.radians(phi))*
-                           np.sin(np.radians(ha_corr_first*15.))*
-                           1/np.cos(np.radians(dec_corr_first))*
-                           TF_error/15.)**2+
-                          (TF/15.*np.cos(np.radians(phi))*
-                           np.sin(np.radians(ha_corr_first*15.))*
-                           1/np.cos(np.radians(dec_corr_first))*
-                           ha_corr_first_error)**2+
-                          (TF/15.*np.cos(np.radians(phi))*
-                           np.cos(np.radians(ha_corr_first*15.))*
-                           1/np.cos(np.radians(dec_corr_first))*
-                           np.tan(np.radians(dec_corr_first))*
+                          (x_h*TF_error/15.)**2+
+                          (TF/15.*x_h*ha_corr_first_error)**2+
+                          (TF/15.*cos_phi*cos_ha*1/cos_dec*
+                           np.tan(dec_rad)*
                            dec_corr_first_error/15.)**2)
                           
-    term=(np.cos(np.radians(phi))*
-          np.cos(np.radians(ha_corr_first*15.))*
-          np.sin(np.radians(dec_corr_first))-
-          np.sin(np.radians(phi))*
-          np.cos(np.radians(dec_corr_first)))
+    term=x_d
         
     dec_corr_error=np.sqrt((dec_corr_first_error)**2+
                            (term*TF_error)**2+
-                           (TF*np.sin(np.radians(ha_corr_first*15))*
-                            np.sin(np.radians(dec_corr_first))*
+                           (TF*sin_ha*sin_dec*
                             ha_corr_first_error*15.)**2+
-                           (TF*(np.cos(np.radians(phi))*
-                            np.cos(np.radians(ha_corr_first*15))*
-                            np.cos(np.radians(dec_corr_first))-
-                            np.sin(np.radians(phi))*
-                            np.sin(np.radians(dec_corr_first)))*
+                           (TF*(cos_phi*cos_ha*cos_dec-
+                                sin_phi*sin_dec)*
                            dec_corr_first_error)**2
                           )
         
@@ -1,4 +1,3 @@
-import time
 
 import command_line_class 
 # open serial connection
@@ -28,9 +27,7 @@ def main():
             elif command in waltz.command_dic:
                 waltz.execute_command_dic(command)
             else:
-                waltz.write(command.encode('utf-8'))
-                time.sleep(0.1)
-                out = waltz.get_response()
+                out = waltz.query(command.encode('utf-8'))
                 print(">>" + out)
 
 main()
@@ -1,6 +1,6 @@
+import sys
 from tkinter import Tk
 import waltz_GUI_class
-import matplotlib.pyplot as plt
 
 
 def main():
@@ -9,7 +9,9 @@ def main():
     def close_window():
         """Defines which actions to call when window is destroyed.
         """
-        plt.close('all')
+        #Close plots only if matplotlib has been loaded at all
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close('all')
         root.destroy()
     root.protocol("WM_DELETE_WINDOW", close_window)
     root.mainloop() 
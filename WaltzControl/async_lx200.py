@@ -0,0 +1,314 @@
+import asyncio
+import collections
+import os
+import time
+
+import dispatcher as dsp
+from telemetry import MountState
+from lst_engine import get_engine
+from observatory import WALTZ
+from lx200codec import (decode_ra, decode_dec, target_ra_input,
+                        target_dec_input)
+
+#Serial connection of the Waltz controller (see communication_commands)
+default_port=os.environ.get('WALTZ_PORT','/dev/ttyS0')
+default_baudrate=9600
+
+#Reply of MS: '0' or an error message ending with '#'
+#('1Object below limit#', '2No target#')
+SLEW_REPLY=(b'#',1)
+
+def reply_length(buffer, reply):
+    """Returns the length of the reply at the start of buffer
+       (None if it is incomplete).
+
+       reply: (terminator, size) of the reply (see dispatcher.reply_of)
+              or SLEW_REPLY.
+    """
+    terminator,size=reply
+    if reply==SLEW_REPLY:
+        if not buffer:
+            return None
+        if buffer[:1]==b'0':
+            return 1
+        #Error message up to the terminator
+        size=None
+    end=buffer.find(terminator) if terminator else -1
+    if end>=0:
+        return end+len(terminator)
+    if size is not None and len(buffer)>=size:
+        return size
+    return None
+
+def parse_ra(response):
+    """Returns ra in hours as float from a GR response
+       (hh:mm:ss# or hh:mm.t#). Returns None for other responses.
+    """
+    return decode_ra(response)[0]
+
+def parse_dec(response):
+    """Returns dec in degrees as float from a GD response
+       (sdd*mm:ss# or sdd*mm#). Returns None for other responses.
+    """
+    return decode_dec(response)[0]
+
+def format_ra(ra):
+    """Returns LX200 input setting target ra (in hours) as bytes.
+    """
+    return target_ra_input(ra)
+
+def format_dec(dec):
+    """Returns LX200 input setting target dec (in degrees) as bytes.
+    """
+    return target_dec_input(dec)
+
+class AsyncLx200Client:
+    """asyncio client for the LX200 command set of the Waltz controller.
+
+       All commands are awaitable. A single reader task splits the
+       incoming bytes into the replies of the sent commands. Replies are
+       matched to commands in sending order, using the expected reply of
+       each command (see dispatcher.REPLIES).
+
+       Usage:
+           client=await AsyncLx200Client.connect()
+           ra,dec=await client.get_coordinates()
+           async for state in client.positions(0.5):
+               ...
+           await client.close()
+    """
+    def __init__(self, reader, writer, response_timeout=1., site=WALTZ):
+        """reader, writer: asyncio streams of the serial connection.
+           response_timeout: deadline for a single reply in seconds.
+           site: Site of the telescope (for the hour angle).
+        """
+        self.reader=reader
+        self.writer=writer
+        self.response_timeout=response_timeout
+        self.lst_engine=get_engine(site)
+        #Futures of commands waiting for their reply in sending order
+        #(done futures belong to abandoned commands, see query)
+        self._pending=collections.deque()
+        self._buffer=b''
+        #Loop time at which the last bytes arrived
+        self._last_data=asyncio.get_event_loop().time()
+        #Keeps writing and queueing of the reply together
+        self._write_lock=asyncio.Lock()
+        self._reader_task=asyncio.ensure_future(self._read_loop())
+
+    @classmethod
+    async def connect(cls, port=default_port, baudrate=default_baudrate,
+                      **kwargs):
+        """Opens the connection and returns a client.
+
+           port: serial port or socket://host:port.
+           Serial ports need the optional package pyserial-asyncio.
+        """
+        if port.startswith('socket://'):
+            host,_,tcp_port=port[len('socket://'):].rpartition(':')
+            reader,writer=await asyncio.open_connection(host,int(tcp_port))
+        else:
+            try:
+                import serial_asyncio
+            except ImportError:
+                raise ImportError('Serial ports need pyserial-asyncio '
+                                  '(pip install pyserial-asyncio)')
+            reader,writer=await serial_asyncio.open_serial_connection(
+                url=port,baudrate=baudrate)
+        return cls(reader,writer,**kwargs)
+
+    async def close(self):
+        """Stops the reader task and closes the connection.
+        """
+        self._reader_task.cancel()
+        self.writer.close()
+        for reply,future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    async def _read_loop(self):
+        while True:
+            data=await self.reader.read(256)
+            if not data:
+                #Connection closed
+                for reply,future in self._pending:
+                    if not future.done():
+                        future.set_exception(ConnectionError('Connection closed'))
+                self._pending.clear()
+                return
+            self._last_data=asyncio.get_event_loop().time()
+            self._buffer+=data
+            self._dispatch()
+
+    def _dispatch(self):
+        """Completes waiting commands with the replies in the buffer.
+        """
+        while self._pending:
+            reply,future=self._pending[0]
+            end=reply_length(self._buffer,reply)
+            if end is None:
+                return
+            self._pending.popleft()
+            response,self._buffer=self._buffer[:end],self._buffer[end:]
+            if not future.done():
+                future.set_result(response.decode())
+        #Nobody is waiting for these bytes
+        self._buffer=b''
+
+    async def send(self, inp):
+        """Sends inp without waiting for a reply.
+        """
+        async with self._write_lock:
+            self.writer.write(inp)
+            await self.writer.drain()
+
+    async def query(self, inp, reply=False):
+        """Sends inp and returns its reply as string.
+
+           reply: (terminator, size) of the reply
+                  (default from dispatcher.REPLIES).
+           Returns '' if the reply doesn't arrive within response_timeout.
+           Only this command fails then. It stays abandoned in the queue,
+           so its late reply is read and dropped and later commands keep
+           their replies. If no bytes arrive for another response_timeout,
+           its reply is lost and it is removed (see _expire).
+        """
+        if reply is False:
+            if dsp.command_name(inp)==b'MS':
+                reply=SLEW_REPLY
+            else:
+                reply=dsp.reply_of(inp) or (b'#',None)
+        future=asyncio.get_event_loop().create_future()
+        async with self._write_lock:
+            entry=(reply,future)
+            self._pending.append(entry)
+            self.writer.write(inp)
+            await self.writer.drain()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future),
+                                          self.response_timeout)
+        except asyncio.TimeoutError:
+            #The done future marks the command as abandoned
+            future.cancel()
+            asyncio.get_event_loop().call_later(self.response_timeout,
+                                                self._expire,entry)
+            return ''
+
+    def _expire(self, entry):
+        """Removes the abandoned command entry, when its reply is lost.
+
+           The reply is taken as lost, if entry is the oldest command and
+           no bytes have arrived for response_timeout. Otherwise checks
+           again later.
+        """
+        if not any(pending is entry for pending in self._pending):
+            #Its reply has arrived and was dropped
+            return
+        loop=asyncio.get_event_loop()
+        if (self._pending[0] is not entry or
+            loop.time()-self._last_data<self.response_timeout):
+            loop.call_later(self.response_timeout,self._expire,entry)
+            return
+        self._pending.popleft()
+        #Drop the incomplete reply
+        self._buffer=b''
+
+    async def get_coordinates(self):
+        """Returns ra in hours and dec in degrees (None if not readable).
+        """
+        ra=parse_ra(await self.query(b'#:GR#'))
+        dec=parse_dec(await self.query(b'#:GD#'))
+        return ra,dec
+
+    async def get_state(self):
+        """Returns current coordinates as MountState.
+
+           ra and dec are formatted as by telemetry (e.g. 12h34m56s,
+           see lx200codec), unreadable responses are kept without '#'.
+        """
+        ra_float,ra=decode_ra(await self.query(b'#:GR#'))
+        dec_float,dec=decode_dec(await self.query(b'#:GD#'))
+        connected=ra_float is not None and dec_float is not None
+        ha_float=0
+        if ra_float is not None:
+            #Hour angle in range [-12,12]
+            ha_float=(self.lst_engine.hours()-ra_float+12.)%24.-12.
+        return MountState(ra,dec,ra_float or 0,dec_float or 0,ha_float,
+                          time.time(),connected)
+
+    async def positions(self, interval=0.5):
+        """Yields a MountState every interval seconds.
+        """
+        loop=asyncio.get_event_loop()
+        next_poll=loop.time()
+        while True:
+            yield await self.get_state()
+            next_poll+=interval
+            await asyncio.sleep(max(0.,next_poll-loop.time()))
+
+    async def set_target_ra(self, ra):
+        """Sets target ra in hours. Returns True if accepted.
+        """
+        return await self.query(format_ra(ra))=='1'
+
+    async def set_target_dec(self, dec):
+        """Sets target dec in degrees. Returns True if accepted.
+        """
+        return await self.query(format_dec(dec))=='1'
+
+    async def set_target(self, ra, dec):
+        """Sets target ra (hours) and dec (degrees). Returns True if accepted.
+        """
+        return (await self.set_target_ra(ra) and
+                await self.set_target_dec(dec))
+
+    async def slew_to_target(self):
+        """Slews to the target. Returns True if the slew started.
+
+           A refused slew is answered with an error message, which is
+           read completely (see SLEW_REPLY).
+        """
+        return await self.query(b'#:MS#')=='0'
+
+    async def sync(self):
+        """Syncs the mount on the target coordinates.
+           Returns the response of the controller.
+        """
+        return await self.query(b'#:CM#')
+
+    async def start_move(self, direction):
+        """Starts moving in direction 'w', 'e', 'n' or 's'.
+        """
+        await self.send('#:M{}#'.format(direction).encode())
+
+    async def stop_move(self, direction):
+        """Stops moving in direction 'w', 'e', 'n' or 's'.
+        """
+        await self.send('#:Q{}#'.format(direction).encode())
+
+    async def stop_all(self):
+        """Stops all movements (not slews).
+        """
+        for direction in 'wesn':
+            await self.stop_move(direction)
+
+    async def move(self, direction, duration=0.1):
+        """Moves in direction 'w', 'e', 'n' or 's' for duration seconds.
+        """
+        await self.start_move(direction)
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            #Also stop if the move is cancelled
+            await self.stop_move(direction)
+
+    async def set_speed(self, speed):
+        """Sets speed to 'max', 'find', 'center' or 'guide'.
+        """
+        await self.send({'max':b'#:RS#','find':b'#:RM#',
+                         'center':b'#:RC#','guide':b'#:RG#'}[speed])
+
+    async def toggle_precision(self):
+        """Toggles between high and low precision coordinates.
+        """
+        await self.send(b'#:U#')
@@ -0,0 +1,36 @@
+"""Microbenchmark of lx200codec.
+
+   Compares the time per call of the codec with the parsing of
+   Lx200Commands.get_coordinates before the codec was introduced
+   (see tests/lx200_legacy.py):
+
+       python bench_codec.py
+"""
+import timeit
+
+from lx200codec import decode_ra, decode_dec, encode_ra, encode_dec
+from tests.lx200_legacy import legacy_ra, legacy_dec
+
+def bench():
+    """Prints time per call of legacy parsing and codec.
+    """
+    number=100000
+    for name,response,legacy,codec in (
+            ('ra high','12:34:56#',legacy_ra,decode_ra),
+            ('ra low','12:34.5#',legacy_ra,decode_ra),
+            ('dec high','-12*34:56#',legacy_dec,decode_dec),
+            ('dec low','+12*34#',legacy_dec,decode_dec)):
+        old=min(timeit.repeat(lambda: legacy(response),number=number,
+                              repeat=5))/number
+        new=min(timeit.repeat(lambda: codec(response),number=number,
+                              repeat=5))/number
+        print('{:<9} legacy {:6.2f} us  codec {:6.2f} us  speedup {:4.1f}x'
+              .format(name,1e6*old,1e6*new,old/new))
+    for name,function,value in (('encode ra',encode_ra,12.5822),
+                                ('encode dec',encode_dec,-12.5822)):
+        t=min(timeit.repeat(lambda: function(value),number=number,
+                            repeat=5))/number
+        print('{:<10} {:6.2f} us'.format(name,1e6*t))
+
+if __name__=='__main__':
+    bench()
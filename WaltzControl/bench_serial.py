@@ -0,0 +1,338 @@
+"""Serial I/O benchmark of the control stack against the simulated mount.
+
+   Measures with Lx200Commands talking to a mount_simulator:
+       get_coordinates, set_target_coordinates, sync_on_coordinates:
+           round trip latency of single calls
+       polling: rate of back to back get_coordinates calls
+       stop_under_load: time from stop_all until the last stop command
+           reaches the controller, while other threads poll coordinates
+           and set targets through the dispatcher
+       slew_completion: time from the arrival of a slew until the slew
+           tracker reports it (see slew_tracker)
+       refresh_times, display_coordinates: lateness of the GUI ticks
+           (needs a display, skipped otherwise)
+   Prints percentiles and histograms and compares them with the stored
+   baseline (bench_serial_baseline.json). Exits with 1 on a regression:
+
+       python bench_serial.py                     #in-process simulator
+       python bench_serial.py --transport pty     #real serial on a pty
+       python bench_serial.py --save-baseline     #store new baseline
+
+   The simulator emulates the transmission time of the baud rate, so the
+   numbers are comparable between machines and show changes of the
+   transport and the parsers.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pathlib
+import sys
+import threading
+import time
+
+import numpy as np
+
+import mount_simulator as ms
+
+baseline_file=pathlib.Path(__file__).parent/'bench_serial_baseline.json'
+
+#Percentiles reported and compared with the baseline
+percentiles=(50,90,99)
+
+class Samples:
+    """Durations (in seconds) of one metric.
+    """
+    def __init__(self, name):
+        self.name=name
+        self.values=[]
+
+    def add(self, value):
+        self.values.append(value)
+
+    def summary(self):
+        """Returns percentiles (p50, ...) in ms and the number of samples.
+        """
+        values=1000*np.array(self.values)
+        summary={'p{}'.format(q):round(float(np.percentile(values,q)),3)
+                 for q in percentiles}
+        summary['count']=len(values)
+        return summary
+
+    def histogram(self, bins=10, width=40):
+        """Returns text histogram in ms.
+        """
+        counts,edges=np.histogram(1000*np.array(self.values),bins=bins)
+        lines=[]
+        for count,low,high in zip(counts,edges[:-1],edges[1:]):
+            bar='#'*int(round(width*count/max(counts.max(),1)))
+            lines.append('    {:8.2f} - {:8.2f} ms {:6} {}'
+                         .format(low,high,count,bar))
+        return '\n'.join(lines)
+
+def quiet():
+    """Context manager discarding the prints of the commands.
+    """
+    return contextlib.redirect_stdout(io.StringIO())
+
+def observable_target(mount):
+    """Sets target strings at the meridian, which is always observable.
+    """
+    mount.get_LST()
+    ra=mount.LST_float%24.
+    mount.set_target_ra_from_string('{:02d} {:02d} {:02d}'.format(
+        int(ra),int(ra*60)%60,int(ra*3600)%60))
+    mount.set_target_dec_from_string('+40 00 00')
+
+def bench_commands(mount, samples):
+    """Round trip latency of single commands.
+    """
+    results=[]
+    coordinates=Samples('get_coordinates')
+    for i in range(samples):
+        start=time.perf_counter()
+        mount.get_coordinates()
+        coordinates.add(time.perf_counter()-start)
+    results.append(coordinates)
+    target=Samples('set_target_coordinates')
+    sync=Samples('sync_on_coordinates')
+    with quiet():
+        for i in range(samples):
+            observable_target(mount)
+            start=time.perf_counter()
+            mount.set_target_coordinates()
+            target.add(time.perf_counter()-start)
+            start=time.perf_counter()
+            mount.sync_on_coordinates()
+            sync.add(time.perf_counter()-start)
+    return results+[target,sync]
+
+def bench_polling(mount, duration):
+    """Sustained rate of back to back get_coordinates calls.
+       Returns polls per second.
+    """
+    count=0
+    start=time.perf_counter()
+    end=start+duration
+    while time.perf_counter()<end:
+        mount.get_coordinates()
+        count+=1
+    return count/(time.perf_counter()-start)
+
+def bench_stop(mount, simulator, samples):
+    """Latency of stop_all while the dispatcher is busy.
+    """
+    stops=Samples('stop_under_load')
+    arrived=threading.Event()
+    arrival=[0.]
+    def listener(name, received):
+        #Qn is the last command of stop_all
+        if name==b'Qn':
+            arrival[0]=received
+            arrived.set()
+    simulator.listeners.append(listener)
+    mount.start_dispatcher()
+    running=threading.Event()
+    running.set()
+    def poll():
+        while running.is_set():
+            mount.get_coordinates()
+    def set_targets():
+        with quiet():
+            while running.is_set():
+                observable_target(mount)
+                mount.set_target_coordinates()
+    load=[threading.Thread(target=poll,daemon=True) for i in range(2)]
+    load.append(threading.Thread(target=set_targets,daemon=True))
+    for thread in load:
+        thread.start()
+    try:
+        for i in range(samples):
+            #Random phase relative to the running commands
+            time.sleep(0.005+0.02*np.random.random())
+            arrived.clear()
+            start=time.monotonic()
+            mount.stop_all()
+            if not arrived.wait(1.):
+                print('stop_all did not reach the controller')
+                continue
+            stops.add(arrival[0]-start)
+    finally:
+        running.clear()
+        for thread in load:
+            thread.join()
+        mount.stop_dispatcher()
+        simulator.listeners.remove(listener)
+    return stops
+
+def bench_slew(mount, simulator, slews):
+    """Delay of the slew completion detection.
+    """
+    delays=Samples('slew_completion')
+    for i in range(slews):
+        mount.get_coordinates()
+        #Short slews around the current position
+        ra=(mount.ra_float+np.random.uniform(-0.05,0.05))%24.
+        dec=mount.dec_float+np.random.uniform(-1.,1.)
+        with quiet():
+            mount.set_target_ra_from_string('{:02d} {:02d} {:02d}'.format(
+                int(ra),int(ra*60)%60,int(ra*3600)%60))
+            mount.set_target_dec_from_string('{:+03d} {:02d} 00'.format(
+                int(dec),int(abs(dec)*60)%60))
+            mount.send_target_coordinates_to_serial()
+            mount.slew_to_target()
+        tracker=mount.slew_tracker
+        if not tracker.done.wait(30.) or not tracker.finished:
+            print('Slew was not detected')
+            continue
+        delays.add(time.monotonic()-simulator.slew_end)
+    return delays
+
+def bench_gui(duration):
+    """Lateness of the GUI ticks against their nominal interval.
+       Returns list of Samples or None without display.
+    """
+    from tkinter import Tk, TclError
+    try:
+        root=Tk()
+    except TclError:
+        return None
+    import waltz_GUI_class
+
+    class TimedGUI(waltz_GUI_class.WaltzGUI):
+        def __init__(self, master):
+            self.ticks={'refresh_times':[],'display_coordinates':[]}
+            super().__init__(master)
+
+        def refresh_times(self):
+            self.ticks['refresh_times'].append(time.perf_counter())
+            super().refresh_times()
+
+        def display_coordinates(self):
+            self.ticks['display_coordinates'].append(time.perf_counter())
+            super().display_coordinates()
+
+    with quiet():
+        gui=TimedGUI(root)
+        root.after(int(1000*duration),root.quit)
+        root.mainloop()
+        gui.stop_telemetry()
+        gui.stop_dispatcher()
+        root.destroy()
+    results=[]
+    for name,interval in (('refresh_times',0.2),('display_coordinates',0.5)):
+        samples=Samples(name)
+        for lateness in np.diff(gui.ticks[name])-interval:
+            samples.add(lateness)
+        results.append(samples)
+    return results
+
+def compare(name, summary, baseline, tolerance, slack):
+    """Returns list of regressions of summary against its baseline.
+    """
+    regressions=[]
+    for key,reference in baseline.items():
+        if key=='count' or key not in summary:
+            continue
+        if name=='polling':
+            #Higher is better
+            if summary[key]<reference*(1-tolerance):
+                regressions.append('{} {} {:.1f} < baseline {:.1f}'
+                                   .format(name,key,summary[key],reference))
+        elif summary[key]>reference*(1+tolerance)+slack:
+            regressions.append('{} {} {:.2f} ms > baseline {:.2f} ms'
+                               .format(name,key,summary[key],reference))
+    return regressions
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transport',choices=('inprocess','pty'),
+                        default='inprocess')
+    parser.add_argument('--samples',type=int,default=100)
+    parser.add_argument('--duration',type=float,default=3.,
+                        help='seconds of the polling and GUI benchmarks')
+    parser.add_argument('--baudrate',type=int,default=9600)
+    parser.add_argument('--latency',type=float,default=0.002,
+                        help='reply latency of the controller in seconds')
+    parser.add_argument('--drop',type=float,default=0.,
+                        help='probability of losing a reply byte')
+    parser.add_argument('--tolerance',type=float,default=0.5,
+                        help='allowed relative increase against baseline')
+    parser.add_argument('--slack',type=float,default=2.,
+                        help='allowed absolute increase in ms')
+    parser.add_argument('--save-baseline',action='store_true')
+    args=parser.parse_args()
+
+    np.random.seed(1)
+    simulator=ms.MountSimulator(check_limits=False)
+    server=None
+    port=None
+    if args.transport=='pty':
+        server=ms.PtyServer(simulator,args.baudrate,args.latency,args.drop,
+                            seed=1)
+        server.start()
+        port=server.path
+        #Also used by the GUI benchmark
+        os.environ['WALTZ_PORT']=port
+    else:
+        #Must be set before communication_commands is imported
+        os.environ['WALTZ_SIMULATOR']='1'
+    with quiet():
+        import lx200commands
+        mount=lx200commands.Lx200Commands(port=port)
+    if args.transport=='inprocess':
+        mount.simulator=simulator
+        mount.link=ms.Link(args.baudrate,args.latency,args.drop,seed=1)
+
+    results=bench_commands(mount,args.samples)
+    polling=bench_polling(mount,args.duration)
+    results.append(bench_stop(mount,simulator,args.samples))
+    results.append(bench_slew(mount,simulator,max(1,args.samples//10)))
+    gui=bench_gui(args.duration)
+    if gui is None:
+        print('GUI ticks skipped (no display)')
+    else:
+        results.extend(gui)
+    mount.close()
+    if server is not None:
+        server.stop()
+
+    summaries={samples.name:samples.summary() for samples in results
+               if samples.values}
+    summaries['polling']={'rate':round(polling,2)}
+    for samples in results:
+        if not samples.values:
+            continue
+        summary=summaries[samples.name]
+        print('{:<24} n={:<5} '.format(samples.name,summary['count'])+
+              '  '.join('p{} {:7.2f} ms'.format(q,summary['p{}'.format(q)])
+                        for q in percentiles))
+        print(samples.histogram())
+    print('{:<24} {:.1f} polls per second'.format('polling',polling))
+
+    baselines={}
+    if baseline_file.exists():
+        baselines=json.loads(baseline_file.read_text())
+    if args.save_baseline:
+        baselines[args.transport]=summaries
+        baseline_file.write_text(json.dumps(baselines,indent=2,sort_keys=True)
+                                 +'\n')
+        print('Saved baseline to',baseline_file)
+        return 0
+    baseline=baselines.get(args.transport)
+    if baseline is None:
+        print('No baseline for transport',args.transport)
+        return 0
+    regressions=[]
+    for name,summary in summaries.items():
+        if name in baseline:
+            regressions+=compare(name,summary,baseline[name],
+                                 args.tolerance,args.slack)
+    for regression in regressions:
+        print('Regression:',regression)
+    print('{} regressions against baseline'.format(len(regressions)))
+    return 1 if regressions else 0
+
+if __name__=='__main__':
+    sys.exit(main())
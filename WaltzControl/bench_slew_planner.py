@@ -0,0 +1,73 @@
+"""Checks and benchmark of the slew path planner.
+
+   Plans slews between random safe positions, checks with a fine
+   sampling of the expected mount path that every planned leg stays
+   above the limits and that safe direct slews get no waypoints, and
+   prints the time per plan. Exits with 1 on a failed check:
+
+       python bench_slew_planner.py
+"""
+import sys
+import time
+
+import numpy as np
+
+from slew_planner import plan_slew, paths_clear
+from coord_operations import observable
+
+pairs=2000
+#Sampling of the check in degrees (finer than the planner)
+fine_step=0.01
+
+def random_pairs(rng):
+    """Returns start and target (ha, dec) arrays of safe positions.
+    """
+    ha=rng.uniform(-12.,12.,8*pairs)
+    dec=rng.uniform(-40.,90.,8*pairs)
+    safe=observable(ha,dec)
+    ha,dec=ha[safe][:2*pairs],dec[safe][:2*pairs]
+    return (ha[:pairs],dec[:pairs]),(ha[pairs:],dec[pairs:])
+
+def fine_clear(ha, dec, target_ha, target_dec):
+    """paths_clear with fine sampling.
+    """
+    return paths_clear(ha,dec,target_ha,target_dec,step=fine_step)
+
+def main():
+    (ha,dec),(target_ha,target_dec)=random_pairs(np.random.RandomState(1))
+    direct=fine_clear(ha,dec,target_ha,target_dec)
+    errors=[]
+    durations=[]
+    planned=0
+    for i in range(pairs):
+        start=time.perf_counter()
+        waypoints=plan_slew(ha[i],dec[i],target_ha[i],target_dec[i])
+        durations.append(time.perf_counter()-start)
+        if waypoints is None:
+            errors.append(('no path',ha[i],dec[i],target_ha[i],target_dec[i]))
+            continue
+        if direct[i] and waypoints:
+            errors.append(('waypoints for a safe slew',ha[i],dec[i]))
+        if waypoints:
+            planned+=1
+        points=[(ha[i],dec[i])]+waypoints+[(target_ha[i],target_dec[i])]
+        start=np.array(points[:-1])
+        end=np.array(points[1:])
+        if not fine_clear(start[:,0],start[:,1],end[:,0],end[:,1]).all():
+            errors.append(('leg crosses limit',points))
+    for error in errors[:20]:
+        print('Failed:',*error)
+    durations=1000*np.array(durations)
+    blocked=np.flatnonzero(~direct)
+    print('{} of {} direct slews cross the limits, {} planned with waypoints'
+          .format(len(blocked),pairs,planned))
+    print('direct  median {:6.2f} ms'.format(np.median(durations[direct])))
+    if len(blocked):
+        print('blocked median {:6.2f} ms  max {:6.2f} ms'
+              .format(np.median(durations[blocked]),
+                      np.max(durations[blocked])))
+    print('{} failed checks'.format(len(errors)))
+    return 1 if errors else 0
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Import time benchmark of the WaltzControl entry points.
+
+   Imports each entry point module in a fresh interpreter several times
+   and compares the median with its budget. Also checks, that the heavy
+   libraries (astropy, skyfield, matplotlib) are not loaded at startup.
+   Exits with 1 if a budget is exceeded, so it can be used as
+   regression test:
+
+       python bench_startup.py
+"""
+import sys
+import pathlib
+import subprocess
+import statistics
+
+#Entry point module: import time budget in seconds
+budgets={'command_line_class':0.25,
+         'waltz_GUI_class':0.3,
+         'planner':0.25}
+
+#Libraries, which must only be loaded on first use
+lazy_modules=('astropy','skyfield','matplotlib')
+
+repeat=7
+
+probe='''
+import sys, time
+start=time.perf_counter()
+import {module}
+print(time.perf_counter()-start)
+print(' '.join(m for m in {lazy} if m in sys.modules))
+'''
+
+def measure(module):
+    """Returns import times of module in seconds and loaded lazy modules.
+    """
+    times=[]
+    for i in range(repeat):
+        output=subprocess.run([sys.executable,'-c',
+                               probe.format(module=module,lazy=lazy_modules)],
+                              cwd=str(pathlib.Path(__file__).parent),
+                              stdout=subprocess.PIPE,
+                              universal_newlines=True,
+                              check=True).stdout.splitlines()
+        times.append(float(output[-2]))
+        loaded=output[-1].split()
+    return times, loaded
+
+def main():
+    failed=False
+    for module,budget in budgets.items():
+        times,loaded=measure(module)
+        median=statistics.median(times)
+        ok=median<=budget and not loaded
+        failed=failed or not ok
+        print('{:<20} median {:6.1f} ms  min {:6.1f} ms  budget {:6.1f} ms  {}'
+              .format(module,1000*median,1000*min(times),1000*budget,
+                      'ok' if ok else 'FAILED'))
+        if loaded:
+            print('    loaded at startup: '+', '.join(loaded))
+    return 1 if failed else 0
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Accuracy checks and benchmark of the coordinate transformation kernels.
+
+   Compares equ_to_altaz_kernel and altaz_to_equ_kernel with the
+   formulae used before the kernels (legacy_* below), checks the round
+   trip and the poles and times the kernels on a large grid with and
+   without reused buffers. Exits with 1 on a mismatch:
+
+       python bench_transform.py
+"""
+import sys
+import timeit
+
+import numpy as np
+
+from coord_operations import (lat, equ_to_altaz_kernel, altaz_to_equ_kernel,
+                              transform_buffers)
+
+grid_size=1000000
+tolerance=1e-9
+
+def legacy_equ_to_altaz(ha,dec):
+    """Array branch of equ_to_altaz before the kernel.
+    """
+    ha=ha+24*(ha<0)
+    ha=np.radians(ha*15.)
+    dec=np.radians(dec)
+    alt=np.arcsin(np.sin(lat)*np.sin(dec)+np.cos(lat)*np.cos(dec)*np.cos(ha))
+    az=np.arctan2(np.sin(ha),(-np.cos(lat)*np.tan(dec)+np.sin(lat)*np.cos(ha)))
+    return np.degrees(alt),np.degrees(az)
+
+def legacy_altaz_to_equ(alt,az):
+    """altaz_to_equ before the kernel.
+    """
+    alt=np.radians(alt)
+    az=np.radians(az)
+    ha=np.arctan2(np.sin(az),np.cos(lat)*np.tan(alt)+np.cos(az)*np.sin(lat))
+    dec=np.arcsin(np.sin(lat)*np.sin(alt)-np.cos(lat)*np.cos(alt)*np.cos(az))
+    return np.degrees(ha)/15.,np.degrees(dec)
+
+def angle_error(a,b,period):
+    """Largest difference of angles a and b modulo period.
+    """
+    return np.max(np.abs((a-b+period/2.)%period-period/2.))
+
+def check(rng):
+    """Returns list of failed checks.
+    """
+    errors=[]
+    ha=rng.uniform(-12.,12.,grid_size)
+    dec=rng.uniform(-89.9,89.9,grid_size)
+    alt,az=equ_to_altaz_kernel(ha,dec)
+    legacy_alt,legacy_az=legacy_equ_to_altaz(ha,dec)
+    if np.max(np.abs(alt-legacy_alt))>tolerance:
+        errors.append('alt differs from legacy')
+    if angle_error(az,legacy_az,360.)>tolerance:
+        errors.append('az differs from legacy')
+    back_ha,back_dec=altaz_to_equ_kernel(alt,az)
+    legacy_ha,legacy_dec=legacy_altaz_to_equ(alt,az)
+    if (angle_error(back_ha,legacy_ha,24.)>tolerance
+        or np.max(np.abs(back_dec-legacy_dec))>tolerance):
+        errors.append('altaz_to_equ differs from legacy')
+    if (angle_error(back_ha,ha,24.)>tolerance
+        or np.max(np.abs(back_dec-dec))>tolerance):
+        errors.append('round trip failed')
+    #Poles: altitude of the pole is the latitude for every hour angle
+    for pole in (90.,-90.):
+        alt,az=equ_to_altaz_kernel(ha[:1000],pole)
+        if not (np.all(np.isfinite(az))
+                and np.max(np.abs(alt-np.sign(pole)*np.degrees(lat)))<tolerance):
+            errors.append('equ_to_altaz at pole {}'.format(pole))
+    #Zenith
+    ha_z,dec_z=altaz_to_equ_kernel(90.,rng.uniform(-180.,180.,1000))
+    if (not np.all(np.isfinite(ha_z))
+        or np.max(np.abs(dec_z-np.degrees(lat)))>tolerance):
+        errors.append('altaz_to_equ at zenith')
+    #Broadcasting: one hour angle row against a declination column
+    alt,az=equ_to_altaz_kernel(ha[:50][None,:],dec[:40][:,None])
+    if alt.shape!=(40,50):
+        errors.append('broadcasting')
+    return errors
+
+def bench(rng):
+    """Prints time per grid of legacy functions and kernels.
+    """
+    ha=rng.uniform(-12.,12.,grid_size)
+    dec=rng.uniform(-89.9,89.9,grid_size)
+    out,work=transform_buffers(ha.shape)
+    for name,function in (
+            ('legacy equ_to_altaz',lambda: legacy_equ_to_altaz(ha,dec)),
+            ('kernel',lambda: equ_to_altaz_kernel(ha,dec)),
+            ('kernel with buffers',
+             lambda: equ_to_altaz_kernel(ha,dec,out=out,work=work)),
+            ('legacy altaz_to_equ',lambda: legacy_altaz_to_equ(dec,ha*15.)),
+            ('kernel',lambda: altaz_to_equ_kernel(dec,ha*15.)),
+            ('kernel with buffers',
+             lambda: altaz_to_equ_kernel(dec,ha*15.,out=out,work=work))):
+        t=min(timeit.repeat(function,number=3,repeat=3))/3
+        print('{:<20} {:8.1f} ms per {} points'.format(name,1000*t,grid_size))
+
+def main():
+    rng=np.random.RandomState(1)
+    errors=check(rng)
+    for error in errors:
+        print('Failed:',error)
+    print('{} failed checks'.format(len(errors)))
+    bench(rng)
+    return 1 if errors else 0
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -24,6 +24,8 @@ class CommandLineCommands(lx.Lx200Commands):
             'move_south':self.move_south,
             'south':self.move_south,
             's':self.move_south,
+            'stop':self.stop_all,
+            'q':self.stop_all,
             'get_coordinates':self.print_coordinates,
             'coordinates':self.print_coordinates,
             'c':self.print_coordinates,
@@ -82,7 +84,8 @@ class CommandLineCommands(lx.Lx200Commands):
                   'get_coordinates /coordinates /c  Print Telescope RA and DEC'+'\r\n'+
                   'move_west:duration or west:duration or w:duration  Move telescope in the west direction for chosen duration (default=0.1s) '+'\r\n'+
                   'move_west or west or w  Move telescope in the west direction for default duration =0.1s '+'\r\n'+
-                  'Other directions respectively (east, north, south)'+'\r\n'+'\r\n'+
+                  'Other directions respectively (east, north, south)'+'\r\n'+
+                  'Moves run in the background. stop or q  Stop all movements immediately'+'\r\n'+'\r\n'+
                   'set_target_dec:+dd mm ss (/+dd mm)  or target_dec or dec  Set target Declination'+'\r\n'+
                   'set_target_ra:hh mm ss (/hh mm.t)  or target_ra or ra  Set target Right Ascension'+'\r\n'+
                   'set_hip_target:"hip_nr" or hip_target:"hip_nr" or hip:"hip_nr"  Set Hipparcos star as target' +'\r\n'+
@@ -1,22 +1,48 @@
 
+import os
 import time
+import threading
 
 #On Office PC module serial is not available (and not needed)
-#Check if serial is available and connect to fakeSerial if not
+#Check if serial is available and connect to the simulated mount if not.
+#Set WALTZ_SIMULATOR=1 to use the simulated mount anyway.
 try:
+    if os.environ.get('WALTZ_SIMULATOR'):
+        raise ImportError('WALTZ_SIMULATOR is set')
     import serial
     print('Importing serial')
 except ImportError:
-    print('Importing fakeSerial')
-    import fakeSerial as serial
+    print('Importing mount_simulator')
+    import mount_simulator as serial
+
+import dispatcher as dsp
+
+#Serial port of the Waltz controller.
+#Set WALTZ_PORT to use e.g. the pty of mount_simulator.py.
+default_port=os.environ.get('WALTZ_PORT','/dev/ttyS0')
 
 class CommunicationCommands(serial.Serial):
     """ Inherits from Serial class and adds basic communication functions """
-    def __init__(self):
+    def __init__(self, port=None):
         #Open serial connection
-        super().__init__(port='/dev/ttyS0',baudrate = 9600,timeout = 1)
+        #The port timeout only bounds a single blocking read.
+        #The deadline of a whole response is response_timeout.
+        if port is None:
+            port=default_port
+        super().__init__(port=port,baudrate = 9600,timeout = 0.05)
         #Variable to save connection state
         self.connected=True
+        #Deadline for a complete response in seconds
+        self.response_timeout=1.
+        #Bytes received after the end of the last response
+        self._received=b''
+        #Lock to keep writes and the corresponding responses together
+        #if several threads use the serial port
+        self.port_lock=threading.RLock()
+        #Lock for single writes (emergency stops only take this one)
+        self.write_lock=threading.Lock()
+        #Thread sending all commands by priority (see start_dispatcher)
+        self.dispatcher=None
         
     def check_connection(self):
         """Checks if Connection to serial port is open.
@@ -59,15 +85,122 @@ class CommunicationCommands(serial.Serial):
             
     
   
-    def get_response(self):
-        """Reads from the serial connection and returns response as a string"""
-        response = b''
-        time.sleep(0.1)
-        while self.in_waiting > 0:
-            response += super().read(1)
-        response=response.decode()
+    def get_response(self, terminator=b'#', size=None, timeout=None):
+        """Reads one response from the serial connection and returns it as a string.
+
+           Returns as soon as the terminator (included in the response)
+           or size bytes have arrived (terminator None: only size), at the latest after timeout seconds
+           (default: self.response_timeout). Returns what has arrived until
+           then if the response is incomplete.
+        """
+        if timeout is None:
+            timeout=self.response_timeout
+        deadline=time.monotonic()+timeout
+        response=self._received
+        while True:
+            #Check if response is complete
+            end=response.find(terminator) if terminator else -1
+            if end>=0:
+                end+=len(terminator)
+            if size is not None and len(response)>=size and (end<0 or size<end):
+                end=size
+            if end>=0:
+                break
+            if time.monotonic()>=deadline:
+                end=len(response)
+                break
+            #Block until the next byte arrives (at most the port timeout),
+            #but take everything already buffered in one read
+            response+=super().read(max(1,self.in_waiting))
+        #Keep bytes after the end for the next response
+        self._received=response[end:]
+        response=response[:end].decode()
         return response
     
+    def start_dispatcher(self):
+        """Starts the dispatcher thread.
+        
+           From now on send and query from all threads are sent by the
+           dispatcher in order of their priority class.
+        """
+        if self.dispatcher is None or not self.dispatcher.is_alive():
+            self.dispatcher=dsp.CommandDispatcher(self)
+            self.dispatcher.start()
+            
+    def stop_dispatcher(self):
+        """Stops the dispatcher thread after all queued commands.
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+            self.dispatcher=None
+    
+    def _dispatching(self):
+        """Returns True if commands have to go through the dispatcher.
+        """
+        dispatcher=self.dispatcher
+        return (dispatcher is not None and dispatcher.is_alive() and
+                threading.current_thread() is not dispatcher)
+    
+    def send(self, inp, priority=None):
+        """Sends a command and does not wait for it.
+        
+           An expected reply (see dispatcher.REPLIES) is read and dropped,
+           so it can't be mistaken for the response of the next command.
+           priority: priority class (default: from dispatcher.PRIORITIES)
+        """
+        if self._dispatching():
+            self.dispatcher.submit(inp,priority)
+            return
+        reply=dsp.reply_of(inp)
+        with self.port_lock:
+            if reply is None:
+                self._write(inp)
+            else:
+                self._transfer(inp,*reply)
+
+    def query(self, inp, terminator=None, size=None, priority=None):
+        """Sends a command and returns its response.
+
+           See get_response for terminator and size. If both are None the
+           expected reply from dispatcher.REPLIES is used. Commands without
+           reply (e.g. moves and stops) are only sent and return ''.
+           priority: priority class (default: from dispatcher.PRIORITIES)
+        """
+        if terminator is None and size is None:
+            reply=dsp.reply_of(inp)
+            if reply is None:
+                self.send(inp,priority)
+                return ''
+        else:
+            reply=(terminator,size)
+        if self._dispatching():
+            return self.dispatcher.request(inp,priority,reply)
+        with self.port_lock:
+            return self._transfer(inp,*reply)
+
+    def _write(self, inp):
+        """Writes inp to the serial connection.
+        """
+        with self.write_lock:
+            self.write(inp)
+
+    def _transfer(self, inp, terminator=b'#', size=None):
+        """Writes inp and returns its response. Call with port_lock.
+
+           Stale input from earlier commands is discarded first,
+           so the response belongs to this command.
+        """
+        self._discard_input()
+        self._write(inp)
+        return self.get_response(terminator=terminator, size=size)
+
+    def _discard_input(self):
+        """Discards all bytes received so far.
+        """
+        self._received=b''
+        if self.in_waiting:
+            super().read(self.in_waiting)
+
     def exit_program(self):
         """Closes the program"""
         super().close()
@@ -77,15 +210,18 @@ class CommunicationCommands(serial.Serial):
     def close_connection(self):
         """ Closes Connection.
         """
-        if self.is_open:
-            super().close()
+        with self.port_lock:
+            if self.is_open:
+                super().close()
         self.connected=False
     
     def open_connection(self):
         """ Opens Connection.
         """
-        if not self.is_open:
-            super().open()
+        with self.port_lock:
+            if not self.is_open:
+                super().open()
+            self._received=b''
         self.connected=True
         
 
@@ -1,86 +1,278 @@
 from math import radians, degrees, sin, cos, tan, asin, acos, atan2
+from bisect import bisect_right
 import numpy as np
 
-import matplotlib.pyplot as plt
+from observatory import WALTZ
 
-#Define Latitude in radians
-lat=radians(49.3978620896919)
+#Latitude of Waltz in radians (the functions below take a Site)
+lat=WALTZ.lat
+sin_lat=WALTZ.sin_lat
+cos_lat=WALTZ.cos_lat
 
 #Define hoirzontal limit in altitude in degree 
 horizon_limit=12
 
-def equ_to_altaz(ha,dec):
+class LimitTable:
+    """Altitude limit as step function of azimuth.
+    
+       The limit polygon is compiled once into sorted breakpoints.
+       Between two breakpoints the limit is the larger altitude of both.
+       Exactly at a breakpoint it is the larger altitude of its neighbours.
+       A lookup is a single searchsorted, so memory and time grow only
+       linearly with the number of azimuths and breakpoints.
+    """
+    def __init__(self, limits):
+        """limits: array of [alt_limit, az] rows in degrees.
+                   Does not need to be sorted.
+        """
+        order=np.argsort(limits[:,1],kind='stable')
+        self.az=limits[order,1]
+        alt=limits[order,0]
+        #Limit in the interval between az[i] and az[i+1]
+        self.interval_alt=np.maximum(alt[:-1],alt[1:])
+        #Limit exactly at az[i] (outermost breakpoints: adjacent interval)
+        self.point_alt=np.concatenate(([self.interval_alt[0]],
+                                       np.maximum(alt[:-2],alt[2:]),
+                                       [self.interval_alt[-1]]))
+        #Python lists for fast scalar lookups
+        self._az_list=self.az.tolist()
+        self._interval_list=self.interval_alt.tolist()
+        self._point_list=self.point_alt.tolist()
+    
+    def lookup(self, az):
+        """Returns altitude limits in degrees as array.
+        
+           Input: az in degrees as float, list or array.
+        """
+        az=np.atleast_1d(np.asarray(az,dtype=float))
+        #Index of first breakpoint larger than az
+        pos=np.searchsorted(self.az,az,side='right')
+        #Azimuths outside of the table get the limit of the outermost interval
+        interval=np.clip(pos-1,0,len(self.interval_alt)-1)
+        alt_lim=self.interval_alt[interval]
+        #Take point limit where az hits a breakpoint exactly
+        point=np.clip(pos-1,0,len(self.az)-1)
+        on_point=self.az[point]==az
+        alt_lim[on_point]=self.point_alt[point[on_point]]
+        return alt_lim
+    
+    def scalar(self, az):
+        """Returns altitude limit in degrees for a single az as float.
+        """
+        pos=bisect_right(self._az_list,az)
+        point=min(max(pos-1,0),len(self._az_list)-1)
+        if self._az_list[point]==az:
+            return self._point_list[point]
+        return self._interval_list[min(max(pos-1,0),len(self._interval_list)-1)]
+
+#Define limits. All limits are included. 
+#We go from -180.01 to 180.01 to make sure that 180.0 is properly
+#included. Also include 360.01. Shouldn't be inserted normally,
+#but since it still works we include it for bad inputs.
+alt_limits=np.array([[horizon_limit, -180.01],
+                     [horizon_limit, 97.0],
+                     [18.047683650516614, 101.22273624588037],
+                     [19.922540694112776, 108.09973819537765],
+                     [19.92473999691732, 112.96653118269231],
+                     [18.1891109125214, 115.94832778139686],
+                     [17.26156820756814, 119.6115621873876],
+                     [17.3079984461787, 124.02768286442313],
+                     [17.61337050520085, 128.47376745531645],
+                     [16.514643086444128, 131.5063030183839],
+                     [17.105176559235456, 135.7850030762675],
+                     [15.574353529644203, 138.2131928476609],
+                     [15.367408374687445, 141.5357258928432],
+                     [13.465127305224598, 143.60311637027976],
+                     [12.635376162837199,146.34084417895636],
+                     [horizon_limit, 150.0],
+                     [horizon_limit, 180.01],
+                     [horizon_limit, 360.01]])
+alt_limit_table=LimitTable(alt_limits)
+
+#Define Tree limits as np.array
+#I put zero alt limit, where horizontal or cupboard limit is reached,
+#because we do not care about tree limits below hard limits.
+#Does not include all cupboard or horizontal areas, because it is zero there anyway
+tree_limits=np.array([[0.0,-180.01],
+                      [0.0,-165.3455807696162],
+                      [13.926531858678072,-161.22484660697867],
+                      [17.195599636413682,-157.44910241374103],
+                      [0.0,-145.0],
+                      [0.0,-148.91114359009313],
+                      [21.58816304165209,-149.10471551491722],
+                      [12.182100707176437,-135.7205489225959],
+                      [17.29251687747958,-132.16310694376807],
+                      [17.358959391076436,-128.24795814317287],
+                      [16.554208994852967,-123.34078740486738],
+                      [13.011626593972498,-115.7274970740633],
+                      [0.0,-110.73615475166689],
+                      [0.0,-100.57064217069362],
+                      [0.0,-88.89096473867299],
+                      [12.767315026462386,-81.11510631225428],
+                      [13.63658755486348,-71.9033237952604],
+                      [13.730797953998692,-62.34671848645827],
+                      [16.517753594055026,-54.995932340824126],
+                      [15.385051933925672,-45.40736739783195],
+                      [14.249827605471754,-36.515993587901434],
+                      [17.244394510206345,-29.80225310600212],
+                      [16.786645206804543,-25.728955461859304],
+                      [19.385806016233353,-22.649468723617428],
+                      [17.815069758506976,-18.39429645277085],
+                      [13.917540178597369,-13.926187167552994],
+                      [15.800229806019255,-7.090540182345275],
+                      [14.402137910308108,0.0],
+                      [14.206429726562314,6.944851122938447],
+                      [13.917540178597369,13.926187167552998],
+                      [14.39736773524922,21.242902795231192],
+                      [18.693114258587876,26.36363462208435],
+                      [19.88987006933479,30.822460198427866],
+                      [17.742310373009012,38.16015634421578],
+                      [15.23857922621577,45.32492015300472],
+                      [19.331358903370177,52.23568016291085],
+                      [19.875106943741056,57.28528304962664],
+                      [25.903731403911603,66.86068454273801],
+                      [27.92145790178483,73.94757655442089],
+                      [25.482784869502435,82.40122417583163],
+                      [24.75519103243617,87.06221750457497],
+                      [21.78914070627903,89.41320012139184],
+                      [0.0,97.0],
+                      [0.0,101.22273624588037],
+                      [0.0,108.09973819537765],
+                      [0.0,112.96653118269231],
+                      [0.0,115.94832778139686],
+                      [21.796949268702594,124.046616191669],
+                      [0.0,119.6115621873876],
+                      [20.05071675877851,126.59684863727593],
+                      [0.0,124.02768286442313],
+                      [0.0,146.34084417895636],
+                      [0.0,180.01]])
+tree_limit_table=LimitTable(tree_limits)
+
+def _rotate(lon,lat_in,sign,lon_out,lat_out,work,site):
+    """Rotates spherical coordinates around the east-west axis by the
+       colatitude of the site (the core of both transformations).
+       
+       lon, lat_in: input angles in radians (work[0], work[1]).
+       sign: +1 for equatorial to horizontal, -1 for the inverse.
+       Writes the angles in radians to lon_out and lat_out.
+       work: three scratch arrays, all of the same shape as the outputs.
+       site: Site of the telescope.
+       
+       The longitude is computed from the unnormalized vector
+       (cos(lat)*sin(lon), ...) instead of dividing by cos(lat) first,
+       so it stays finite at the poles.
+    """
+    w0,w1,w2=work
+    #lat_out: cos(lat_in), lon_out: cos(lat_in)*cos(lon)
+    np.cos(lat_in,out=lat_out)
+    np.cos(lon,out=lon_out)
+    lon_out*=lat_out
+    #w0: y=cos(lat_in)*sin(lon)
+    np.sin(lon,out=w0)
+    w0*=lat_out
+    #w1: sin(lat_in)
+    np.sin(lat_in,out=w1)
+    #lat_out: sin of output latitude
+    np.multiply(w1,site.sin_lat,out=w2)
+    np.multiply(lon_out,sign*site.cos_lat,out=lat_out)
+    lat_out+=w2
+    np.clip(lat_out,-1.,1.,out=lat_out)
+    np.arcsin(lat_out,out=lat_out)
+    #lon_out: x=sin(lat)*cos(lat_in)*cos(lon)-sign*cos(lat)*sin(lat_in)
+    lon_out*=site.sin_lat
+    w1*=sign*site.cos_lat
+    lon_out-=w1
+    np.arctan2(w0,lon_out,out=lon_out)
+
+def transform_buffers(shape):
+    """Returns (out, work) buffers for the kernels for inputs of shape.
+    
+       Reuse them to transform many arrays of the same shape without
+       allocations.
+    """
+    return ((np.empty(shape),np.empty(shape)),
+            (np.empty(shape),np.empty(shape),np.empty(shape)))
+
+def _prepare(a,b,out,work):
+    shape=np.broadcast(a,b).shape
+    if out is None:
+        out=(np.empty(shape),np.empty(shape))
+    if work is None:
+        work=(np.empty(shape),np.empty(shape),np.empty(shape))
+    return out,work
+
+def equ_to_altaz_kernel(ha,dec,out=None,work=None,site=None):
+    """Transforms equatorial to horizontal coordinates.
+    
+       Input: ha in hours, dec in degrees as floats or arrays of any
+              shapes, which broadcast together.
+       out: optional tuple of arrays (alt, az) to write the result to.
+       work: optional tuple of three scratch arrays (see transform_buffers).
+       With out and work given, no memory is allocated.
+       site: Site of the telescope (default WALTZ).
+       
+       Returns arrays of altitude and azimuth in degrees
+       (azimuth 0 in the south, positive towards west).
+    """
+    out,work=_prepare(ha,dec,out,work)
+    alt,az=out
+    np.multiply(ha,np.pi/12.,out=work[0])
+    np.radians(dec,out=work[1])
+    _rotate(work[0],work[1],1.,az,alt,work,site or WALTZ)
+    np.degrees(alt,out=alt)
+    np.degrees(az,out=az)
+    return out
+
+def altaz_to_equ_kernel(alt,az,out=None,work=None,site=None):
+    """Transforms horizontal to equatorial coordinates.
+    
+       Input: alt, az in degrees as floats or arrays of any shapes,
+              which broadcast together.
+       out: optional tuple of arrays (ha, dec) to write the result to.
+       work: optional tuple of three scratch arrays (see transform_buffers).
+       With out and work given, no memory is allocated.
+       site: Site of the telescope (default WALTZ).
+       
+       Returns arrays of hour angle in hours and declination in degrees.
+    """
+    out,work=_prepare(alt,az,out,work)
+    ha,dec=out
+    np.radians(az,out=work[0])
+    np.radians(alt,out=work[1])
+    _rotate(work[0],work[1],-1.,ha,dec,work,site or WALTZ)
+    ha*=12./np.pi
+    np.degrees(dec,out=dec)
+    return out
+
+def equ_to_altaz(ha,dec,formatted=False,site=None):
     """ Transforms equatorial coordinates (hourangle, declination)
         to horizontal coordinates (azimuth,altitude).
         
-        Input: ha in hours as float, dec in degree as float.
+        Input: ha in hours as float or array, dec in degree as float or array.
         
-        Returns altitude and azimuth as float in degrees.
+        Returns altitude and azimuth in degrees (floats for float input).
+        formatted: Also return them formatted as +dd°mm'ss" strings
+                   (floats only).
+        site: Site of the telescope (default WALTZ).
     """
-    #Check if Input arrays have same dimensions
-    if not np.isscalar(ha) and not np.isscalar(dec):
-        if (len(ha)!=len(dec) or ha.ndim!=1 or dec.ndim!=1):
-            return 0
-    
-    #Convert hour angle to radians
-    #Convert hour angle to degree first and convert negative hour angles to
-    #positive ones (e.g. -11 to 13)
-    ha=ha+24*(ha<0)
-    ha=np.radians(ha*15.)
-    
-    #Convert declination to radians
-    dec=np.radians(dec)
-    
-    #Calculate altitude and azimuth (formulaes from celestial mechanics script
-    #of Genevieve Parmentier)
-    #For altitudwe have the formula:
-    #sin(alt)=cos(ha)*cos(lat)*cos(dec)+sin(lat)*sin(dec))
-    alt=np.arcsin(np.sin(lat)*np.sin(dec)+np.cos(lat)*np.cos(dec)*np.cos(ha))
-    
-    #For azimuth we have the formula
-    #tan(az)=-sin(ha)/(cos(lat)*tan(dec)-sin(lat)*cos(ha))
-    az=np.arctan2(np.sin(ha),(-np.cos(lat)*np.tan(dec)+np.sin(lat)*np.cos(ha)))
-    
-    #Convert alt and az to degrees
-    alt=np.degrees(alt)
-    az=np.degrees(az)
-    
-    #If Input was an array longer than 1 return the float arrays
-    if not np.isscalar(alt):
+    if not (np.isscalar(ha) and np.isscalar(dec)):
+        return equ_to_altaz_kernel(ha,dec,site=site)
+    #Single values with math (no array overhead), formulae of the kernel
+    site=site or WALTZ
+    sin_lat,cos_lat=site.sin_lat,site.cos_lat
+    ha=radians(ha*15.)
+    dec=radians(dec)
+    cos_dec=cos(dec)
+    cos_dec_cos_ha=cos_dec*cos(ha)
+    alt=degrees(asin(max(-1.,min(1.,sin_lat*sin(dec)+cos_lat*cos_dec_cos_ha))))
+    az=degrees(atan2(cos_dec*sin(ha),sin_lat*cos_dec_cos_ha-cos_lat*sin(dec)))
+    if not formatted:
         return (alt,az)
-    
-    #If Input was single values than also format the Output
-    #In that case transform arrays to float
-    alt=float(alt)
-    az=float(az)
-    formated_coord_list=[]
-    #Also Format alt/az to +dd°mm'ss" as string
-    #Get the sign of ha_float
-    for coord in [alt,az]:
-        if coord>=0:
-            sign='+'
-        elif coord<0:
-            sign='-'
-        #Calculate the absolute of coord to convert it to hh mm ss
-        coord=abs(coord)
-        #Format hour angle to hh:mm:ss
-        deg=int(coord)
-        rest=abs(coord-deg)*60
-        minutes=int(rest)
-        rest=abs(rest-minutes)*60
-        #We want to round seconds to get a more continous updating of seconds
-        seconds=round(rest)
-        #But we have to take care of rounding up to 60. Increase minutes by one in that case.
-        if seconds==60:
-            seconds=0
-            minutes=minutes+1
-        coord='''{}{:02}°{:02}'{:02}"'''.format(sign,deg,minutes,seconds)
-        formated_coord_list.append(coord)
-        
-    #Return altitude and azimuth
-    return (alt,az,formated_coord_list[0],formated_coord_list[1])
+    #Imported here, because coordinates imports this module
+    from coordinates import format_dms
+    return (alt,az,format_dms(alt),format_dms(az))
 
-def altaz_to_equ(alt,az):
+def altaz_to_equ(alt,az,site=None):
     """ Transforms horizontal coordinates (azimuth,altitude).
         to equatorial coordinates (hourangle, declination).
         
@@ -88,30 +280,20 @@ def altaz_to_equ(alt,az):
                az in degrees as float or array of floats.
         
         Returns ha as float in hours and dec as float in degrees.
+        site: Site of the telescope (default WALTZ).
     """
-    #Convert alt and az to radians
-    alt=np.radians(alt)
-    az=np.radians(az)
-    
-    #Calculate hour angle and declination (formulaes from celestial mechanics script
-    #of Genevieve Parmentier)
-    #For hour angle we have the formula:
-    #tan(ha)=(sin(az))/(cos(lat)*tan(alt)+cos(az)*sin(lat))
-    ha=np.arctan2(np.sin(az),np.cos(lat)*np.tan(alt)+np.cos(az)*np.sin(lat))
-    
-    #For declination we have the formula:
-    #sin(dec)=sin(lat)*sin(alt)-cos(lat)*cos(alt)*cos(az)
-    dec=np.arcsin(np.sin(lat)*np.sin(alt)-np.cos(lat)*np.cos(alt)*np.cos(az))
-    
-    #Convert ha to hours
-    ha=np.degrees(ha)/15.
-    #Convert dec to degrees
-    dec=np.degrees(dec)
-    
-    return (ha, dec)
-    
-    
-    
+    if not (np.isscalar(alt) and np.isscalar(az)):
+        return altaz_to_equ_kernel(alt,az,site=site)
+    #Single values with math (no array overhead), formulae of the kernel
+    site=site or WALTZ
+    sin_lat,cos_lat=site.sin_lat,site.cos_lat
+    alt=radians(alt)
+    az=radians(az)
+    cos_alt=cos(alt)
+    cos_alt_cos_az=cos_alt*cos(az)
+    dec=degrees(asin(max(-1.,min(1.,sin_lat*sin(alt)-cos_lat*cos_alt_cos_az))))
+    ha=degrees(atan2(cos_alt*sin(az),sin_lat*cos_alt_cos_az+cos_lat*sin(alt)))/15.
+    return (ha,dec)
     
 def check_coordinates(alt,az):
         """Checks if coordinates are observable and safe to slew.
@@ -125,7 +307,7 @@ def check_coordinates(alt,az):
             return False
         
         #Calculate altitude limit
-        alt_limit=calc_alt_limit(az)
+        alt_limit=alt_limit_table.scalar(az)
             
         #Check if altitude is above or below limit
         if alt>=alt_limit:
@@ -140,102 +322,19 @@ def calc_alt_limit(az):
         Returns Altitude limit in degrees.
         Input: Array of az as floats between -180 and 180
     """
-    #Check Input: If int or float make array
-    if isinstance(az,(float,int)):
-        az=np.array([az])
-    elif isinstance(az,list):
-        az=np.array(az)
-    
-    #Define limits. All limits are included. 
-    #We go from -180.01 to 180.01 to make sure that 180.0 is properly
-    #included. Also include 360.01. Shouldn't be inserted normally,
-    #but since it still works we include it for bad inputs.
-    limits=np.array([[horizon_limit, -180.01],
-                    [horizon_limit, 97.0],
-                    [18.047683650516614, 101.22273624588037],
-                    [19.922540694112776, 108.09973819537765],
-                    [19.92473999691732, 112.96653118269231],
-                    [18.1891109125214, 115.94832778139686],
-                    [17.26156820756814, 119.6115621873876],
-                    [17.3079984461787, 124.02768286442313],
-                    [17.61337050520085, 128.47376745531645],
-                    [16.514643086444128, 131.5063030183839],
-                    [17.105176559235456, 135.7850030762675],
-                    [15.574353529644203, 138.2131928476609],
-                    [15.367408374687445, 141.5357258928432],
-                    [13.465127305224598, 143.60311637027976],
-                    [12.635376162837199,146.34084417895636],
-                    [horizon_limit, 150.0],
-                    [horizon_limit, 180.01],
-                    [horizon_limit, 360.01]])
-
-    #Create multidimensional arrays of same shape
-    #Idea is to have all differences of one given az in one line
-    #So we want a board_lim_matrix where in each line all azimuths of
-    #the board limits are represented. So it has as many lines as given azs
-    #and in each line all limit_az are repeated
-    az_lim_matrix=np.array(np.tile(limits[:,1],az.shape[0]))
-    az_lim_matrix=az_lim_matrix.reshape(az.shape[0],limits.shape[0])
-
-    #The az_matrix is constructed so that in each line only one value of 
-    #input az is written
-    #It has as many columns as azimuth limits 
-    az_matrix=np.array(np.repeat(az,limits.shape[0]))
-    az_matrix=az_matrix.reshape(az.shape[0],limits.shape[0])
-
-    #Calculate difference matrix
-    diff=az_lim_matrix-az_matrix
-
-    #Calculate matrices with only positive and negative values respectively
-    pos=(diff>=0)*diff
-    neg=(diff<0)*diff
-
-    #insert +/- infinity for 0, to avoid finding maxima/minima there 
-    pos[pos==0]=np.inf
-    neg[neg==0]=-np.inf
-
-    #Find one limit at lowest positive value of difference in az
-    #The other at greatest negative value
-    up_az_lim=az_lim_matrix[np.where(diff==np.amin(pos,axis=1,keepdims=True))]
-    low_az_lim=az_lim_matrix[np.where(diff==np.amax(neg,axis=1,keepdims=True))]
-
-    #Define 1D array with az_limits from limits
-    az_lim=limits[:,1]
-    #Get indices of sorted array. Note that it normally should be sorted already.
-    #But it is useful if one would insert new limits in unsorted order.
-    #Note that array is not really sorted, so we do not lose indices.
-    #We only get the indices with which you could sort the array
-    az_lim_sorted = np.argsort(az_lim)
-
-    #Perform searchsort with sorted indices. Search for up_az_lim values
-    #in general az_limits
-    up_pos = np.searchsorted(az_lim[az_lim_sorted], up_az_lim)
-    #get the indices, where you found the up_az_limits
-    up_indices = az_lim_sorted[up_pos]
-    #And take the up_alt_lim at these indices
-    up_alt_lim=limits[up_indices,0]
-
-    #Analog for low_alt_lim
-    low_pos = np.searchsorted(az_lim[az_lim_sorted], low_az_lim)
-    low_indices = az_lim_sorted[low_pos]
-    low_alt_lim=limits[low_indices,0]
-
-    #Take the maximum element wise. So we always want the largest limit
-    #of the two limit borders.
-    alt_lim=np.maximum(up_alt_lim,low_alt_lim)
-    
-    return alt_lim
+    return alt_limit_table.lookup(az)
     
         
-def calc_obs_time(ha,dec):
+def calc_obs_time(ha,dec,site=None):
     """Calculates timespan, one can still observe star until it reaches 
        horizon limit.
        
        Better use approx_obs_time.
     """
     
+    site=site or WALTZ
     #First calculate altitude and azimuth
-    alt,az=equ_to_altaz(ha,dec)[:2]
+    alt,az=equ_to_altaz(ha,dec,site=site)
         
     #Save current hour angle in hours
     ha_now=ha
@@ -252,8 +351,8 @@ def calc_obs_time(ha,dec):
         
         #Calculate ha_Set in radian
         try:
-            ha_set=acos((sin(horizon_limit_rad)-sin(lat)*sin(dec))/
-                        (cos(lat)*cos(dec)))
+            ha_set=acos((sin(horizon_limit_rad)-site.sin_lat*sin(dec))/
+                        (site.cos_lat*cos(dec)))
             #Calculate ha_set in hours
             ha_set=degrees(ha_set)/15.
             return ha_set
@@ -276,195 +375,136 @@ def calc_obs_time(ha,dec):
             obs_time=obs_time*0.9972695601852*3600
             return obs_time
         
-def approx_obs_time(star_ha,star_dec):
+def observable(ha,dec,site=None):
+    """Checks element wise if coordinates are above the hardware limit.
+    
+       Input: ha in hours, dec in degrees as arrays, which broadcast
+              together.
+       site: Site of the telescope (default WALTZ).
+       Returns boolean array of the broadcast shape (see check_coordinates).
+    """
+    alt,az=equ_to_altaz_kernel(ha,dec,site=site)
+    return alt>=alt_limit_table.lookup(az)
+
+def limit_events(ha,dec,table=None,site=None):
+    """Calculates hour angles, at which stars may cross the limit.
+    
+       Input: Hour angles in hours, declinations in degrees as 1D arrays.
+       table: LimitTable (default alt_limit_table).
+       site: Site of the telescope (default WALTZ).
+       
+       The limit is constant in azimuth between the breakpoints of table
+       and the altitude of a star changes monotonically with |ha|.
+       So a star can only cross the limit where its azimuth passes a
+       breakpoint or where its altitude passes one of the limit values.
+       Both are solved in closed form along the diurnal arc.
+       Returns sorted offsets from ha in sidereal hours between 0 and 24
+       as array with one row per star (24 where there is no event).
+    """
+    if table is None:
+        table=alt_limit_table
+    site=site or WALTZ
+    sin_lat,cos_lat=site.sin_lat,site.cos_lat
+    ha_rad=np.radians(ha*15.)[:,None]
+    dec_rad=np.radians(dec)[:,None]
+    
+    #Azimuth az_b is passed where (see equ_to_altaz)
+    #sin(ha)*cos(az_b)-sin(lat)*sin(az_b)*cos(ha)=-cos(lat)*sin(az_b)*tan(dec)
+    #Write left side as r*sin(ha+phi)
+    az_b=np.radians(table.az)[None,:]
+    phi=np.arctan2(-sin_lat*np.sin(az_b),np.cos(az_b))
+    r=np.hypot(np.cos(az_b),sin_lat*np.sin(az_b))
+    with np.errstate(invalid='ignore'):
+        arc=np.arcsin(-cos_lat*np.sin(az_b)*np.tan(dec_rad)/r)
+    az_events=np.concatenate((arc-phi,np.pi-arc-phi),axis=1)
+    
+    #Altitude alt_l is passed where
+    #cos(ha)=(sin(alt_l)-sin(lat)*sin(dec))/(cos(lat)*cos(dec))
+    alt_l=np.radians(np.unique(table.interval_alt))[None,:]
+    with np.errstate(invalid='ignore',divide='ignore'):
+        arc=np.arccos((np.sin(alt_l)-sin_lat*np.sin(dec_rad))/
+                      (cos_lat*np.cos(dec_rad)))
+    alt_events=np.concatenate((arc,-arc),axis=1)
+    
+    #Convert to offsets from current hour angle in sidereal hours
+    events=np.concatenate((az_events,alt_events),axis=1)
+    events=np.degrees(events-ha_rad)/15.%24.
+    events[np.isnan(events)]=24.
+    return np.sort(events,axis=1)
+
+def calc_set_rise_times(ha,dec,site=None):
+    """Calculates time until stars set or rise at the hardware limit.
+    
+       Input: Hour angles in hours, declinations in degrees as floats or
+              arrays (one entry per star).
+       site: Site of the telescope (default WALTZ).
+       
+       Returns set_time, rise_time in solar hours as arrays.
+       set_time: Time until an observable star reaches the limit,
+                 0 if it is currently unobservable.
+       rise_time: Time until an unobservable star gets above the limit,
+                  0 if it is currently observable.
+       24 means, that the star does not set (rise) within one day.
+       Crossings are calculated in closed form (see limit_events), so the
+       times are exact up to floating point precision.
+    """
+    ha,dec=np.broadcast_arrays(np.atleast_1d(np.asarray(ha,dtype=float)),
+                               np.atleast_1d(np.asarray(dec,dtype=float)))
+    visible_now=observable(ha,dec,site)
+    
+    #Between two events the star stays on one side of the limit.
+    #Check the side in the middle between all events.
+    events=limit_events(ha,dec,site=site)
+    bounds=np.concatenate((np.zeros((len(ha),1)),events),axis=1)
+    middle=(bounds[:,:-1]+bounds[:,1:])/2.
+    visible=observable(ha[:,None]+middle,dec[:,None],site)
+    
+    #The star crosses the limit at the event before the first middle
+    #on the other side
+    changed=visible!=visible_now[:,None]
+    crossing=changed.any(axis=1)
+    first=np.argmax(changed,axis=1)
+    sid_time=bounds[np.arange(len(ha)),first]
+    
+    #Sidereal hours convert to solar hours (normal time)
+    #via 1h_sid=0.9972695601852h_sol
+    time=np.where(crossing,sid_time*0.9972695601852,24.)
+    set_time=np.where(visible_now,time,0.)
+    rise_time=np.where(visible_now,0.,time)
+    return set_time, rise_time
+        
+def approx_obs_time(star_ha,star_dec,site=None):
     """Calculates an approximate observing time for a star.
        
        
        Input: Hour angle in hours as float. Declination in degrees as float.
-       Output: Observable time in solar seconds.
+       Output: Observable time in solar hours.
        Uses hard limits of the Waltz Telescope
+       site: Site of the telescope (default WALTZ).
     """
     #First check if star is already under a limit
-    star_alt,star_az,_,__=equ_to_altaz(star_ha,star_dec)
+    star_alt,star_az=equ_to_altaz(star_ha,star_dec,site=site)
     if not check_coordinates(star_alt,star_az):
         return 0
     
-    #Create az and alt_limit array
-    az=np.arange(-180,180,0.01)
-    alt_limit=np.zeros(len(az))
-    
-    #Define dec_limits and hour angle arrays
-    dec_limit=np.zeros(len(az))
-    ha=np.zeros(len(az))
-    
-    #Calculate alt_limit for every az 
-    alt_limit=calc_alt_limit(az)
-
-    #Transform altaz limits to ha,dec limits
-    ha,dec_limit=altaz_to_equ(alt_limit,az)
-        
-    #Define star trajectory (dec stays constant, hour angle increases)
-    traj_ha=np.arange(-11.999,11.999,0.05)
-    traj_dec=np.ones(len(traj_ha))*star_dec
-    
-    #Approximately calculate time until hard limit is reached
+    #Time until hard limit is reached
     #If Star is circumpolar obs_time is 24 hours
-    if star_dec > np.amax(dec_limit):
-        sid_obs_time=24.
-        obs_time=24.
-    else:
-        #If not circumpolar
-        #Calculate the absolute differences between those dec_limits 
-        #that are at hour angles larger than the stars hour angle
-        #(to prevent to get the intersection on the eastern side)
-        #and the stars declination
-        dec_diff=np.abs(dec_limit[ha>star_ha]-star_dec)
-        #Also cut out the hour angle values on the eastern side in ha array
-        #Needed to get same dimension
-        #Otherwise argmin wouldn't work
-        ha_later=ha[ha>star_ha]
-        #Hour Anlge at setting (reaching red limit) is at the same index as the
-        #minimum of dec_diff
-        ha_set=ha_later[np.argmin(dec_diff)]
-        #Calculate the sidereal time until the star sets
-        sid_obs_time=ha_set-star_ha
-        #Sidereal hours convert to solar hours (normal time)
-        #via 1h_sid=0.9972695601852h_sol
-        obs_time=sid_obs_time*0.9972695601852
-    return obs_time
+    set_time,rise_time=calc_set_rise_times(star_ha,star_dec,site)
+    return float(set_time[0])
         
 def calc_tree_limit(az):
     """Calculates tree limit in altitude for given azimuth.
        Returns alt_limit in degrees.
        Input: azimuth in degrees.
     """
-    #Define Tree limits as np.array
-    #I put zero alt limit, where horizontal or cupboard limit is reached,
-    #because we do not care about tree limits below hard limits.
-    #Does not include all cupboard or horizontal areas, because it is zero there anyway
-    
-    #Check Input: If int or float make array
-    if isinstance(az,(float,int)):
-        az=np.array([az])
-    elif isinstance(az,list):
-        az=np.array(az)
-    
-    tree_lim=np.array([[0.0,-180.01],
-                       [0.0,-165.3455807696162],
-                       [13.926531858678072,-161.22484660697867],
-                       [17.195599636413682,-157.44910241374103],
-                       [0.0,-145.0],
-                       [0.0,-148.91114359009313],
-                       [21.58816304165209,-149.10471551491722],
-                       [12.182100707176437,-135.7205489225959],
-                       [17.29251687747958,-132.16310694376807],
-                       [17.358959391076436,-128.24795814317287],
-                       [16.554208994852967,-123.34078740486738],
-                       [13.011626593972498,-115.7274970740633],
-                       [0.0,-110.73615475166689],
-                       [0.0,-100.57064217069362],
-                       [0.0,-88.89096473867299],
-                       [12.767315026462386,-81.11510631225428],
-                       [13.63658755486348,-71.9033237952604],
-                       [13.730797953998692,-62.34671848645827],
-                       [16.517753594055026,-54.995932340824126],
-                       [15.385051933925672,-45.40736739783195],
-                       [14.249827605471754,-36.515993587901434],
-                       [17.244394510206345,-29.80225310600212],
-                       [16.786645206804543,-25.728955461859304],
-                       [19.385806016233353,-22.649468723617428],
-                       [17.815069758506976,-18.39429645277085],
-                       [13.917540178597369,-13.926187167552994],
-                       [15.800229806019255,-7.090540182345275],
-                       [14.402137910308108,0.0],
-                       [14.206429726562314,6.944851122938447],
-                       [13.917540178597369,13.926187167552998],
-                       [14.39736773524922,21.242902795231192],
-                       [18.693114258587876,26.36363462208435],
-                       [19.88987006933479,30.822460198427866],
-                       [17.742310373009012,38.16015634421578],
-                       [15.23857922621577,45.32492015300472],
-                       [19.331358903370177,52.23568016291085],
-                       [19.875106943741056,57.28528304962664],
-                       [25.903731403911603,66.86068454273801],
-                       [27.92145790178483,73.94757655442089],
-                       [25.482784869502435,82.40122417583163],
-                       [24.75519103243617,87.06221750457497],
-                       [21.78914070627903,89.41320012139184],
-                       [0.0,97.0],
-                       [0.0,101.22273624588037],
-                       [0.0,108.09973819537765],
-                       [0.0,112.96653118269231],
-                       [0.0,115.94832778139686],
-                       [21.796949268702594,124.046616191669],
-                       [0.0,119.6115621873876],
-                       [20.05071675877851,126.59684863727593],
-                       [0.0,124.02768286442313],
-                       [0.0,146.34084417895636],
-                       [0.0,180.01]])
-    
-    #Create multidimensional arrays of same shape
-    #Idea is to have all differences of one given az in one line
-    #So we want a board_lim_matrix where in each line all azimuths of
-    #the board limits are represented. So it has as many lines as given azs
-    #and in each line all limit_az are repeated
-    az_lim_matrix=np.array(np.tile(tree_lim[:,1],az.shape[0]))
-    az_lim_matrix=az_lim_matrix.reshape(az.shape[0],tree_lim.shape[0])
-
-    #The az_matrix is constructed so that in each line only one value of 
-    #input az is written
-    #It has as many columns as azimuth limits 
-    az_matrix=np.array(np.repeat(az,tree_lim.shape[0]))
-    az_matrix=az_matrix.reshape(az.shape[0],tree_lim.shape[0])
-
-    #Calculate difference matrix
-    diff=az_lim_matrix-az_matrix
-
-    #Calculate matrices with only positive and negative values respectively
-    pos=(diff>=0)*diff
-    neg=(diff<0)*diff
-
-    #insert +/- infinity for 0, to avoid finding maxima/minima there 
-    pos[pos==0]=np.inf
-    neg[neg==0]=-np.inf
-
-    #Find one limit at lowest positive value of difference in az
-    #The other at greatest negative value
-    up_az_lim=az_lim_matrix[np.where(diff==np.amin(pos,axis=1,keepdims=True))]
-    low_az_lim=az_lim_matrix[np.where(diff==np.amax(neg,axis=1,keepdims=True))]
-
-    #Define 1D array with az_limits from limits
-    az_lim=tree_lim[:,1]
-    #Get indices of sorted array. Note that it normally should be sorted already.
-    #But it is useful if one would insert new limits in unsorted order.
-    #Note that array is not really sorted, so we do not lose indices.
-    #We only get the indices with which you could sort the array
-    az_lim_sorted = np.argsort(az_lim)
-
-    #Perform searchsort with sorted indices. Search for up_az_lim values
-    #in general az_limits
-    up_pos = np.searchsorted(az_lim[az_lim_sorted], up_az_lim)
-    #get the indices, where you found the up_az_limits
-    up_indices = az_lim_sorted[up_pos]
-    #And take the up_alt_lim at these indices
-    up_alt_lim=tree_lim[up_indices,0]
-
-    #Analog for low_alt_lim
-    low_pos = np.searchsorted(az_lim[az_lim_sorted], low_az_lim)
-    low_indices = az_lim_sorted[low_pos]
-    low_alt_lim=tree_lim[low_indices,0]
-
-    #Take the maximum element wise. So we always want the largest limit
-    #of the two limit borders.
-    tree_lim=np.maximum(up_alt_lim,low_alt_lim)
-    
-    return tree_lim
+    return tree_limit_table.lookup(az)
     
-def calculate_refraction_from_true_coord(ha,dec,temp=10,press=101.0):
+def calculate_refraction_from_true_coord(ha,dec,temp=10,press=101.0,
+                                         site=None):
     """Calculates refraction for given coordinates.
     
        Input: True ha in hours, dec in degrees. Temp in degrees Celsius.
-              Pressure in kPa.
+              Pressure in kPa. site: Site (default WALTZ).
        Output: Refraction correction in arcminutes.
        
        The term true coordinates stems from the Wikipedia article about
@@ -474,7 +514,7 @@ def calculate_refraction_from_true_coord(ha,dec,temp=10,press=101.0):
        I should look into this and change the variable names if it it correct.
     """
     #Calculate altitude and azimuth
-    alt,az,_,__=equ_to_altaz(ha,dec)
+    alt,az=equ_to_altaz(ha,dec,site=site)
     #Calculate temperature/pressure factor
     factor= press/101*283/(273+temp)
     #Calculate refraction in arcminutes
@@ -482,11 +522,12 @@ def calculate_refraction_from_true_coord(ha,dec,temp=10,press=101.0):
     
     return R
     
-def calculate_refraction_from_apparent_coord(ha,dec,temp=10,press=101.0):
+def calculate_refraction_from_apparent_coord(ha,dec,temp=10,press=101.0,
+                                             site=None):
     """Calculates refraction for given coordinates.
     
        Input: Apparent ha in hours, dec in degrees. Temp in degrees Celsius.
-              Pressure in kPa.
+              Pressure in kPa. site: Site (default WALTZ).
        Output: Refraction correction in arcminutes.
        
        The term true coordinates stems from the Wikipedia article about
@@ -496,7 +537,7 @@ def calculate_refraction_from_apparent_coord(ha,dec,temp=10,press=101.0):
        I should look into this and change the variable names if it it correct.
     """
     #Calculate altitude and azimuth
-    alt,az,_,__=equ_to_altaz(ha,dec)
+    alt,az=equ_to_altaz(ha,dec,site=site)
     #Calculate temperature/pressure factor
     factor= press/101*283/(273+temp)
     #Calculate refraction in arcminutes
@@ -505,12 +546,12 @@ def calculate_refraction_from_apparent_coord(ha,dec,temp=10,press=101.0):
     return R
 
 def calculate_apparent_pos_from_true_pos(ha_true,dec_true,
-                                         temp=10,press=101.0):
+                                         temp=10,press=101.0,site=None):
     """Calculates apparent position (accounting for refraction) 
        for given true coordinates.
     
        Input: True ha in hours, dec in degrees. Temp in degrees Celsius.
-              Pressure in kPa.
+              Pressure in kPa. site: Site (default WALTZ).
        Output: Apparent ha in hours, dec in degrees.
        
        The term true coordinates stems from the Wikipedia article about
@@ -520,10 +561,11 @@ def calculate_apparent_pos_from_true_pos(ha_true,dec_true,
        I should look into this and change the variable names if it it correct.
     """
     #Calculate true alt and az
-    alt_true,az_true,_,__=equ_to_altaz(ha_true,dec_true)
+    alt_true,az_true=equ_to_altaz(ha_true,dec_true,site=site)
     #Calculate Refraction in arcminutes
     R_arcmin=calculate_refraction_from_true_coord(ha_true,dec_true,
-                                                  temp=temp,press=press)
+                                                  temp=temp,press=press,
+                                                  site=site)
     #Transform to degrees
     R_deg=R_arcmin/60.
     
@@ -534,7 +576,7 @@ def calculate_apparent_pos_from_true_pos(ha_true,dec_true,
     az_app=az_true
     
     #Transform to ha and dec
-    ha_app,dec_app=altaz_to_equ(alt_app,az_app)
+    ha_app,dec_app=altaz_to_equ(alt_app,az_app,site=site)
     
     return ha_app, dec_app
 
@@ -0,0 +1,192 @@
+"""Coordinate value types shared by the commands, telemetry, GUI and plots.
+
+   Positions store their angles in radians. Derived representations
+   (sexagesimal strings, hour angle, altitude and azimuth) are computed
+   on first use and memoized, so a position that is displayed, plotted
+   and checked at the same LST is formatted and transformed only once.
+   Positions are immutable, a new position is created when the
+   coordinates change.
+"""
+import threading
+from math import pi, radians, degrees, sin, cos, asin, atan2
+
+from observatory import WALTZ
+
+#Units of hour angle/ra and degree strings
+HMS=('h','m','s')
+DMS=('°',"'",'"')
+
+#Guards the LST memo of all EquatorialPositions (telemetry and slew
+#tracker threads read the same position)
+_lst_lock=threading.Lock()
+
+def format_sexagesimal(value, units=DMS, signed=True):
+    """Formats value (hours or degrees) as e.g. +dd°mm'ss".
+
+       units: strings behind the three fields.
+       signed: Prefix positive values with '+'.
+       Seconds are rounded with carry into minutes and the whole unit.
+    """
+    sign='-' if value<0 else ('+' if signed else '')
+    seconds=int(round(abs(value)*3600.))
+    minutes,seconds=divmod(seconds,60)
+    whole,minutes=divmod(minutes,60)
+    return '{}{:02}{}{:02}{}{:02}{}'.format(sign,whole,units[0],
+                                            minutes,units[1],
+                                            seconds,units[2])
+
+def format_dms(value):
+    """Formats degrees as +dd°mm'ss".
+    """
+    return format_sexagesimal(value,DMS)
+
+def format_hms(value, signed=True):
+    """Formats hours as +hhhmmmsss.
+    """
+    return format_sexagesimal(value,HMS,signed)
+
+class HorizontalPosition:
+    """Altitude and azimuth in radians (azimuth 0 in the south,
+       positive towards west).
+    """
+    __slots__=('alt','az','_alt_string','_az_string')
+
+    def __init__(self, alt, az):
+        self.alt=alt
+        self.az=az
+        self._alt_string=None
+        self._az_string=None
+
+    @classmethod
+    def from_degrees(cls, alt, az):
+        return cls(radians(alt),radians(az))
+
+    @property
+    def alt_degrees(self):
+        return degrees(self.alt)
+
+    @property
+    def az_degrees(self):
+        return degrees(self.az)
+
+    @property
+    def alt_string(self):
+        """Altitude as +dd°mm'ss".
+        """
+        if self._alt_string is None:
+            self._alt_string=format_dms(self.alt_degrees)
+        return self._alt_string
+
+    @property
+    def az_string(self):
+        """Azimuth as +dd°mm'ss".
+        """
+        if self._az_string is None:
+            self._az_string=format_dms(self.az_degrees)
+        return self._az_string
+
+    def __repr__(self):
+        return 'HorizontalPosition(alt={}, az={})'.format(self.alt_string,
+                                                          self.az_string)
+
+class EquatorialPosition:
+    """Right ascension and declination in radians.
+
+       Hour angle and horizontal position depend on the LST. They are
+       memoized for the last LST value only (not a cache over LSTs):
+       a new LST, as of every poll, replaces the memo. It pays off when
+       the consumers of a refresh tick pass the same LST.
+    """
+    __slots__=('ra','dec','_ra_string','_dec_string','_at_lst')
+
+    def __init__(self, ra, dec, ra_string=None, dec_string=None):
+        """ra, dec: coordinates in radians.
+           ra_string, dec_string: display strings (e.g. of the controller).
+                                  Formatted on first use if None.
+        """
+        self.ra=ra
+        self.dec=dec
+        self._ra_string=ra_string
+        self._dec_string=dec_string
+        #[lst, hour angle, hour angle string, HorizontalPosition, its Site]
+        #Only read and written with _lst_lock held
+        self._at_lst=None
+
+    @classmethod
+    def from_hours(cls, ra, dec, ra_string=None, dec_string=None):
+        """ra in hours, dec in degrees.
+        """
+        return cls(ra*pi/12.,radians(dec),ra_string,dec_string)
+
+    @property
+    def ra_hours(self):
+        return self.ra*12./pi
+
+    @property
+    def dec_degrees(self):
+        return degrees(self.dec)
+
+    @property
+    def ra_string(self):
+        """Right ascension as hhhmmmsss.
+        """
+        if self._ra_string is None:
+            self._ra_string=format_hms(self.ra_hours,signed=False)
+        return self._ra_string
+
+    @property
+    def dec_string(self):
+        """Declination as +dd°mm'ss".
+        """
+        if self._dec_string is None:
+            self._dec_string=format_dms(self.dec_degrees)
+        return self._dec_string
+
+    def _cache(self, lst):
+        """Returns the memo of lst. Call with _lst_lock held.
+        """
+        cache=self._at_lst
+        if cache is None or cache[0]!=lst:
+            #Hour angle in range [-12,12)
+            cache=[lst,(lst-self.ra_hours+12.)%24.-12.,None,None,None]
+            self._at_lst=cache
+        return cache
+
+    def hour_angle(self, lst):
+        """Returns hour angle in hours in range [-12,12) for lst in hours.
+        """
+        with _lst_lock:
+            return self._cache(lst)[1]
+
+    def ha_string(self, lst):
+        """Returns hour angle as +hhhmmmsss for lst in hours.
+        """
+        with _lst_lock:
+            cache=self._cache(lst)
+            if cache[2] is None:
+                cache[2]=format_hms(cache[1])
+            return cache[2]
+
+    def horizontal(self, lst, site=WALTZ):
+        """Returns HorizontalPosition for lst in hours at site.
+        """
+        with _lst_lock:
+            cache=self._cache(lst)
+            if cache[3] is None or cache[4] is not site:
+                #Same formulae as coord_operations.equ_to_altaz_kernel
+                sin_lat,cos_lat=site.sin_lat,site.cos_lat
+                ha=cache[1]*pi/12.
+                sin_dec=sin(self.dec)
+                cos_dec=cos(self.dec)
+                cos_dec_cos_ha=cos_dec*cos(ha)
+                alt=asin(max(-1.,min(1.,sin_lat*sin_dec+
+                                     cos_lat*cos_dec_cos_ha)))
+                az=atan2(cos_dec*sin(ha),
+                         sin_lat*cos_dec_cos_ha-cos_lat*sin_dec)
+                cache[3]=HorizontalPosition(alt,az)
+                cache[4]=site
+            return cache[3]
+
+    def __repr__(self):
+        return 'EquatorialPosition(ra={}, dec={})'.format(self.ra_string,
+                                                          self.dec_string)
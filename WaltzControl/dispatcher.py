@@ -0,0 +1,248 @@
+import threading
+import queue
+import itertools
+import time
+from collections import deque
+
+#Priority classes of LX200 commands. Lower numbers are sent first.
+EMERGENCY_STOP=0
+MOTION=1
+TARGET=2
+TELEMETRY=3
+
+#Expected reply of each LX200 command:
+#None (no reply), number of characters or terminator.
+#Slew (MS) answers '0' or an error message; only the first character is read.
+REPLIES={b'GR':b'#', b'GD':b'#',
+         b'Sr':1, b'Sd':1,
+         b'MS':1, b'CM':b'#',
+         b'Mw':None, b'Me':None, b'Mn':None, b'Ms':None,
+         b'Q':None, b'Qw':None, b'Qe':None, b'Qn':None, b'Qs':None,
+         b'RS':None, b'RM':None, b'RC':None, b'RG':None,
+         b'U':None}
+
+#Priority class of each LX200 command
+PRIORITIES={b'Q':EMERGENCY_STOP, b'Qw':EMERGENCY_STOP, b'Qe':EMERGENCY_STOP,
+            b'Qn':EMERGENCY_STOP, b'Qs':EMERGENCY_STOP,
+            b'Mw':MOTION, b'Me':MOTION, b'Mn':MOTION, b'Ms':MOTION,
+            b'MS':MOTION,
+            b'Sr':TARGET, b'Sd':TARGET, b'CM':TARGET, b'U':TARGET,
+            b'RS':TARGET, b'RM':TARGET, b'RC':TARGET, b'RG':TARGET,
+            b'GR':TELEMETRY, b'GD':TELEMETRY}
+
+def command_name(inp):
+    """Returns the LX200 command name of inp, e.g. b'Sr' for b'#:Sr12:00:00#'.
+    """
+    body=inp.strip(b'#').lstrip(b':')
+    if body[1:2].isalpha():
+        return body[:2]
+    return body[:1]
+
+def reply_of(inp):
+    """Returns the expected reply of inp as (terminator, size).
+
+       Unknown commands are expected to answer with a '#' terminated string.
+    """
+    reply=REPLIES.get(command_name(inp),b'#')
+    if reply is None:
+        return None
+    if isinstance(reply,int):
+        return (None,reply)
+    return (reply,None)
+
+def priority_of(inp):
+    """Returns the priority class of inp (TARGET for unknown commands).
+    """
+    return PRIORITIES.get(command_name(inp),TARGET)
+
+class Request:
+    """A command waiting to be sent together with its response.
+    """
+    __slots__=('inp','name','priority','reply','event','response','error',
+               'cancelled','submitted','sent','done')
+
+    def __init__(self, inp, priority, reply):
+        self.inp=inp
+        self.name=command_name(inp).decode()
+        self.priority=priority
+        self.reply=reply
+        self.event=threading.Event()
+        self.response=''
+        self.error=None
+        self.cancelled=False
+        self.submitted=time.monotonic()
+        self.sent=None
+        self.done=None
+
+    def wait(self, timeout=None):
+        """Waits until the request is done and returns the response.
+
+           Returns '' if the request is not done within timeout
+           or was cancelled.
+        """
+        if not self.event.wait(timeout):
+            return ''
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+class LatencyStats:
+    """Latency statistics of one command.
+    """
+    def __init__(self, length=1000):
+        self.count=0
+        self.latencies=deque(maxlen=length)
+        self.wire_times=deque(maxlen=length)
+
+    def add(self, latency, wire_time):
+        self.count+=1
+        self.latencies.append(latency)
+        self.wire_times.append(wire_time)
+
+    def summary(self):
+        """Returns count and mean, median, 95th percentile and
+           maximum of the recent latencies in ms.
+        """
+        latencies=sorted(self.latencies)
+        n=len(latencies)
+        return {'count':self.count,
+                'mean':1000*sum(latencies)/n,
+                'p50':1000*latencies[n//2],
+                'p95':1000*latencies[min(n-1,int(0.95*n))],
+                'max':1000*latencies[-1],
+                'wire_mean':1000*sum(self.wire_times)/n}
+
+class CommandDispatcher(threading.Thread):
+    """Single thread, which sends all commands to the serial port.
+
+       Commands are queued by priority class (EMERGENCY_STOP, MOTION,
+       TARGET, TELEMETRY) and sent one after another, each together with
+       reading its expected reply. So writes and responses of different
+       callers can't be interleaved.
+       Emergency stops don't wait in the queue. They are written
+       immediately, since they have no reply that could be confused.
+       Motion commands still waiting are cancelled by an emergency stop,
+       so they can't start the mount again after it.
+    """
+    def __init__(self, port):
+        """port: CommunicationCommands instance.
+        """
+        super().__init__(daemon=True)
+        self.port=port
+        self._queue=queue.PriorityQueue()
+        #Counter keeps the order of requests with equal priority
+        self._counter=itertools.count()
+        #Queued motion requests, which are cancelled by emergency stops
+        self._motion_lock=threading.Lock()
+        self._motion=set()
+        self._stats_lock=threading.Lock()
+        self._stats={}
+
+    def submit(self, inp, priority=None, reply=False):
+        """Queues inp and returns its Request.
+
+           priority: priority class (default from PRIORITIES).
+           reply: (terminator, size) or None for no reply
+                  (default from REPLIES).
+        """
+        if priority is None:
+            priority=priority_of(inp)
+        if reply is False:
+            reply=reply_of(inp)
+        request=Request(inp,priority,reply)
+        if priority==EMERGENCY_STOP and reply is None:
+            self._emergency(request)
+            return request
+        if priority==MOTION:
+            with self._motion_lock:
+                self._motion.add(request)
+        self._queue.put((priority,next(self._counter),request))
+        return request
+
+    def request(self, inp, priority=None, reply=False):
+        """Sends inp and waits for its response.
+
+           Returns '' on timeout. A request, which has not been sent
+           until then, is cancelled, so it can't take effect after the
+           caller has given up.
+        """
+        request=self.submit(inp,priority,reply)
+        #Wait at most for all requests in front and the own response
+        response=request.wait(timeout=self.port.response_timeout*
+                              (self._queue.qsize()+2))
+        if not request.event.is_set():
+            request.cancelled=True
+        return response
+
+    def stop(self):
+        """Stops the dispatcher after all queued requests.
+        """
+        self._queue.put((TELEMETRY+1,next(self._counter),None))
+
+    def statistics(self):
+        """Returns latency statistics per command name (see LatencyStats).
+        """
+        with self._stats_lock:
+            return {name:stats.summary()
+                    for name,stats in self._stats.items()}
+
+    def run(self):
+        while True:
+            priority,count,request=self._queue.get()
+            if request is None:
+                return
+            if request.priority==MOTION:
+                with self._motion_lock:
+                    self._motion.discard(request)
+            if request.cancelled:
+                self._finish(request)
+            else:
+                self._execute(request)
+
+    def _execute(self, request):
+        """Writes request and reads its reply.
+        """
+        port=self.port
+        try:
+            with port.port_lock:
+                #The caller may have given up while the port was busy
+                if request.cancelled:
+                    self._finish(request)
+                    return
+                request.sent=time.monotonic()
+                if request.reply is None:
+                    port._write(request.inp)
+                else:
+                    terminator,size=request.reply
+                    request.response=port._transfer(request.inp,
+                                                    terminator=terminator,
+                                                    size=size)
+        except Exception as error:
+            request.error=error
+        self._finish(request)
+
+    def _emergency(self, request):
+        """Cancels waiting motion requests and
+           writes request immediately, bypassing the queue.
+        """
+        with self._motion_lock:
+            for motion in self._motion:
+                motion.cancelled=True
+            self._motion.clear()
+        try:
+            request.sent=time.monotonic()
+            self.port._write(request.inp)
+        except Exception as error:
+            request.error=error
+        self._finish(request)
+
+    def _finish(self, request):
+        request.done=time.monotonic()
+        if request.cancelled:
+            request.event.set()
+            return
+        with self._stats_lock:
+            stats=self._stats.setdefault(request.name,LatencyStats())
+            stats.add(request.done-request.submitted,
+                      request.done-request.sent)
+        request.event.set()
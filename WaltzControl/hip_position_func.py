@@ -1,30 +1,67 @@
+from functools import lru_cache
+
 import numpy as np
 
 import hipparcos
 from skyfield.api import utc
 from skyfield.api import Star, load
-from skyfield.api import Topos
 
-def hip_position(hip_nr,temperature=15, pressure=1005):
+from observatory import WALTZ
+
+@lru_cache()
+def _load_ephemeris():
+    """Returns list of planets and timescale (loaded once per process).
+    """
+    return load('de421.bsp'),load.timescale()
+
+class ObserverContext:
+    """Holds ephemeris, timescale and topocentric position of a site.
+
+       Loading de421.bsp and the timescale is slow.
+       Create it only once per process and site via get_observer()
+       and share it. All sites share the ephemeris.
+    """
+    def __init__(self, site=WALTZ):
+        self.site=site
+        #Load list of planets and specify to earth to get obersver, then specify to location of the site
+        self.planets,self.ts=_load_ephemeris()
+        self.earth=self.planets['earth']
+        self.location=self.earth+site.topos()
+
+    def now(self):
+        """Returns current time as skyfield Time.
+        """
+        return self.ts.now()
+
+#Shared observer contexts of this process by site. Created on first use.
+_observers={}
+
+def get_observer(site=WALTZ):
+    """Returns the observer context of site for this process.
+
+       Creates it on first call.
+    """
+    observer=_observers.get(site)
+    if observer is None:
+        observer=_observers.setdefault(site,ObserverContext(site))
+    return observer
+
+def hip_position(hip_nr,temperature=15, pressure=1005, site=WALTZ):
     """ Returns uncorrected and refraction corrected apparent positions of stars in the Hipparcos catalogue.
     
-        Position is specified to Waltz observer.
+        Position is specified to the observer at site (default Waltz).
     """
-    #Load list of planets and specify to earth to get obersver, then specify to location of Waltz
-    planets=load('de421.bsp')
-    earth=planets['earth']
-    waltz=earth+Topos('49.3978620896919 N','8.724700212478638 E', elevation_m=562.0 )
+    observer=get_observer(site)
     
     #Load current time.
-    ts=load.timescale()
-    t=ts.now()
+    t=observer.now()
     #t=t.utc #Convert
 
     #Load star catalogue coordinates from hipparcos.py module
     star=hipparcos.get(hip_nr)
     
-    #Compute astrometric and apparent coordinates for Waltz at time t 
-    astrometric= waltz.at(t).observe(star)
+    #Compute astrometric and apparent coordinates for the site at time t
+    astrometric= observer.location.at(t).observe(star)
     apparent= astrometric.apparent()
     #Change to alt, az coordinates to compute refraction correction, then change back again
     #Change Temp and pressure
@@ -40,3 +77,37 @@ def hip_position(hip_nr,temperature=15, pressure=1005):
 
     
     return [ra_calc,dec_calc,ra_calc_without_refraction,dec_calc_without_refraction]
+
+def hip_positions(hip_nrs,times,temperature=15,pressure=1005,site=WALTZ):
+    """ Vectorized version of hip_position for many stars at many times.
+
+        hip_nrs: sequence of Hipparcos numbers (duplicates allowed).
+        times: skyfield Time array or sequence of UTC datetimes,
+               one observation time per Hipparcos number.
+
+        Returns refraction corrected ra (hours), dec (degrees) and
+        refraction uncorrected ra (hours), dec (degrees) as numpy arrays.
+        All stars are computed in one skyfield call.
+        site: Site of the observer (default Waltz).
+    """
+    observer=get_observer(site)
+    if not hasattr(times,'tt'):
+        times=observer.ts.utc(list(times))
+
+    #One Star object holding all catalogue positions
+    stars=hipparcos.get_star_array(hip_nrs)
+
+    #Compute astrometric and apparent coordinates for the site at all times
+    apparent=observer.location.at(times).observe(stars).apparent()
+    #Refraction correction via alt, az (see hip_position)
+    alt, az, distance=apparent.altaz(temperature_C=temperature, pressure_mbar=pressure)
+    corrected=apparent.from_altaz(alt=alt, az=az)
+
+    ra_calc,dec_calc,distance=corrected.radec()
+    ra_calc_without_refraction,dec_calc_without_refraction,distance=apparent.radec(epoch='date')
+
+    return (np.asarray(ra_calc.hours),
+            np.asarray(dec_calc.degrees),
+            np.asarray(ra_calc_without_refraction.hours),
+            np.asarray(dec_calc_without_refraction.degrees))
+
@@ -1,4 +1,7 @@
 import gzip
+import pathlib
+
+import numpy as np
 from skyfield.functions import to_polar
 from skyfield.starlib import Star
 from skyfield.timelib import T0
@@ -7,16 +10,50 @@ from skyfield.units import Angle
 days = T0 - 2448349.0625
 url = 'ftp://cdsarc.u-strasbg.fr/cats/I/239/hip_main.dat.gz'
 
-def parse(line):
-    """Return a `Star` build by parsing a Hipparcos catalog entry `line`."""
+#Local binary copy of the catalog, written once by build_store()
+store_path = pathlib.Path(__file__).with_name('hip_main.npy')
+
+#One fixed-width record per catalog entry.
+#Entries without astrometric solution are stored with NaN.
+store_dtype = np.dtype([('hip', '<i4'),
+                        ('ra', '<f8'),
+                        ('dec', '<f8'),
+                        ('ra_mas_per_year', '<f8'),
+                        ('dec_mas_per_year', '<f8'),
+                        ('parallax_mas', '<f8')])
+
+#Memory mapped store and HIP->row index, loaded on first use
+_store = None
+_index = None
+
+def _float(field):
+    """Return `field` as float or NaN if the catalog field is blank."""
+    field = field.strip()
+    if not field:
+        return float('nan')
+    return float(field)
+
+def _fields(line):
+    """Return the fields of a Hipparcos catalog entry `line` as a tuple
+    in the order of `store_dtype`.
+    """
     # See ftp://cdsarc.u-strasbg.fr/cats/I/239/ReadMe
+    return (int(line[8:14]),
+            _float(line[51:63]),
+            _float(line[64:76]),
+            _float(line[87:95]),
+            _float(line[96:104]),
+            _float(line[79:86]))
+
+def _star(hip, ra, dec, ra_mas_per_year, dec_mas_per_year, parallax_mas):
+    """Return a `Star` build from catalog values (J1991.25 epoch)."""
     star = Star(
-        ra=Angle(degrees=float(line[51:63])),
-        dec=Angle(degrees=float(line[64:76])),
-        ra_mas_per_year=float(line[87:95]),
-        dec_mas_per_year=float(line[96:104]),
-        parallax_mas=float(line[79:86]),
-        names=[('HIP', int(line[8:14]))],
+        ra=Angle(degrees=ra),
+        dec=Angle(degrees=dec),
+        ra_mas_per_year=ra_mas_per_year,
+        dec_mas_per_year=dec_mas_per_year,
+        parallax_mas=parallax_mas,
+        names=[('HIP', hip)],
         )
     star._position_au += star._velocity_au_per_d * days
     distance, dec, ra = to_polar(star._position_au)
@@ -24,6 +61,17 @@ def parse(line):
     star.dec = Angle(radians=dec)
     return star
 
+def _record_star(fields):
+    """Return a `Star` build from a record with the fields of `store_dtype`."""
+    #Behave like float('') for entries without astrometric solution
+    if np.isnan(fields[1]):
+        raise ValueError('HIP {} has no position'.format(fields[0]))
+    return _star(*fields)
+
+def parse(line):
+    """Return a `Star` build by parsing a Hipparcos catalog entry `line`."""
+    return _record_star(_fields(line))
+
 def load(match_function):
     """Yield the Hipparcos stars for which `match_function(line)` is true."""
     from skyfield import api
@@ -33,15 +81,109 @@ def load(match_function):
             if match_function(line):
                 yield parse(line)
 
+def build_store(path=store_path):
+    """Reads the whole catalog once and saves it as fixed-width binary store.
+
+       Afterwards get() works offline and without scanning the catalog.
+    """
+    from skyfield import api
+
+    with api.load.open(url) as f:
+        records = [_fields(line) for line in gzip.GzipFile(fileobj=f)]
+    store = np.array(records, dtype=store_dtype)
+    np.save(str(path), store)
+    print('Saved {} Hipparcos entries to {}'.format(len(store), path))
+    return store
+
+def load_store(path=store_path):
+    """Returns memory mapped store and HIP->row index.
+
+       Returns (None, None) if the store has not been built yet.
+    """
+    global _store, _index
+    if _store is None:
+        try:
+            store = np.load(str(path), mmap_mode='r')
+        except (OSError, ValueError):
+            return None, None
+        #Dense index: _index[hip] is the row of hip or -1
+        index = np.full(store['hip'].max() + 1, -1, dtype=np.int32)
+        index[store['hip']] = np.arange(len(store), dtype=np.int32)
+        _store, _index = store, index
+    return _store, _index
+
+def lookup(which):
+    """Returns the store records of the HIP numbers in `which`.
+
+       Unknown HIP numbers are dropped. Returns None if there is no store.
+    """
+    store, index = load_store()
+    if store is None:
+        return None
+    hip = np.atleast_1d(np.asarray(which, dtype=int))
+    known = (hip > 0) & (hip < len(index))
+    rows = index[hip[known]]
+    return store[rows[rows >= 0]]
+
 def get(which):
     """Return a single star, or a list of stars, from the Hipparcos catalog.
     A call like `get('54061')` returns a single `Star` object, while
     `get(['54061', '53910'])` returns a list of stars.
+
+    Uses the local store if it exists and falls back to
+    scanning the gzipped catalog otherwise.
     """
     if isinstance(which, str):
-        pattern = ('H|      %6s' % which).encode('ascii')
-        for star in load(lambda line: line.startswith(pattern)):
-            return star
+        records = lookup([int(which)])
+        if records is None:
+            pattern = ('H|      %6s' % which).encode('ascii')
+            for star in load(lambda line: line.startswith(pattern)):
+                return star
+            return None
+        for record in records:
+            return _record_star(record.tolist())
     else:
-        patterns = set(id.encode('ascii').rjust(6) for id in which)
-        return list(load(lambda line: line[8:14] in patterns))
+        records = lookup([int(id) for id in which])
+        if records is None:
+            patterns = set(id.encode('ascii').rjust(6) for id in which)
+            return list(load(lambda line: line[8:14] in patterns))
+        return [_record_star(record.tolist()) for record in records]
+
+def get_star_array(which):
+    """Return one `Star` holding the positions of all HIP numbers in
+    `which` as arrays, in the given order (duplicates allowed).
+
+    Raises ValueError if a HIP number is unknown or has no position.
+    """
+    hip = np.asarray([int(id) for id in which], dtype=int)
+    store, index = load_store()
+    if store is None:
+        #Collect the needed entries in a single pass over the catalog
+        patterns = set(('%6d' % id).encode('ascii') for id in hip)
+        from skyfield import api
+        found = {}
+        with api.load.open(url) as f:
+            for line in gzip.GzipFile(fileobj=f):
+                if line[8:14] in patterns:
+                    fields = _fields(line)
+                    found[fields[0]] = fields
+        try:
+            records = np.array([found[id] for id in hip], dtype=store_dtype)
+        except KeyError as error:
+            raise ValueError('Unknown HIP number {}'.format(error))
+    else:
+        known = (hip > 0) & (hip < len(index))
+        rows = np.full(len(hip), -1)
+        rows[known] = index[hip[known]]
+        if np.any(rows < 0):
+            raise ValueError('Unknown HIP number {}'.format(hip[rows < 0][0]))
+        records = store[rows]
+    if np.any(np.isnan(records['ra'])):
+        raise ValueError('HIP {} has no position'.format(
+            records['hip'][np.isnan(records['ra'])][0]))
+    return _star(records['hip'], records['ra'], records['dec'],
+                 records['ra_mas_per_year'], records['dec_mas_per_year'],
+                 records['parallax_mas'])
+
+if __name__ == '__main__':
+    build_store()
@@ -0,0 +1,93 @@
+import time
+
+from observatory import WALTZ
+
+class LSTEngine:
+    """Computes Local Sidereal Time from the system clock.
+
+       Uses the closed form GMST polynomial (IAU 1982, UT1 taken as UTC).
+       The small difference to astropy (UT1-UTC, precession model) is
+       computed with astropy only every refresh_interval seconds
+       and when the UTC date changes (leap seconds are inserted at the
+       end of a day). So the hot path costs only a few float operations.
+    """
+    def __init__(self, site=WALTZ, refresh_interval=3600.):
+        """site: Site of the telescope.
+           refresh_interval: seconds between astropy corrections.
+        """
+        self.site=site
+        #East longitude in degrees
+        self.longitude=site.longitude
+        self.refresh_interval=refresh_interval
+        #Correction in hours added to the polynomial LST
+        self.offset=0.
+        self._refreshed=None
+        self._refreshed_day=None
+
+    def polynomial_LST(self, unix):
+        """Returns LST in hours for unix time from the GMST polynomial only.
+        """
+        #Days and Julian centuries since J2000.0
+        days=unix/86400.-10957.5
+        centuries=days/36525.
+        gmst=(280.46061837+360.98564736629*days+
+              centuries*centuries*(0.000387933-centuries/38710000.))
+        return ((gmst+self.longitude)/15.)%24.
+
+    def refresh(self, unix=None):
+        """Recomputes offset to the astropy mean sidereal time.
+
+           Keeps the previous offset if astropy fails.
+        """
+        if unix is None:
+            unix=time.time()
+        try:
+            from astropy.time import Time
+            exact=Time(unix,format='unix').sidereal_time(
+                'mean',longitude=self.longitude).hour
+        except Exception as error:
+            print('Could not refresh LST offset: {}'.format(error))
+        else:
+            #Offset in range [-12,12]
+            self.offset=float((exact-self.polynomial_LST(unix)+12.)%24.-12.)
+        self._refreshed=unix
+        self._refreshed_day=unix//86400
+
+    def hours(self, unix=None):
+        """Returns LST in hours as float.
+        """
+        if unix is None:
+            unix=time.time()
+        if (self._refreshed is None
+            or unix-self._refreshed>=self.refresh_interval
+            or unix//86400!=self._refreshed_day):
+            self.refresh(unix)
+        return (self.polynomial_LST(unix)+self.offset)%24.
+
+    def string(self, unix=None):
+        """Returns LST formatted as hh:mm:ss (seconds rounded).
+        """
+        return format_hours(self.hours(unix))
+
+def format_hours(hours):
+    """Formats hours (0 to 24) as hh:mm:ss.
+
+       Seconds are rounded, with carry into minutes and hours.
+    """
+    seconds=int(round(hours*3600.))%86400
+    minutes,seconds=divmod(seconds,60)
+    hours,minutes=divmod(minutes,60)
+    return '{:02}:{:02}:{:02}'.format(hours,minutes,seconds)
+
+#Shared LST engines of this process by site. Created on first use.
+_engines={}
+
+def get_engine(site=WALTZ):
+    """Returns the LST engine of site for this process.
+
+       Creates it on first call.
+    """
+    engine=_engines.get(site)
+    if engine is None:
+        engine=_engines.setdefault(site,LSTEngine(site))
+    return engine
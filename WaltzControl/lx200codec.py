@@ -0,0 +1,119 @@
+"""Parsers and formatters for the LX200 coordinate formats.
+
+   Right ascension: hh:mm:ss (high precision) or hh:mm.t (low precision).
+   Declination: sdd*mm:ss (high precision) or sdd*mm (low precision).
+   Replies of the controller end with '#'. Separators are not checked,
+   since controllers differ in them (e.g. ' instead of :).
+
+   Fields are split with precompiled structs and converted to numbers
+   with lookup tables instead of int().
+"""
+import struct
+
+_RA_HIGH=struct.Struct('2sx2sx2s')
+_RA_LOW=struct.Struct('2sx2sx1s')
+_DEC_HIGH=struct.Struct('c2sx2sx2s')
+_DEC_LOW=struct.Struct('c2sx2s')
+
+#Digit tables: b'07' -> 7 and 7 -> b'07'
+_VALUE={}
+for _i in range(100):
+    _VALUE[b'%02d'%_i]=_i
+for _i in range(10):
+    _VALUE[b'%d'%_i]=_i
+_DIGITS=[b'%02d'%_i for _i in range(100)]
+
+def _bytes(response):
+    if isinstance(response,str):
+        return response.encode('latin-1')
+    return response
+
+def decode_ra(response):
+    """Parses a GR reply (str or bytes, with or without '#').
+
+       Returns ra in hours as float and display string
+       (hhhmmmsss or hhhmm.tm). Returns None and the response as string
+       if the format is unknown.
+    """
+    data=_bytes(response).rstrip(b'#')
+    try:
+        if len(data)==8:
+            hours,minutes,seconds=_RA_HIGH.unpack(data)
+            return ((_VALUE[hours]+_VALUE[minutes]/60.+_VALUE[seconds]/3600.),
+                    (b'%sh%sm%ss'%(hours,minutes,seconds)).decode('ascii'))
+        if len(data)==7:
+            hours,minutes,tenths=_RA_LOW.unpack(data)
+            return ((_VALUE[hours]+(_VALUE[minutes]+_VALUE[tenths]/10.)/60.),
+                    (b'%sh%s.%sm'%(hours,minutes,tenths)).decode('ascii'))
+    except KeyError:
+        pass
+    return None,data.decode('latin-1')
+
+def decode_dec(response):
+    """Parses a GD reply (str or bytes, with or without '#').
+
+       Returns dec in degrees as float and display string
+       (sdd°mm'ss" or sdd°mm'). Returns None and the response as string
+       if the format is unknown.
+    """
+    data=_bytes(response).rstrip(b'#')
+    try:
+        if len(data)==9:
+            sign,degrees,minutes,seconds=_DEC_HIGH.unpack(data)
+            value=_VALUE[degrees]+_VALUE[minutes]/60.+_VALUE[seconds]/3600.
+            display=b'%s%s\xc2\xb0%s\'%s"'%(sign,degrees,minutes,seconds)
+        elif len(data)==6:
+            sign,degrees,minutes=_DEC_LOW.unpack(data)
+            value=_VALUE[degrees]+_VALUE[minutes]/60.
+            display=b'%s%s\xc2\xb0%s\''%(sign,degrees,minutes)
+        else:
+            return None,data.decode('latin-1')
+    except KeyError:
+        return None,data.decode('latin-1')
+    if sign==b'-':
+        value=-value
+    return value,display.decode('utf-8')
+
+def _split(value,scale,sub,limit):
+    """Rounds value (>=0) to 1/scale of its unit, clips it to limit units
+       and splits it into unit and two smaller fields with carry
+       (e.g. scale=3600, sub=60 for degrees, minutes and seconds).
+    """
+    total=min(int(round(value*scale)),limit*scale)
+    unit,rest=divmod(total,scale)
+    return (unit,)+divmod(rest,sub)
+
+def encode_ra(ra,high_precision=True):
+    """Returns ra (in hours) as LX200 string (bytes) without '#'.
+
+       hh:mm:ss or hh:mm.t. Wraps to 0 <= ra < 24.
+    """
+    if high_precision:
+        hours,minutes,seconds=_split(ra%24.,3600,60,24)
+        return b'%s:%s:%s'%(_DIGITS[hours%24],_DIGITS[minutes],
+                            _DIGITS[seconds])
+    hours,minutes,tenths=_split(ra%24.,600,10,24)
+    return b'%s:%s.%d'%(_DIGITS[hours%24],_DIGITS[minutes],tenths)
+
+def encode_dec(dec,high_precision=True):
+    """Returns dec (in degrees) as LX200 string (bytes) without '#'.
+
+       sdd*mm:ss or sdd*mm. Clipped to +-90 degrees.
+    """
+    sign=b'-' if dec<0 else b'+'
+    if high_precision:
+        degrees,minutes,seconds=_split(abs(dec),3600,60,90)
+        return b'%s%s*%s:%s'%(sign,_DIGITS[degrees],_DIGITS[minutes],
+                              _DIGITS[seconds])
+    degrees,minutes,_=_split(abs(dec),60,1,90)
+    return b'%s%s*%s'%(sign,_DIGITS[degrees],_DIGITS[minutes])
+
+def target_ra_input(ra,high_precision=True):
+    """Returns LX200 input setting target ra (in hours).
+    """
+    return b'#:Sr'+encode_ra(ra,high_precision)+b'#'
+
+def target_dec_input(dec,high_precision=True):
+    """Returns LX200 input setting target dec (in degrees).
+    """
+    return b'#:Sd'+encode_dec(dec,high_precision)+b'#'
@@ -3,21 +3,33 @@ import re
 import threading
 import pathlib
 import math
-
-from astropy.time import Time
+from collections import deque
 
 import communication_commands as com
-from hip_position_func import hip_position
-from coord_operations import equ_to_altaz, check_coordinates, approx_obs_time
+from coord_operations import check_coordinates, approx_obs_time
+from telemetry import TelemetryWorker, MountState
+from slew_tracker import SlewTracker, ra_difference
+from lst_engine import get_engine, format_hours
+from timed_moves import MoveHandle
+from lx200codec import (decode_ra, decode_dec, encode_ra, encode_dec,
+                        target_ra_input, target_dec_input)
+from slew_planner import plan_slew
+from coordinates import EquatorialPosition, format_sexagesimal
+from observatory import WALTZ
 
 class Lx200Commands(com.CommunicationCommands):
     """Inherits from CommunicationCommands and thus from Serial.
        Contains all commands, which use the lx200 protocol.
     """
-    def __init__(self):
-        super().__init__()
+    def __init__(self, site=WALTZ, port=None):
+        """site: Site of the telescope (see observatory).
+           port: serial port (default: communication_commands.default_port).
+        """
+        super().__init__(port)
+        self.site=site
         self.LST=''
         self.LST_float=0
+        self.lst_engine=get_engine(site)
         
         #Store the current coordinates as strings
         self.ra=''
@@ -27,6 +39,8 @@ class Lx200Commands(com.CommunicationCommands):
         self.ra_float=0
         self.dec_float=0
         self.ha_float=0
+        #Current coordinates as EquatorialPosition (None if not readable)
+        self.position=None
         
         #Store the Target coordinates as strings
         self.target_ra=False
@@ -48,9 +62,25 @@ class Lx200Commands(com.CommunicationCommands):
         self.target_ha_float=False
         self.target_alt_float=False
         self.target_az_float=False
+        #Target as EquatorialPosition (see calculate_target_alt_az_ha)
+        self.target_position=None
         #Store the leftover observing time for current target.
         self.target_obs_time=""
         
+        #Background worker polling the coordinates (see start_telemetry)
+        self.telemetry=None
+        #Running timed moves by direction (see move)
+        self.moves={}
+        #Tracker of the last slew (see track_slew)
+        self.slew_tracker=None
+        #Waypoints still to slew to, None for the final slew to the target
+        #(see slew_to_target)
+        self.slew_legs=deque()
+        #Estimated slew rate of both axes in degrees per second and
+        #time to start and stop a slew in seconds (see predict_meridian_ra)
+        self.slew_rate=2.
+        self.slew_overhead=0.5
+        
         
     
     def get_coordinates(self):
@@ -61,110 +91,82 @@ class Lx200Commands(com.CommunicationCommands):
         """
         #Right Ascension
         inp=b'#:GR#'
-        self.write(inp)
-        unformated_ra=self.get_response()
+        unformated_ra=self.query(inp)
         
         #Check connection with unformated_ra
         super().check_connection_via_response(unformated_ra)
         
-        #Format hh mm.t
-        if len(unformated_ra)==9:
-            #Formating string output Right Ascension
-            self.ra='{}h{}m{}s'.format(unformated_ra[0:2],
-                                       unformated_ra[3:5],
-                                       unformated_ra[6:8])
-            #Formating float output Right Ascension
-            self.ra_float=(int(unformated_ra[0:2])+
-                           int(unformated_ra[3:5])/60.+
-                           int(unformated_ra[6:8])/3600.)
-            
-        elif len(unformated_ra)==8:
-            #Formating string output Declination
-            self.ra='{}h{}m'.format(unformated_ra[0:2],
-                                    unformated_ra[3:7])
-            #Formating float output Right Ascension
-            self.ra_float=(int(unformated_ra[0:2])+
-                           float(unformated_ra[3:7])/60.)
-        else:
+        #Formats hh mm ss and hh mm.t
+        self.ra_float,self.ra=decode_ra(unformated_ra)
+        readable=True
+        if self.ra_float is None:
+            readable=False
             self.ra=unformated_ra
             self.ra_float=0
         
         #Declination
         inp=b'#:GD#'
-        self.write(inp)
-        unformated_dec=self.get_response()
-        #Format dd mm ss
-        if len(unformated_dec)==10:
-            #Formating string output Declination
-            self.dec='''{}°{}'{}"'''.format(unformated_dec[0:3],
-                                            unformated_dec[4:6],
-                                            unformated_dec[7:9])
-            #Formating float output Declination
-            #Case 1: Positive 
-            if unformated_dec[0]=='+':
-                self.dec_float=(int(unformated_dec[0:3])+
-                                int(unformated_dec[4:6])/60.+
-                                int(unformated_dec[7:9])/3600.)
-            #Case 2: Negative
-            elif unformated_dec[0]=='-':
-                self.dec_float=(int(unformated_dec[0:3])-
-                                int(unformated_dec[4:6])/60.-
-                                int(unformated_dec[7:9])/3600.)
-        #Format dd mm                                                           
-        elif len(unformated_dec)==7:
-            #Formating string output Declination
-            self.dec="""{}°{}'""".format(unformated_dec[0:3],
-                                         unformated_dec[4:6])
-            #Formating float output Declination
-            #Case 1: Positive 
-            if unformated_dec[0]=='+':
-                self.dec_float=(int(unformated_dec[0:3])+
-                                int(unformated_dec[4:6])/60.)
-            #Case 2: Negative
-            elif unformated_dec[0]=='-':
-                self.dec_float=(int(unformated_dec[0:3])-
-                                int(unformated_dec[4:6])/60.)
-        else:
+        unformated_dec=self.query(inp)
+        #Formats dd mm ss and dd mm
+        self.dec_float,self.dec=decode_dec(unformated_dec)
+        if self.dec_float is None:
+            readable=False
             self.dec=unformated_dec
             self.dec_float=0
+        
+        #Keep the position (and its memoized values) while the mount
+        #reports the same coordinates, e.g. while tracking
+        if not readable:
+            self.position=None
+        elif (self.position is None
+              or self.position.ra_string!=self.ra
+              or self.position.dec_string!=self.dec):
+            self.position=EquatorialPosition.from_hours(self.ra_float,
+                                                        self.dec_float,
+                                                        self.ra,self.dec)
             
         #Check connection with unformated_dec
         super().check_connection_via_response(unformated_dec)
             
+    def start_telemetry(self, interval=0.5):
+        """ Starts polling the coordinates in a background thread.
+        
+            Afterwards mount_state() returns the latest coordinates
+            without blocking.
+        """
+        if self.telemetry is None or not self.telemetry.is_alive():
+            self.telemetry=TelemetryWorker(self,interval)
+            self.telemetry.start()
+            
+    def stop_telemetry(self):
+        """ Stops the background polling.
+        """
+        if self.telemetry is not None:
+            self.telemetry.stop()
+            self.telemetry=None
+            
+    def mount_state(self):
+        """ Returns the latest coordinates as MountState.
+        
+            Without telemetry worker the stored coordinates are returned.
+        """
+        if self.telemetry is not None:
+            return self.telemetry.snapshot
+        return MountState(self.ra,self.dec,self.ra_float,self.dec_float,
+                          self.ha_float,time.time(),self.connected)
+            
     def calculate_hour_angle(self):
         """ Takes self.ra and self.LST and calculates hour angle.
             Also calculates hour angle of target as float.
         """
         #Caution: It does not recalculate LST. So if you use it outside GUI it could lead to wrong results.
         #Make sure LST is refreshed.
-        #If No Connection and therefore self.ra_float=0, close function
-        if self.ra_float==0:
+        #If No Connection and therefore no position, close function
+        if self.position is None:
             return 0
-        #Compute the hour angle in range [-12,12]
-        self.ha_float=(self.LST_float-self.ra_float)
-        #hour angles larger than 12 should be converted to negative numbers
-        #e.g. 13 to -11
-        if self.ha_float>12.:
-            self.ha_float=self.ha_float-24.
-        #Get the sign of ha_float
-        if self.ha_float>=0:
-            sign='+'
-        elif self.ha_float<0:
-            sign='-'
-        #Calculate the absolute of ha_float to convert it to hh mm ss
-        ha_float=abs(self.ha_float)
-        #Format hour angle to hh:mm:ss
-        hours=int(ha_float)
-        rest=abs(ha_float-hours)*60
-        minutes=int(rest)
-        rest=abs(rest-minutes)*60
-        #We want to round seconds to get a more continous updating of seconds
-        seconds=round(rest)
-        #But we have to take care of rounding up to 60. Increase minutes by one in that case.
-        if seconds==60:
-            seconds=0
-            minutes=minutes+1
-        self.ha='{}{:02}h{:02}m{:02}s'.format(sign,hours,minutes,seconds)
+        #Hour angle in range [-12,12) and formatted as hh mm ss
+        self.ha_float=self.position.hour_angle(self.LST_float)
+        self.ha=self.position.ha_string(self.LST_float)
         
         
     def calculate_target_alt_az_ha(self):
@@ -177,21 +179,30 @@ class Lx200Commands(com.CommunicationCommands):
         if not self.target_ra or not self.target_dec:
             return 0
         try:
-            #Compute the hour angle in range [-12,12]
+            #Create new position only if the target changed
+            target=self.target_position
+            if (target is None
+                or target.ra_string!=self.target_ra
+                or target.dec_string!=self.target_dec):
+                target=EquatorialPosition.from_hours(self.target_ra_float,
+                                                     self.target_dec_float,
+                                                     self.target_ra,
+                                                     self.target_dec)
+                self.target_position=target
+            #Compute the hour angle in range [-12,12)
             #Right now only as target_ha_float. Formated ha not needed currently.
-            self.target_ha_float=(self.LST_float-self.target_ra_float)
-            if self.target_ha_float>12.:
-                self.target_ha_float=self.target_ha_float-24.
+            self.target_ha_float=target.hour_angle(self.LST_float)
                 
-            #Calculate alt and az
             #Calculate target altitude and azimuth
-            (self.target_alt_float,
-             self.target_az_float,
-             self.target_alt,
-             self.target_az)=equ_to_altaz(self.target_ha_float,self.target_dec_float)
+            horizontal=target.horizontal(self.LST_float,self.site)
+            self.target_alt_float=horizontal.alt_degrees
+            self.target_az_float=horizontal.az_degrees
+            self.target_alt=horizontal.alt_string
+            self.target_az=horizontal.az_string
             
             #Calculate the leftover observing time as float
-            obs_time_float=approx_obs_time(self.target_ha_float,self.target_dec_float)
+            obs_time_float=approx_obs_time(self.target_ha_float,self.target_dec_float,
+                                           self.site)
             
             #Format to 00h00min
             hours=int(obs_time_float)
@@ -208,43 +219,45 @@ class Lx200Commands(com.CommunicationCommands):
         """ Sends move west LX200 command to serial connection
         """
         inp=b'#:Mw#' 
-        self.write(inp)
+        self.send(inp)
         
     def stop_move_west(self):
         """ Sends stop move west LX200 command to serial connection
         """
         inp=b'#:Qw#'
-        self.write(inp)
+        self.send(inp)
     def start_move_north(self):
         inp=b'#:Mn#' 
-        self.write(inp)
+        self.send(inp)
         
     def stop_move_north(self):
         inp=b'#:Qn#'
-        self.write(inp)
+        self.send(inp)
         
     def start_move_south(self):
         inp=b'#:Ms#' 
-        self.write(inp)
+        self.send(inp)
         
     def stop_move_south(self):
         inp=b'#:Qs#'
-        self.write(inp)
+        self.send(inp)
         
     def start_move_east(self):
         inp=b'#:Me#' 
-        self.write(inp)
+        self.send(inp)
         
     def stop_move_east(self):
         inp=b'#:Qe#'
-        self.write(inp)
+        self.send(inp)
         
     def stop_all(self):
         """ Sends All Stop Commands to serial.
             
             Can't stop slew to target commands.
-            Not used in the moment
+            Stop commands bypass all queued commands of the dispatcher.
+            Timed moves are stopped as well.
         """
+        self.cancel_moves()
         self.stop_move_west()
         self.stop_move_east()
         self.stop_move_south()
@@ -255,96 +268,87 @@ class Lx200Commands(com.CommunicationCommands):
         
            Used as STOP command.
            Normal Stop commands won't work during slew.
+           They are sent first anyway (immediately, see stop_all).
         """
+        self.stop_all()
         self.get_coordinates()
         self.set_target_ra_from_string(self.ra)
         self.set_target_dec_from_string(self.dec)
         self.slew_to_target()
     
-    def move_west(self,duration=0.1):
-        """Moves telescope in the west direction for a specified duration at the current slew rate.
-       
-           args: duration: duration of movement in seconds. Default value 0.1s.
-           (This is just a dummy for the moment. 
-           In the future we could for example hand the function the coordinate distance it should move.
-           Moreover we could build a control panel like in Cartes du Ciel.)
+    def move(self,direction,duration=0.1):
+        """Moves telescope in direction for a specified duration at the current slew rate.
+        
+           args: direction: 'west', 'east', 'north' or 'south'.
+                 duration: duration of movement in seconds. Default value 0.1s.
+           Returns immediately with a MoveHandle. The stop command is sent
+           at the deadline by a timer. Use the handle to stop earlier.
         """
+        start,stop={'west':(self.start_move_west,self.stop_move_west),
+                    'east':(self.start_move_east,self.stop_move_east),
+                    'north':(self.start_move_north,self.stop_move_north),
+                    'south':(self.start_move_south,self.stop_move_south)
+                    }[direction]
+        #A new move in the same direction replaces the running one
+        previous=self.moves.get(direction)
+        if previous:
+            previous.cancel(send_stop=False)
         #Start moving the telescope
-        self.start_move_west()
-        
-        #Stoping the telescope movement
-        #Wait specified duration until sending the STOP command
-        time.sleep(duration)
-        self.stop_move_west()
+        start()
+        #Stop it after duration and get the coordinates afterwards
+        handle=MoveHandle(stop,duration,on_stopped=self._after_move)
+        self.moves[direction]=handle
+        return handle
     
-        #Now get and print the coordinates
+    def _after_move(self):
+        """Gets the coordinates after a timed move has been stopped.
+        """
         #Leave some time to respond
         time.sleep(0.1)
         self.get_coordinates()
     
+    def cancel_moves(self):
+        """Cancels the stop timers of all running timed moves.
+        
+           Returns True if a move has been running.
+        """
+        cancelled=False
+        for handle in list(self.moves.values()):
+            cancelled=handle.cancel(send_stop=False) or cancelled
+        return cancelled
+    
+    def move_west(self,duration=0.1):
+        """Moves telescope in the west direction for a specified duration at the current slew rate.
+       
+           args: duration: duration of movement in seconds. Default value 0.1s.
+           Returns a MoveHandle without waiting for the move (see move).
+        """
+        return self.move('west',duration)
+    
     def move_east(self,duration=0.1):
         """Moves telescope in the east direction for a specified duration at the current slew rate.
        
            args: duration: duration of movement in seconds. Default value 0.1s.
-           (This is just a dummy for the moment. 
-           In the future we could for example hand the function the coordinate distance it should move.
-           Moreover we could build a control panel like in Cartes du Ciel.)
+           Returns a MoveHandle without waiting for the move (see move).
         """
-        #Start moving the telescope
-        self.start_move_east()
-        
-        #Stoping the telescope movement
-        #Wait specified duration until sending the STOP command
-        time.sleep(duration)
-        self.stop_move_east()
-    
-        #Now get and print the coordinates
-        #Leave some time to respond
-        time.sleep(0.1)
-        self.get_coordinates()   
+        return self.move('east',duration)
     
     def move_north(self,duration=0.1):
         """Moves telescope in the north direction for a specified duration at the current slew rate.
        
            args: duration: duration of movement in seconds. Default value 0.1s.
-           (This is just a dummy for the moment. 
-           In the future we could for example hand the function the coordinate distance it should move.
-           Moreover we could build a control panel like in Cartes du Ciel.)
+           Returns a MoveHandle without waiting for the move (see move).
         """
-        #Start moving the telescope
-        self.start_move_north()
-        
-        #Stoping the telescope movement
-        #Wait specified duration until sending the STOP command
-        time.sleep(duration)
-        self.stop_move_north()
-    
-        #Now get and print the coordinates
-        #Leave some time to respond
-        time.sleep(0.1)
-        self.get_coordinates()
+        return self.move('north',duration)
     
     def move_south(self,duration=0.1):
         """Moves telescope in the south direction for a specified duration at the current slew rate.
        
            args: duration: duration of movement in seconds. Default value 0.1s.
-           (This is just a dummy for the moment. 
-           In the future we could for example hand the function the coordinate distance it should move.
-           Moreover we could build a control panel like in Cartes du Ciel.)
+           Returns a MoveHandle without waiting for the move (see move).
         """
-        #Start moving the telescope
-        self.start_move_south()
-        
-        #Stoping the telescope movement
-        #Wait specified duration until sending the STOP command
-        time.sleep(duration)
-        self.stop_move_south()
+        return self.move('south',duration)
     
-        #Now get and print the coordinates
-        #Leave some time to respond
-        time.sleep(0.1)
-        self.get_coordinates()
-     
     def set_target_ra_from_string(self,ra):
         """ Takes string of RA in the format hh mm ss or hh mm.t and sets it as a target.
         
@@ -521,7 +525,8 @@ class Lx200Commands(com.CommunicationCommands):
         
         #Sending right ascension
         inp=self.target_input[0].encode()
-        self.write(inp)
+        #Controller answers with a single character (no terminator)
+        output=self.query(inp,size=1)
         #Receive 1 if input is valid and 0 if not
         #Convert to boolean
         #valid_input=self.get_response()
@@ -539,7 +544,6 @@ class Lx200Commands(com.CommunicationCommands):
         
         #We supsect that outputs don't work properly.
         #So we for now just want to listen what serial port responds.
-        output=self.get_response()
         print('Response from serial port:',output)
         
         #Set target_input entry back to 0
@@ -547,7 +551,8 @@ class Lx200Commands(com.CommunicationCommands):
         
         #Sending Declination
         inp=self.target_input[1].encode()
-        self.write(inp)
+        #Controller answers with a single character (no terminator)
+        output=self.query(inp,size=1)
         #Receive 1 if input is valid and 0 if not
         #Convert to boolean
         #valid_input=self.get_response()
@@ -565,7 +570,6 @@ class Lx200Commands(com.CommunicationCommands):
         
         #We supsect that outputs don't work properly.
         #So we for now just want to listen what serial port responds.
-        output=self.get_response()
         print('Response from serial port:',output)
         
         #Set target_input entry back to 0
@@ -610,14 +614,133 @@ class Lx200Commands(com.CommunicationCommands):
     def slew_to_target(self):
         """Slews to target.
            Target must be set before via set_target_dec_from_string and set_target_ra_from_string
+           
+           If the direct slew would cross the limits, the telescope slews
+           via waypoints (see plan_slew). Each leg is started when the
+           slew tracker reports the end of the previous one.
+           Returns 0 if the slew is refused.
         """
         coordinates_set=(self.target_ra, self.target_dec)
         if coordinates_set:
-            inp=b'#:MS#'
-            self.write(inp)
+            #Forget the waypoints of an earlier slew
+            self.slew_legs=deque()
+            waypoints=self.plan_slew()
+            if waypoints is None:
+                print('No safe slew path to target. Slew cancelled')
+                self.forget_slew()
+                return 0
+            if waypoints:
+                self.slew_legs=deque(waypoints+[None])
+                return self._slew_next_leg(self.slew_legs)
+            if not self._start_slew(self.slew_legs):
+                return 0
             print('Slew to target')
+            self.track_slew()
         else:
             return 0
+            
+    def plan_slew(self):
+        """ Returns waypoints (ha, dec) of a safe slew from the current
+            position to the target.
+            
+            [] if the direct slew is safe or the position is unknown,
+            None if there is no safe path. See slew_planner.plan_slew.
+        """
+        if self.target_ra_float is False or self.target_dec_float is False:
+            return []
+        self.get_coordinates()
+        if self.position is None:
+            return []
+        self.get_LST()
+        ha=self.position.hour_angle(self.LST_float)
+        target_ha=(self.LST_float-self.target_ra_float+12.)%24.-12.
+        return plan_slew(ha,self.dec_float,target_ha,self.target_dec_float,
+                         site=self.site)
+        
+    def _slew_next_leg(self, legs, finished=True):
+        """ Slews to the next waypoint of legs or finally to the target.
+        
+            Callback of the slew tracker of each leg. Does nothing if
+            legs belong to an earlier slew_to_target. If a leg was not
+            finished (timeout or cancelled) or is refused by the controller,
+            the remaining legs are dropped. Returns 0 if refused.
+        """
+        if legs is not self.slew_legs or not legs:
+            return
+        if not finished:
+            legs.clear()
+            return
+        leg=legs.popleft()
+        if leg is None:
+            #The waypoints have replaced the target in the controller
+            self.query(target_ra_input(self.target_ra_float),size=1)
+            self.query(target_dec_input(self.target_dec_float),size=1)
+            if not self._start_slew(legs):
+                return 0
+            print('Slew to target')
+            self.track_slew()
+            return
+        ha,dec=leg
+        self.get_LST()
+        #Coordinates as received by the controller
+        ra,_=decode_ra(encode_ra((self.LST_float-ha)%24.))
+        dec,_=decode_dec(encode_dec(dec))
+        self.query(target_ra_input(ra),size=1)
+        self.query(target_dec_input(dec),size=1)
+        if not self._start_slew(legs):
+            return 0
+        print('Slew to waypoint at hour angle {:+.1f}h, dec {:+.0f}°'
+              .format(ha,dec))
+        self.track_slew(lambda finished: self._slew_next_leg(legs,finished),
+                        (ra,dec))
+            
+    def _start_slew(self, legs):
+        """ Starts the slew to the target set in the controller.
+        
+            Returns True if the controller accepted it. Otherwise the
+            remaining legs and the slew tracking are dropped.
+        """
+        reply=self.query(b'#:MS#')
+        if reply=='0':
+            return True
+        print('Slew refused by controller. Slew cancelled')
+        legs.clear()
+        self.forget_slew()
+        return False
+            
+    def track_slew(self, callback=None, target=None):
+        """ Starts following the slew to the current target.
+        
+            callback(finished) is called from the tracker thread when the
+            mount has settled on the target (finished=True) or tracking
+            was given up (finished=False). See slew_tracker.SlewTracker.
+            target: (ra, dec) in hours and degrees to follow a slew to
+                    other coordinates than the target.
+            Returns the tracker (None without valid target).
+        """
+        self.cancel_slew_tracking()
+        if target is None:
+            if self.target_ra_float is False or self.target_dec_float is False:
+                return None
+            target=(self.target_ra_float,self.target_dec_float)
+        self.slew_tracker=SlewTracker(self,target[0],target[1],callback)
+        self.slew_tracker.start()
+        return self.slew_tracker
+        
+    def cancel_slew_tracking(self):
+        """ Stops following the last slew (the slew is not stopped).
+        """
+        if self.slew_tracker is not None:
+            self.slew_tracker.cancel()
+            
+    def forget_slew(self):
+        """ Stops following the last slew and drops its tracker.
+        
+            Called when a slew is refused, so the finished tracker of an
+            earlier slew can not report the refused slew as finished.
+        """
+        self.cancel_slew_tracking()
+        self.slew_tracker=None
     
     def set_hip_target(self,hip_nr):   
         """ Takes a string hipparcos number an sets its coordinates as target coordinates.
@@ -641,6 +764,8 @@ class Lx200Commands(com.CommunicationCommands):
             return 0
         try:
             #We use the refraction uncorrected coordinates at the moment (We don't trust the correction too much)
+            #Loads skyfield and the ephemeris only when first needed
+            from hip_position_func import hip_position
             hip_coordinates=hip_position(hip_nr)
             ra=str(hip_coordinates[2])
             dec=str(hip_coordinates[3])
@@ -664,31 +789,31 @@ class Lx200Commands(com.CommunicationCommands):
         """Toggles between high and low precision setting.
         """
         inp=b'#:U#'
-        self.write(inp)
+        self.send(inp)
         
     def set_speed_max(self):
         """ Sets Slew rate to max (fastest)
         """
         inp=b'#:RS#'
-        self.write(inp)
+        self.send(inp)
         
     def set_speed_find(self):
         """ Sets Slew rate to Find Rate (second fastest)
         """
         inp=b'#:RM#'
-        self.write(inp)
+        self.send(inp)
         
     def set_speed_center(self):
         """ Sets Slew rate to Centering Rate (second slowest)
         """
         inp=b'#:RC#'
-        self.write(inp)
+        self.send(inp)
         
     def set_speed_guide(self):
         """ Sets Slew rate to Guiding Rate (slowest)
         """
         inp=b'#:RG#'
-        self.write(inp)
+        self.send(inp)
         
     def sync_on_hip(self, hip_nr):
         """ Synchronizes telescope's coordinates with target coordinates.
@@ -706,8 +831,7 @@ class Lx200Commands(com.CommunicationCommands):
         #the moment of synchronization
         self.set_target_coordinates()
         inp=b'#:CM#'
-        self.write(inp)
-        output=self.get_response()
+        output=self.query(inp)
         print('Response from serial port:',output)
         
     def sync_on_coordinates(self):
@@ -718,41 +842,16 @@ class Lx200Commands(com.CommunicationCommands):
         if self.target_ra and self.target_dec:
             #Coordinates will be set beforehand in GUI
             inp=b'#:CM#'
-            self.write(inp)
-            output=self.get_response()
+            output=self.query(inp)
             print('Response from serial port:',output)
             
     def get_LST(self):
         """ Calculates the current Local Sidereal Time.
             Also calculates LST as float in hours.
         """
-        #Get current UTC from astropy.Time
-        UTC_now=Time.now()
-        #Convert to LST
-        LST_now=UTC_now.sidereal_time('mean',longitude=8.724700212478638)
-        #Get the format right. A bit unhandy here. Could be improved.
-        LST_now=str(LST_now)
-        (hours,h,rest)=LST_now.partition('h')
-        #Add a zero to hours if single number
-        hours=int(hours)
-        (minutes,m,rest)=rest.partition('m')
-        minutes=int(minutes)
-        (seconds,s,rest)=rest.partition('s')
-        #Round the seconds (format 12.545 to 13)
-        #We want to round to get a more continous refreshing of the seconds
-        seconds=round(float(seconds))
-        #With rounding we could get 60 for seconds
-        #In that case increse minutes by 1 and set seconds to 0
-        if seconds ==60:
-            seconds=0
-            minutes=minutes+1
-        LST_now='{:02}:{:02}:{:02}'.format(hours, minutes, seconds)
-        #if String has changed update it
-        if LST_now != self.LST:
-            self.LST=LST_now
-            
-        #For different purposes also compute LST as a float in hours.
-        self.LST_float=int(hours)+int(minutes)/60.+int(seconds)/3600.
+        #The LST engine avoids astropy in the refresh loop (see lst_engine)
+        self.LST_float=self.lst_engine.hours()
+        self.LST=format_hours(self.LST_float)
             
     def slew_to_medium_position(self):
         """Defines a medium position, where it is always safe to slew to
@@ -768,78 +867,96 @@ class Lx200Commands(com.CommunicationCommands):
         self.set_target_dec_from_string(medium_dec)
         self.slew_to_target()
             
-    #def check_set_medium_position(self):
-        
-        """ Checks for dangerous slewing commands,
-            in which the telescope could slew through the hard limited area.
-            
-            Sets and slews to a intermediate step in medium position in this case.
-            Afterwards sets 
-        """
-        #initial_target_ra=self.target_ra
-        #initial_target_dec=self.target_dec
-        #self.check_limits()
-        #Current coordinates in up soft limit and target coordinates in low soft limit
-        #if self.ra_up_soft_limit_reached and self.target_ra_low_soft_limit_reached:
-            #self.slew_to_medium_position()
-        #Current coordinates in low soft limit and target coordinates in up soft limit
-        #elif self.ra_low_soft_limit_reached and self.target_ra_up_soft_limit_reached:
-            #self.slew_to_medium_position()       
-        #return(initial_target_ra, initial_target_dec)
-            
-    
     def slew_finished(self):
         """ Checks if slew has finished and was succesful.
+        
+            Uses the tracker of the running slew (see track_slew), which
+            samples the coordinates at a high rate and waits until the
+            mount has settled.
+            Without tracker the last coordinates are compared with the target.
             We choose 2 arcseconds as tolerance. (Higher might be better especially for RA)
         """
+        tracker=self.slew_tracker
+        if self.slew_legs:
+            #Slewing via waypoints
+            return False
+        if tracker is not None and not tracker.done.is_set():
+            return False
+        if tracker is not None and tracker.finished:
+            return True
         #Calculate tolerance as decimal degree and hours
         tolerance_deg=2/3600
         tolerance_hours=2/(15*3600)
-        if (abs(self.ra_float-self.target_ra_float)<tolerance_hours and
+        #RA difference across 0h/24h
+        if (abs(ra_difference(self.ra_float,self.target_ra_float))<tolerance_hours and
             abs(self.dec_float-self.target_dec_float)<tolerance_deg):
             return True
         else:
             return False
     
+    def predict_meridian_ra(self, dec):
+        """ Returns the ra in hours, which is on the meridian when a slew
+            from the current position to dec (degrees) arrives.
+            
+            Both axes slew at the same time with slew_rate, so the slew
+            takes as long as the longer axis plus slew_overhead. The target
+            ra moves on with the LST during the slew, so the duration is
+            estimated again for the moved target.
+        """
+        self.get_coordinates()
+        now=time.time()
+        if self.position is None:
+            return self.lst_engine.hours(now)
+        duration=self.slew_overhead
+        for i in range(2):
+            ra=self.lst_engine.hours(now+duration)
+            distance=max(abs(ra_difference(ra,self.ra_float))*15.,
+                         abs(dec-self.dec_float))
+            duration=self.slew_overhead+distance/self.slew_rate
+        return self.lst_engine.hours(now+duration)
+        
+    def slew_to_meridian(self, dec):
+        """ Slews to dec (degrees) on the meridian in a single pass.
+        
+            The target ra is on the meridian at the predicted arrival
+            (see predict_meridian_ra), so no second slew is needed to
+            correct the tracking during the slew. The end of the slew is
+            detected by the slew tracker (see slew_finished).
+            Returns 0 if the slew is refused.
+        """
+        self.get_LST()
+        ra=self.predict_meridian_ra(dec)
+        #Set coordinates
+        self.set_target_ra_from_string(format_hours(ra))
+        self.set_target_dec_from_string(format_sexagesimal(dec,(' ',' ','')))
+        if not self.set_target_coordinates():
+            print('Position is not observable. Slew cancelled')
+            self.forget_slew()
+            return 0
+        #Slew to target
+        return self.slew_to_target()
+    
     def park_telescope(self):
         """Calculate park coordinates and slew there.
         
            Park in zenith position.
-           Therefore calculate RA as LST, DEC as latitude.
+           Therefore calculate RA as LST at arrival, DEC as latitude.
+           Returns 0 if the slew is refused.
         """
-        #Calculate LST
-        self.get_LST()
-        #Set coordinates
-        self.set_target_ra_from_string(self.LST)
-        self.set_target_dec_from_string('+49 23 32')
-        self.set_target_coordinates()
-        #Slew to target
-        self.slew_to_target()
+        return self.slew_to_meridian(self.site.latitude)
         
     def primary_mirror_pos(self):
         """Calculate position to insert primary mirror cover and slew there.
+           Returns 0 if the slew is refused.
         """
-        #Calculate LST
-        self.get_LST()
-        #Set coordinates 
-        self.set_target_ra_from_string(self.LST)
-        self.set_target_dec_from_string('+05 00 00')
-        self.set_target_coordinates()
-        #Slew to target
-        self.slew_to_target()
+        return self.slew_to_meridian(5.)
         
     def secondary_mirror_pos(self):
         """Calculate position to insert secondary mirror cover 
            and telescope cover and slew there.
+           Returns 0 if the slew is refused.
         """
-        #Calculate LST
-        self.get_LST()
-        #Set coordinates 
-        self.set_target_ra_from_string(self.LST)
-        self.set_target_dec_from_string('-25 00 00')
-        self.set_target_coordinates()
-        #Slew to target
-        self.slew_to_target()
+        return self.slew_to_meridian(-25.)
         
         
         
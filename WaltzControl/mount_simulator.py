@@ -0,0 +1,484 @@
+"""Simulated LX200 controller of the Waltz telescope.
+
+   MountSimulator models the mount and answers LX200 commands like the
+   controller: slews with a finite rate, manual moves with the rate of
+   the selected speed (RS/RM/RC/RG), sidereal tracking (with optional
+   drift), stops, sync and the coordinate precision (U).
+
+   Transports:
+       Serial: replacement of serial.Serial in the same process
+               (used by communication_commands if pyserial is missing).
+       PtyServer: serves a simulator on a pseudo terminal, so the real
+                  pyserial code path can be used without the telescope:
+                      python mount_simulator.py
+                      WALTZ_PORT=/dev/pts/5 python WaltzControlGUI.py
+   Both emulate the transmission time of the baud rate, a reply latency
+   and dropped reply bytes.
+"""
+import argparse
+import os
+import random
+import select
+import threading
+import time
+from collections import deque
+
+import lx200codec as codec
+from coord_operations import equ_to_altaz, check_coordinates
+from lst_engine import get_engine
+from observatory import WALTZ
+
+#Sidereal rate in degrees per second
+SIDEREAL_RATE=15.041067/3600.
+
+#Rates of the speed settings in degrees per second
+default_rates={b'RS':2., b'RM':0.5, b'RC':8./60., b'RG':2*SIDEREAL_RATE}
+
+#Manual move directions: (axis, sign). West decreases ra (increases ha).
+DIRECTIONS={b'w':('ra',-1.), b'e':('ra',1.), b'n':('dec',1.),
+            b's':('dec',-1.)}
+
+class MountSimulator:
+    """State and physics of the simulated mount.
+
+       ra and dec are the coordinates the controller reports. Positions
+       are advanced to the current time before every command, so the
+       simulator needs no thread of its own. Thread safe.
+    """
+    def __init__(self, ra=15.25, dec=25., rates=None, slew_rate=None,
+                 tracking=True, drift=0., check_limits=True, site=WALTZ,
+                 clock=time.monotonic, lst=None):
+        """ra in hours, dec in degrees: initial position.
+           rates: rates of the speed settings in degrees per second
+                  (updates default_rates, keys b'RS', b'RM', ...).
+           slew_rate: rate of slews (MS) in degrees per second per axis
+                      (default: rate of RS).
+           tracking: If False, ra increases with the sidereal rate.
+           drift: tracking error in arcseconds of ra per second.
+           check_limits: Refuse slews to targets below the hardware limit.
+           clock: time source in seconds (for tests).
+           lst: callable returning the LST in hours (default: LST of
+                site at construction, advanced with clock).
+        """
+        self.rates=dict(default_rates)
+        self.rates.update(rates or {})
+        self.slew_rate=slew_rate or self.rates[b'RS']
+        self.speed=b'RS'
+        self.tracking=tracking
+        self.drift=drift
+        self.check_limits=check_limits
+        self.site=site
+        self.high_precision=True
+        self.clock=clock
+        #Number of handled commands by name
+        self.counts={}
+        #Callables listener(name, received) called for every command
+        #with its name (e.g. b'GR') and time.monotonic() of its reception
+        self.listeners=[]
+        self._lock=threading.RLock()
+        #Axis positions in degrees (ra in degrees, not hours)
+        self._ra=ra*15.
+        self._dec=dec
+        self._target_ra=None
+        self._target_dec=None
+        #Target of the running slew (ra, dec in degrees) or None
+        self._slew=None
+        #Time (of clock) at which the last slew arrived (None while slewing)
+        self.slew_end=None
+        #Running manual moves by direction
+        self._moves=set()
+        self._time=clock()
+        if lst is None:
+            #Sidereal time runs with clock, so tests with a fake clock
+            #see the sky turn at the same pace as the mount
+            lst_start=get_engine(site).hours()
+            start=self._time
+            lst=lambda: (lst_start+SIDEREAL_RATE/15.*(clock()-start))%24.
+        self.lst=lst
+        #Incomplete command received so far
+        self._input=b''
+
+    @property
+    def ra(self):
+        """Current ra in hours.
+        """
+        with self._lock:
+            self._advance()
+            return self._ra/15.%24.
+
+    @property
+    def dec(self):
+        """Current dec in degrees.
+        """
+        with self._lock:
+            self._advance()
+            return self._dec
+
+    @property
+    def slewing(self):
+        with self._lock:
+            self._advance()
+            return self._slew is not None
+
+    def _advance(self):
+        """Moves the mount from the last update to now.
+        """
+        now=self.clock()
+        dt=now-self._time
+        self._time=now
+        if dt<=0:
+            return
+        if self.tracking:
+            self._ra+=self.drift/3600.*dt
+        else:
+            #Fixed hour angle, so ra follows the sky
+            self._ra+=SIDEREAL_RATE*dt
+        if self._slew is not None:
+            target_ra,target_dec=self._slew
+            step=self.slew_rate*dt
+            #The hour angle axis does not pass +-12h
+            lst=self.lst()*15.
+            ha=(lst-self._ra+180.)%360.-180.
+            target_ha=(lst-target_ra+180.)%360.-180.
+            delta_ra=ha-target_ha
+            delta_dec=target_dec-self._dec
+            self._ra+=max(-step,min(step,delta_ra))
+            self._dec+=max(-step,min(step,delta_dec))
+            if abs(delta_ra)<=step and abs(delta_dec)<=step:
+                self._slew=None
+                self.slew_end=(now-dt+
+                               max(abs(delta_ra),abs(delta_dec))/self.slew_rate)
+        elif self._moves:
+            step=self.rates[self.speed]*dt
+            for direction in self._moves:
+                axis,sign=DIRECTIONS[direction]
+                if axis=='ra':
+                    self._ra+=sign*step
+                else:
+                    self._dec+=sign*step
+            self._dec=max(-90.,min(90.,self._dec))
+        self._ra%=360.
+
+    def feed(self, data, received=None):
+        """Processes received bytes. Returns the replies as bytes.
+
+           Commands start with ':' and end with '#'. Incomplete commands
+           are kept until the rest arrives.
+           received: time.monotonic() of the reception (default: now).
+        """
+        replies=[]
+        with self._lock:
+            self._input+=data
+            while True:
+                start=self._input.find(b':')
+                if start<0:
+                    self._input=b''
+                    break
+                end=self._input.find(b'#',start)
+                if end<0:
+                    self._input=self._input[start:]
+                    break
+                replies.append(self.handle(self._input[start+1:end],received))
+                self._input=self._input[end+1:]
+        return b''.join(replies)
+
+    def handle(self, command, received=None):
+        """Executes one command (without ':' and '#').
+           Returns its reply as bytes (b'' for no reply).
+        """
+        with self._lock:
+            self._advance()
+            name=command[:2] if command[1:2].isalpha() else command[:1]
+            self.counts[name]=self.counts.get(name,0)+1
+            for listener in self.listeners:
+                listener(name,received or time.monotonic())
+            argument=command[len(name):]
+            handler=getattr(self,'_cmd_'+name.decode('ascii','replace'),None)
+            if handler is None:
+                #Unknown commands are ignored by the controller
+                return b''
+            return handler(argument)
+
+    def _cmd_GR(self, argument):
+        return codec.encode_ra(self._ra/15.,self.high_precision)+b'#'
+
+    def _cmd_GD(self, argument):
+        return codec.encode_dec(self._dec,self.high_precision)+b'#'
+
+    def _cmd_Sr(self, argument):
+        ra,_=codec.decode_ra(argument.strip())
+        if ra is None or not 0<=ra<24:
+            return b'0'
+        self._target_ra=ra
+        return b'1'
+
+    def _cmd_Sd(self, argument):
+        dec,_=codec.decode_dec(argument.strip())
+        if dec is None or not -90<=dec<=90:
+            return b'0'
+        self._target_dec=dec
+        return b'1'
+
+    def _cmd_MS(self, argument):
+        if self._target_ra is None or self._target_dec is None:
+            return b'2No target#'
+        if self.check_limits:
+            ha=self.lst()-self._target_ra
+            alt,az=equ_to_altaz((ha+12.)%24.-12.,self._target_dec,
+                                site=self.site)
+            if not check_coordinates(alt,az):
+                return b'1Object below limit#'
+        self._moves.clear()
+        self._slew=(self._target_ra*15.,self._target_dec)
+        self.slew_end=None
+        return b'0'
+
+    def _cmd_CM(self, argument):
+        if self._target_ra is not None and self._target_dec is not None:
+            self._ra=self._target_ra*15.
+            self._dec=self._target_dec
+        return b'Coordinates     matched.        #'
+
+    def _start_move(self, direction):
+        if self._slew is None:
+            self._moves.add(direction)
+        return b''
+
+    def _cmd_Mw(self, argument):
+        return self._start_move(b'w')
+
+    def _cmd_Me(self, argument):
+        return self._start_move(b'e')
+
+    def _cmd_Mn(self, argument):
+        return self._start_move(b'n')
+
+    def _cmd_Ms(self, argument):
+        return self._start_move(b's')
+
+    def _cmd_Q(self, argument):
+        #Stops slews and all moves
+        self._slew=None
+        self._moves.clear()
+        return b''
+
+    def _cmd_Qw(self, argument):
+        self._moves.discard(b'w')
+        return b''
+
+    def _cmd_Qe(self, argument):
+        self._moves.discard(b'e')
+        return b''
+
+    def _cmd_Qn(self, argument):
+        self._moves.discard(b'n')
+        return b''
+
+    def _cmd_Qs(self, argument):
+        self._moves.discard(b's')
+        return b''
+
+    def _set_speed(self, speed):
+        self.speed=speed
+        return b''
+
+    def _cmd_RS(self, argument):
+        return self._set_speed(b'RS')
+
+    def _cmd_RM(self, argument):
+        return self._set_speed(b'RM')
+
+    def _cmd_RC(self, argument):
+        return self._set_speed(b'RC')
+
+    def _cmd_RG(self, argument):
+        return self._set_speed(b'RG')
+
+    def _cmd_U(self, argument):
+        self.high_precision=not self.high_precision
+        return b''
+
+class Link:
+    """Timing and errors of the serial line.
+
+       Every byte takes 10 bit times (8N1). Replies start latency seconds
+       after the command has been received completely. Each reply byte
+       is lost with probability drop_rate.
+    """
+    def __init__(self, baudrate=9600, latency=0., drop_rate=0., seed=None):
+        self.byte_time=10./baudrate if baudrate else 0.
+        self.latency=latency
+        self.drop_rate=drop_rate
+        self._random=random.Random(seed)
+
+    def drop(self, reply):
+        """Returns reply without the lost bytes.
+        """
+        if not self.drop_rate:
+            return reply
+        return bytes(byte for byte in reply
+                     if self._random.random()>=self.drop_rate)
+
+class Serial:
+    """Replacement of serial.Serial talking to a MountSimulator.
+
+       Reply bytes become readable at the time they would have arrived
+       over the line (see Link).
+    """
+    def __init__(self, port=None, baudrate=9600, timeout=None,
+                 simulator=None, latency=0., drop_rate=0., seed=None,
+                 **kwargs):
+        """port, baudrate, timeout: as serial.Serial (port is ignored).
+           simulator: MountSimulator (default: a new one).
+           latency, drop_rate, seed: see Link.
+           Other arguments of serial.Serial are accepted and ignored.
+        """
+        self.port=port
+        self.baudrate=baudrate
+        self.timeout=timeout
+        self.simulator=simulator or MountSimulator()
+        self.link=Link(baudrate,latency,drop_rate,seed)
+        self.is_open=True
+        #Reply bytes and the times at which they arrive
+        self._arrivals=deque()
+        self._line_free=time.monotonic()
+        self._condition=threading.Condition()
+
+    def open(self):
+        self.is_open=True
+
+    def close(self):
+        self.is_open=False
+
+    def write(self, data):
+        """Sends data to the simulator. Returns number of bytes.
+        """
+        if not self.is_open:
+            raise OSError('Port is closed')
+        now=time.monotonic()
+        #Command is received completely after its transmission time
+        received=now+len(data)*self.link.byte_time
+        reply=self.link.drop(self.simulator.feed(data,received))
+        with self._condition:
+            arrival=max(received+self.link.latency,self._line_free)
+            for i in range(len(reply)):
+                arrival+=self.link.byte_time
+                self._arrivals.append((arrival,reply[i:i+1]))
+            self._line_free=arrival
+            self._condition.notify_all()
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        """Number of bytes arrived so far.
+        """
+        now=time.monotonic()
+        with self._condition:
+            count=0
+            for arrival,byte in self._arrivals:
+                if arrival>now:
+                    break
+                count+=1
+            return count
+
+    def read(self, size=1):
+        """Reads up to size arrived bytes. Waits at most timeout seconds
+           for the first byte.
+        """
+        deadline=None if self.timeout is None else time.monotonic()+self.timeout
+        data=b''
+        with self._condition:
+            while len(data)<size:
+                now=time.monotonic()
+                if self._arrivals and self._arrivals[0][0]<=now:
+                    data+=self._arrivals.popleft()[1]
+                    continue
+                if data:
+                    break
+                if deadline is not None and now>=deadline:
+                    break
+                #Sleep until the next byte arrives (or the deadline)
+                wakeup=self._arrivals[0][0] if self._arrivals else None
+                if deadline is not None:
+                    wakeup=deadline if wakeup is None else min(wakeup,deadline)
+                self._condition.wait(None if wakeup is None else wakeup-now)
+        return data
+
+    def reset_input_buffer(self):
+        with self._condition:
+            self._arrivals.clear()
+
+    def flush(self):
+        pass
+
+    def __str__(self):
+        return 'Simulated Serial(port={!r}, baudrate={}, open={})'.format(
+            self.port,self.baudrate,self.is_open)
+
+class PtyServer(threading.Thread):
+    """Serves a MountSimulator on a pseudo terminal (POSIX only).
+
+       Open path with serial.Serial (or set WALTZ_PORT) to talk to it.
+    """
+    def __init__(self, simulator=None, baudrate=9600, latency=0.,
+                 drop_rate=0., seed=None):
+        super().__init__(daemon=True)
+        import tty
+        self.simulator=simulator or MountSimulator()
+        self.link=Link(baudrate,latency,drop_rate,seed)
+        self._master,self._slave=os.openpty()
+        #No echo and no line editing
+        tty.setraw(self._slave)
+        self.path=os.ttyname(self._slave)
+        self._stopped=threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            ready,_,_=select.select([self._master],[],[],0.1)
+            if not ready:
+                continue
+            try:
+                data=os.read(self._master,1024)
+            except OSError:
+                break
+            reply=self.link.drop(self.simulator.feed(data,time.monotonic()))
+            #Receiving the command, latency and sending the reply
+            delay=(self.link.latency+
+                   (len(data)+len(reply))*self.link.byte_time)
+            if delay:
+                time.sleep(delay)
+            if reply:
+                os.write(self._master,reply)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+def main():
+    parser=argparse.ArgumentParser(
+        description='Serves a simulated Waltz controller on a pseudo terminal.')
+    parser.add_argument('--baudrate',type=int,default=9600)
+    parser.add_argument('--latency',type=float,default=0.,
+                        help='reply latency in seconds')
+    parser.add_argument('--drop',type=float,default=0.,
+                        help='probability of losing a reply byte')
+    parser.add_argument('--ra',type=float,default=15.25,help='hours')
+    parser.add_argument('--dec',type=float,default=25.,help='degrees')
+    parser.add_argument('--no-tracking',action='store_true')
+    args=parser.parse_args()
+    simulator=MountSimulator(args.ra,args.dec,tracking=not args.no_tracking)
+    server=PtyServer(simulator,args.baudrate,args.latency,args.drop)
+    server.start()
+    print('Simulated controller on {}'.format(server.path))
+    print('Use it with: WALTZ_PORT={} python WaltzControlGUI.py'
+          .format(server.path))
+    try:
+        while True:
+            time.sleep(1.)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__=='__main__':
+    main()
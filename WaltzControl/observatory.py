@@ -0,0 +1,44 @@
+"""Geographic sites of telescopes.
+
+   A Site is passed to the coordinate transformations, the LST engine
+   and the astrometry, so one process can handle several telescopes.
+   The trigonometric terms of the latitude are computed once per site.
+"""
+from math import radians, sin, cos
+
+class Site:
+    """Position of a telescope on earth.
+
+       Angles are given in degrees (latitude north, longitude east).
+       The attributes lat, sin_lat, cos_lat and longitude_rad are
+       precomputed for the transformations. Sites are not meant to be
+       changed after creation (create a new one instead).
+    """
+    def __init__(self, name, latitude, longitude, elevation=0.):
+        """name: name of the telescope.
+           latitude, longitude: degrees (north and east positive).
+           elevation: height above sea level in meters.
+        """
+        self.name=name
+        self.latitude=latitude
+        self.longitude=longitude
+        self.elevation=elevation
+        self.lat=radians(latitude)
+        self.sin_lat=sin(self.lat)
+        self.cos_lat=cos(self.lat)
+        self.longitude_rad=radians(longitude)
+
+    def topos(self):
+        """Returns the site as skyfield Topos (imports skyfield).
+        """
+        from skyfield.api import Topos
+        return Topos(latitude_degrees=self.latitude,
+                     longitude_degrees=self.longitude,
+                     elevation_m=self.elevation)
+
+    def __repr__(self):
+        return 'Site({!r}, {}, {}, {})'.format(self.name,self.latitude,
+                                               self.longitude,self.elevation)
+
+#Waltz telescope of the Landessternwarte Heidelberg-Königstuhl
+WALTZ=Site('Waltz',49.3978620896919,8.724700212478638,562.0)
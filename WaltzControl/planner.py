@@ -0,0 +1,134 @@
+import argparse
+
+import numpy as np
+
+from coord_operations import (equ_to_altaz_kernel, observable,
+                              calc_set_rise_times)
+from lst_engine import get_engine
+from observatory import WALTZ
+
+#One row per target. Times in solar hours (see calc_set_rise_times).
+plan_dtype=np.dtype([('name','U16'),
+                     ('ra','f8'),
+                     ('dec','f8'),
+                     ('ha','f8'),
+                     ('alt','f8'),
+                     ('az','f8'),
+                     ('in_limit','?'),
+                     ('set_time','f8'),
+                     ('rise_time','f8')])
+
+def current_LST(site=WALTZ):
+    """Returns current Local Sidereal Time of site in hours as float.
+    """
+    return get_engine(site).hours()
+
+def plan_targets(ra,dec,lst,names=None,duration=0.,only_observable=False,
+                 max_results=None,site=WALTZ):
+    """Evaluates a whole target list at once and ranks it by remaining
+       observing time.
+
+       Input: ra in hours, dec in degrees as arrays (one entry per target).
+              lst: Local Sidereal Time in hours.
+              names: Optional names of the targets (default: index).
+              duration: Length of planned observation in hours. Targets,
+                        which set earlier, count as in limit.
+              only_observable: Drop targets in limit.
+              max_results: Return at most that many targets.
+              site: Site of the telescope.
+
+       Returns structured array with plan_dtype.
+       Observable targets come first, sorted by set_time (longest first),
+       followed by targets in limit sorted by rise_time (earliest first).
+    """
+    ra=np.atleast_1d(np.asarray(ra,dtype=float))
+    dec=np.atleast_1d(np.asarray(dec,dtype=float))
+    if names is None:
+        names=np.arange(len(ra)).astype(str)
+
+    plan=np.zeros(len(ra),dtype=plan_dtype)
+    plan['name']=names
+    plan['ra']=ra
+    plan['dec']=dec
+    #Hour angle in range [-12,12]
+    plan['ha']=(lst-ra+12.)%24.-12.
+    #Written directly into the fields of plan
+    equ_to_altaz_kernel(plan['ha'],dec,out=(plan['alt'],plan['az']),
+                        site=site)
+    plan['set_time'],plan['rise_time']=calc_set_rise_times(plan['ha'],dec,
+                                                           site)
+    plan['in_limit']=(~observable(plan['ha'],dec,site)|
+                      (plan['set_time']<duration))
+
+    if only_observable:
+        plan=plan[~plan['in_limit']]
+    #Sort by set_time descending, then targets in limit by rise_time
+    order=np.lexsort((plan['rise_time'],-plan['set_time'],plan['in_limit']))
+    return plan[order][:max_results]
+
+def plan_hip_targets(hip_nrs,lst,**kwargs):
+    """Like plan_targets for a list of Hipparcos numbers.
+
+       Uses catalogue positions (not precessed to date), which is accurate
+       enough for planning. Raises ValueError for unknown Hipparcos numbers.
+    """
+    import hipparcos
+    stars=hipparcos.get_star_array(hip_nrs)
+    return plan_targets(stars.ra.hours,stars.dec.degrees,lst,
+                        names=[str(hip_nr) for hip_nr in hip_nrs],**kwargs)
+
+def format_plan(plan):
+    """Returns plan as printable table.
+    """
+    lines=['{:>16} {:>8} {:>8} {:>7} {:>7} {:>8} {:>8} {:>8}'.format(
+           'name','ra','dec','ha','alt','az','set','rise')]
+    for row in plan:
+        lines.append('{:>16} {:8.4f} {:+8.3f} {:+7.3f} {:7.2f} {:+8.2f} '
+                     '{:8.3f} {:8.3f}{}'.format(
+                     row['name'],row['ra'],row['dec'],row['ha'],row['alt'],
+                     row['az'],row['set_time'],row['rise_time'],
+                     '  in limit' if row['in_limit'] else ''))
+    return '\n'.join(lines)
+
+def main():
+    parser=argparse.ArgumentParser(
+        description='Rank targets by remaining observing time at Waltz.')
+    parser.add_argument('targets',nargs='*',
+                        help='Hipparcos numbers')
+    parser.add_argument('--file',
+                        help='File with one Hipparcos number or '
+                             '"ra dec" (hours, degrees) per line')
+    parser.add_argument('--lst',type=float,
+                        help='Local Sidereal Time in hours (default: now)')
+    parser.add_argument('--duration',type=float,default=0.,
+                        help='Planned observing time in hours')
+    parser.add_argument('--all',action='store_true',
+                        help='Also list targets in limit')
+    parser.add_argument('-n',type=int,
+                        help='Show only the best n targets')
+    args=parser.parse_args()
+
+    lst=current_LST() if args.lst is None else args.lst
+    options=dict(duration=args.duration,only_observable=not args.all,
+                 max_results=args.n)
+
+    hip_nrs=list(args.targets)
+    coordinates=[]
+    if args.file:
+        with open(args.file) as f:
+            for line in f:
+                fields=line.split('#')[0].split()
+                if len(fields)==1:
+                    hip_nrs.append(fields[0])
+                elif len(fields)>=2:
+                    coordinates.append((float(fields[0]),float(fields[1])))
+
+    print('LST={:.4f}h'.format(lst))
+    if hip_nrs:
+        print(format_plan(plan_hip_targets(hip_nrs,lst,**options)))
+    if coordinates:
+        ra,dec=np.array(coordinates).T
+        print(format_plan(plan_targets(ra,dec,lst,**options)))
+
+if __name__=='__main__':
+    main()
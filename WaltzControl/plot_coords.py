@@ -1,18 +1,46 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import time
+from functools import lru_cache
 
 from coord_operations import calc_alt_limit, calc_tree_limit, equ_to_altaz, altaz_to_equ, approx_obs_time
+from coord_operations import alt_limit_table, tree_limit_table
 
-def plot_traj_and_limits(star_ha,star_dec):
-    #Create az and alt_limit and tree_limit array
-    az=np.arange(-180,180,0.01)
-    alt_limit=np.zeros(len(az))
-    tree_limit=np.zeros(len(az))
-
+@lru_cache()
+def limit_profiles(max_step=None):
+    """Returns az, alt_limit and tree_limit as step profiles in degrees.
+    
+       The limits are constant between the breakpoints of their tables.
+       So the profiles only need two vertices per interval instead of
+       a fine azimuth grid. Both profiles share the same az vertices
+       (needed for fill_between).
+       max_step: Insert vertices into the flat steps, so that they are at
+                 most max_step degrees apart. Needed if the profiles are
+                 transformed to ha/dec, where the steps are curved.
+       Profiles are cached and must not be modified.
+    """
+    #All breakpoints of both tables within the plot range
+    edges=np.concatenate((alt_limit_table.az,tree_limit_table.az,[-180,180]))
+    edges=np.unique(np.clip(edges,-180,180))
+    if max_step:
+        #Split intervals into equal parts not larger than max_step
+        parts=np.ceil(np.diff(edges)/max_step).astype(int)
+        edges=np.concatenate([np.linspace(low,high,n,endpoint=False)
+                              for low,high,n in zip(edges[:-1],edges[1:],parts)]
+                             +[[edges[-1]]])
+    #Limits are constant inside each interval, so evaluate at the middle
+    middle=(edges[:-1]+edges[1:])/2.
+    #Vertices at both ends of each interval
+    az=np.repeat(edges,2)[1:-1]
+    alt_limit=np.repeat(calc_alt_limit(middle),2)
+    tree_limit=np.repeat(calc_tree_limit(middle),2)
+    for profile in (az,alt_limit,tree_limit):
+        profile.setflags(write=False)
+    return az,alt_limit,tree_limit
 
-    alt_limit=calc_alt_limit(az)
-    tree_limit=calc_tree_limit(az)
+def plot_traj_and_limits(star_ha,star_dec):
+    #Get az and alt_limit and tree_limit profiles (curved in ha/dec)
+    az,alt_limit,tree_limit=limit_profiles(max_step=0.5)
 
     #Plot alt_limits vs az and tree limits  
     plt.plot(az,alt_limit,color='red')
@@ -26,7 +54,7 @@ def plot_traj_and_limits(star_ha,star_dec):
     plt.title('Waltz Pointing Limits')
 
     #Calculate star_az and star_alt
-    star_alt,star_az,_,__=equ_to_altaz(star_ha,star_dec)
+    star_alt,star_az=equ_to_altaz(star_ha,star_dec)
     print(star_alt)
     print(star_az)
     #Define star trajectory (dec stays constant, hour angle increases)
@@ -78,17 +106,11 @@ def plot_traj_and_limits(star_ha,star_dec):
 def plot_traj_limits_altaz(star_ha,star_dec):
     """Plots limits and star trajectory in altitude and azimuth.
     """
-    #Create az and alt_limit and tree_limit array
-    az=np.arange(-180,180,0.01)
-    alt_limit=np.zeros(len(az))
-    tree_limit=np.zeros(len(az))
-
-    #Calculate limits
-    alt_limit=calc_alt_limit(az)
-    tree_limit=calc_tree_limit(az)
+    #Get az and alt_limit and tree_limit step profiles
+    az,alt_limit,tree_limit=limit_profiles()
     
     #Calculate star_az and star_alt
-    star_alt,star_az,_,__=equ_to_altaz(star_ha,star_dec)
+    star_alt,star_az=equ_to_altaz(star_ha,star_dec)
     #Define star trajectory (dec stays constant, hour angle increases)
     traj_ha=np.arange(-11.999,11.999,0.05)
     traj_dec=np.ones(len(traj_ha))*star_dec
@@ -138,14 +160,8 @@ def plot_traj_limits_altaz(star_ha,star_dec):
 def plot_traj_limits_altaz_GUI(star_ha,star_dec,current_ha,current_dec):
     """Plots limits and star trajectory in altitude and azimuth.
     """
-    #Create az and alt_limit and tree_limit array
-    az=np.arange(-180,180,0.01)
-    alt_limit=np.zeros(len(az))
-    tree_limit=np.zeros(len(az))
-
-    #Calculate limits
-    alt_limit=calc_alt_limit(az)
-    tree_limit=calc_tree_limit(az)
+    #Get az and alt_limit and tree_limit step profiles
+    az,alt_limit,tree_limit=limit_profiles()
         
     
     #Plot
@@ -185,17 +201,17 @@ def plot_traj_limits_altaz_GUI(star_ha,star_dec,current_ha,current_dec):
     #Create upper x-axis ticks and labels
     return return_list
 
-def add_star_and_traj(axis,star_ha,star_dec):
-    """Adds star and trajectory to existing axis in exsiting plot.
+def star_and_traj(star_ha,star_dec):
+    """Calculates star position, trajectory and hour angle ticks in alt/az.
+    
+       Returns star_az, star_alt, traj_az, traj_alt, ticks_az, ticks_ha.
     """
     #Calculate star_az and star_alt
-    star_alt,star_az,_,__=equ_to_altaz(star_ha,star_dec)
+    star_alt,star_az=equ_to_altaz(star_ha,star_dec)
     #Define star trajectory (dec stays constant, hour angle increases)
     traj_ha=np.arange(-11.999,11.999,0.05)
     traj_dec=np.ones(len(traj_ha))*star_dec
     #Calculate star trajectory in alt and az
-    traj_alt=np.zeros(len(traj_ha))
-    traj_az=np.zeros(len(traj_ha))
     traj_alt,traj_az=equ_to_altaz(traj_ha,traj_dec)
     
     #Create array, where to put the hour angle ticks
@@ -209,6 +225,14 @@ def add_star_and_traj(axis,star_ha,star_dec):
     __,traj_ticks_az=equ_to_altaz(traj_ticks_ha,traj_ticks_dec)
     #Tranform to integers for style
     traj_ticks_ha=traj_ticks_ha.astype(int)
+    return star_az,star_alt,traj_az,traj_alt,traj_ticks_az,traj_ticks_ha
+
+def add_star_and_traj(axis,star_ha,star_dec):
+    """Adds star and trajectory to existing axis in exsiting plot.
+    """
+    (star_az,star_alt,
+     traj_az,traj_alt,
+     traj_ticks_az,traj_ticks_ha)=star_and_traj(star_ha,star_dec)
     
     star_plot=axis.plot(star_az,star_alt,'b*')
     traj_plot=axis.plot(traj_az,traj_alt,'b.',markersize=0.75)
@@ -227,16 +251,91 @@ def add_star_and_traj(axis,star_ha,star_dec):
 def add_current_pos(axis,current_ha,current_dec):
     """Adds current position to existing axis in existing plot.
     """
-    current_alt,current_az,_,__=equ_to_altaz(current_ha,current_dec)
+    current_alt,current_az=equ_to_altaz(current_ha,current_dec)
     pos_plot=axis.plot(current_az,current_alt,color='black',marker='o',
                        markersize=10,markeredgewidth=1,markerfacecolor='None')
     return pos_plot
+
+class LiveAltAzPlot:
+    """Keeps current position, star and trajectory up to date in an
+       existing limit plot (see plot_traj_limits_altaz_GUI).
+       
+       The static part (limits, axes, labels) is rendered once and cached
+       as bitmap on every full draw. Updates only move the markers with
+       set_data and blit them onto the cached background.
+       A full redraw is only needed if the hour angle ticks change.
+    """
+    def __init__(self,axis):
+        self.axis=axis
+        self.canvas=axis.figure.canvas
+        #Second axis to get hour angle labels at upper x-axis
+        self.ax2=axis.twiny()
+        self.ax2.set_xlim(axis.get_xlim())
+        self.ax2.set_xticks([])
+        self.ax2.set_xlabel("Hour angle [h]")
+        #Animated artists are not part of the cached background
+        (self.star_plot,)=axis.plot([],[],'b*',animated=True)
+        (self.traj_plot,)=axis.plot([],[],'b.',markersize=0.75,
+                                    animated=True)
+        (self.pos_plot,)=axis.plot([],[],color='black',marker='o',
+                                   markersize=10,markeredgewidth=1,
+                                   markerfacecolor='None',animated=True)
+        self.background=None
+        self._ticks=None
+        self.canvas.mpl_connect('draw_event',self._on_draw)
     
+    def _on_draw(self,event):
+        """Caches the background after every full draw.
+        """
+        self.background=self.canvas.copy_from_bbox(self.axis.figure.bbox)
+        self._draw_artists()
     
-
+    def _draw_artists(self):
+        for artist in (self.traj_plot,self.star_plot,self.pos_plot):
+            self.axis.draw_artist(artist)
     
-
-
-
-
-
+    def blit(self):
+        """Draws the markers onto the cached background.
+        """
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_artists()
+        self.canvas.blit(self.axis.figure.bbox)
+    
+    def set_current_pos(self,current_ha,current_dec):
+        """Moves current position marker.
+        """
+        current_alt,current_az=equ_to_altaz(current_ha,current_dec)
+        self.set_current_altaz(current_alt,current_az)
+    
+    def set_current_altaz(self,current_alt,current_az):
+        """Moves current position marker to altitude and azimuth
+           in degrees.
+        """
+        self.pos_plot.set_data([current_az],[current_alt])
+        self.blit()
+    
+    def set_star(self,star_ha,star_dec):
+        """Moves star and trajectory. Removes them if star_ha or star_dec
+           is False.
+        """
+        if star_ha is False or star_dec is False:
+            star_az=star_alt=traj_az=traj_alt=ticks_az=ticks_ha=[]
+        else:
+            (star_az,star_alt,
+             traj_az,traj_alt,
+             ticks_az,ticks_ha)=star_and_traj(star_ha,star_dec)
+            star_az,star_alt=[star_az],[star_alt]
+        self.star_plot.set_data(star_az,star_alt)
+        self.traj_plot.set_data(traj_az,traj_alt)
+        #Hour angle ticks are part of the background
+        ticks=(tuple(np.round(ticks_az,1)),tuple(ticks_ha))
+        if ticks!=self._ticks:
+            self._ticks=ticks
+            self.ax2.set_xticks(ticks_az)
+            self.ax2.set_xticklabels(ticks_ha)
+            self.canvas.draw()
+        else:
+            self.blit()
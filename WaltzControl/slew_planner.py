@@ -0,0 +1,160 @@
+"""Slew paths which avoid the hard limits.
+
+   The controller checks only the target of a slew. On the way both
+   axes move at the same rate, so the mount first moves diagonally in
+   hour angle and declination and then along the axis with the longer
+   way. This path can cross the limit region, although start and target
+   are safe.
+
+   plan_slew samples the path against the altitude limit table (see
+   coord_operations.alt_limit_table) and, if the direct path is blocked,
+   inserts the fewest waypoints giving the shortest safe slew. All legs
+   of all candidate waypoints are checked in one vectorized
+   transformation, so a plan takes a few milliseconds.
+
+   Only the hard limits (horizon and cupboard) are checked. The tree
+   limits (coord_operations.tree_limit_table) only block the view, so
+   the telescope may pass below them during a slew. The controller has
+   no separate limits in hour angle or declination; their image in
+   ha/dec (see plot_coords) is the same alt_limit_table.
+"""
+import numpy as np
+
+from coord_operations import equ_to_altaz_kernel, alt_limit_table
+
+#Largest distance between two samples of a path in degrees:
+#for the screening of candidate waypoints and for the final check
+sample_step=1.
+fine_step=0.05
+
+#Grid of candidate waypoints (hour angle in hours, dec in degrees)
+waypoint_ha,waypoint_dec=np.meshgrid(np.arange(-11.,11.1,1.),
+                                     np.arange(-30.,90.1,10.))
+waypoint_ha=waypoint_ha.ravel()
+waypoint_dec=waypoint_dec.ravel()
+
+#Number of best candidates combined for paths with two waypoints
+pair_candidates=40
+#Number of best paths checked with fine_step before giving up
+checked_paths=20
+
+def slew_distance(ha, dec, target_ha, target_dec):
+    """Returns the way of the longer axis in degrees.
+
+       Proportional to the slew time, since both axes move at the same
+       rate. The hour angle axis does not pass +-12h.
+    """
+    return np.maximum(np.abs(np.asarray(target_ha)-ha)*15.,
+                      np.abs(np.asarray(target_dec)-dec))
+
+def path_points(ha, dec, target_ha, target_dec, samples):
+    """Returns hour angles and declinations of the expected path
+       (arrays with samples columns, one row per leg).
+
+       The start of each leg is not included, the target is.
+       Inputs are floats or arrays of equal length.
+    """
+    ha=np.atleast_1d(np.asarray(ha,dtype=float))[:,None]
+    dec=np.atleast_1d(np.asarray(dec,dtype=float))[:,None]
+    d_ha=(np.atleast_1d(np.asarray(target_ha,dtype=float))[:,None]-ha)*15.
+    d_dec=np.atleast_1d(np.asarray(target_dec,dtype=float))[:,None]-dec
+    #Way of the mount along the path in degrees per axis
+    way=np.maximum(np.abs(d_ha),np.abs(d_dec))*(np.arange(1,samples+1)/
+                                                 samples)
+    path_ha=ha+np.sign(d_ha)*np.minimum(way,np.abs(d_ha))/15.
+    path_dec=dec+np.sign(d_dec)*np.minimum(way,np.abs(d_dec))
+    return path_ha,path_dec
+
+def paths_clear(ha, dec, target_ha, target_dec, table=None, site=None,
+                step=None):
+    """Returns bool array, True for legs which stay above the limits.
+
+       Inputs are floats or arrays of equal length (one entry per leg).
+       step: largest distance of the samples in degrees
+             (default sample_step).
+    """
+    if table is None:
+        table=alt_limit_table
+    longest=np.max(slew_distance(ha,dec,target_ha,target_dec),initial=0.)
+    samples=max(1,int(np.ceil(longest/(step or sample_step))))
+    path_ha,path_dec=path_points(ha,dec,target_ha,target_dec,samples)
+    alt,az=equ_to_altaz_kernel(path_ha,path_dec,site=site)
+    limit=table.lookup(az.ravel()).reshape(az.shape)
+    return np.all(alt>=limit,axis=1)
+
+def path_clear(points, table=None, site=None):
+    """Checks a path through points [(ha, dec), ...] with fine sampling.
+    """
+    points=np.array(points)
+    return bool(paths_clear(points[:-1,0],points[:-1,1],points[1:,0],
+                            points[1:,1],table,site,fine_step).all())
+
+def plan_slew(ha, dec, target_ha, target_dec, table=None, site=None):
+    """Plans a slew from ha, dec to target_ha, target_dec
+       (hour angles in hours in range [-12,12), dec in degrees).
+
+       Returns list of waypoints (ha, dec) to slew to before the target:
+       [] if the direct slew is safe, None if no path with up to two
+       waypoints is safe. The target itself is not checked here
+       (see coord_operations.check_coordinates).
+       table: LimitTable of the path (default alt_limit_table, the tree
+              limits are not checked).
+       If the start is already below the limits, every path crosses
+       them, so [] is returned (direct slew as without planner).
+       Candidates are screened with sample_step, the chosen path is
+       checked with fine_step (the next best is taken if it fails).
+    """
+    if table is None:
+        table=alt_limit_table
+    start=(ha,dec)
+    target=(target_ha,target_dec)
+    if path_clear([start,target],table,site):
+        return []
+    #Only candidates above the limits can be waypoints
+    alt,az=equ_to_altaz_kernel(np.append(waypoint_ha,ha),
+                               np.append(waypoint_dec,dec),site=site)
+    safe=alt>=table.lookup(az)
+    if not safe[-1]:
+        return []
+    safe=safe[:-1]
+    candidate_ha=waypoint_ha[safe]
+    candidate_dec=waypoint_dec[safe]
+    #One waypoint: both legs of all candidates at once
+    n=len(candidate_ha)
+    clear=paths_clear(np.concatenate((np.full(n,ha),candidate_ha)),
+                      np.concatenate((np.full(n,dec),candidate_dec)),
+                      np.concatenate((candidate_ha,np.full(n,target_ha))),
+                      np.concatenate((candidate_dec,np.full(n,target_dec))),
+                      table,site)
+    first=clear[:n]
+    second=clear[n:]
+    to_waypoint=slew_distance(ha,dec,candidate_ha,candidate_dec)
+    to_target=slew_distance(candidate_ha,candidate_dec,target_ha,target_dec)
+    both=np.flatnonzero(first&second)
+    both=both[np.argsort(to_waypoint[both]+to_target[both])]
+    for best in both[:checked_paths]:
+        waypoints=[(float(candidate_ha[best]),float(candidate_dec[best]))]
+        if path_clear([start]+waypoints+[target],table,site):
+            return waypoints
+    #Two waypoints: combine the nearest reachable candidates
+    starts=np.flatnonzero(first)
+    ends=np.flatnonzero(second)
+    starts=starts[np.argsort(to_waypoint[starts])[:pair_candidates]]
+    ends=ends[np.argsort(to_target[ends])[:pair_candidates]]
+    first,second=(a.ravel() for a in np.meshgrid(starts,ends))
+    clear=np.flatnonzero(paths_clear(candidate_ha[first],candidate_dec[first],
+                                     candidate_ha[second],
+                                     candidate_dec[second],table,site))
+    first,second=first[clear],second[clear]
+    cost=(to_waypoint[first]+
+          slew_distance(candidate_ha[first],candidate_dec[first],
+                        candidate_ha[second],candidate_dec[second])+
+          to_target[second])
+    for best in np.argsort(cost)[:checked_paths]:
+        waypoints=[(float(candidate_ha[first[best]]),
+                    float(candidate_dec[first[best]])),
+                   (float(candidate_ha[second[best]]),
+                    float(candidate_dec[second[best]]))]
+        if path_clear([start]+waypoints+[target],table,site):
+            return waypoints
+    return None
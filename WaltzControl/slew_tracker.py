@@ -0,0 +1,139 @@
+"""Detection of the end of slews.
+
+   A SlewTracker samples the mount coordinates at a high rate while a
+   slew is running, estimates the velocity of both axes and the time of
+   arrival and reports the end of the slew as soon as the mount has
+   settled on the target.
+"""
+import threading
+import time
+from collections import deque
+
+#Sidereal rate in arcseconds per second
+SIDEREAL_RATE=15.041067
+
+def ra_difference(ra, reference):
+    """Returns ra-reference in hours in range [-12,12).
+
+       Slews across 0h/24h give small differences.
+    """
+    return (ra-reference+12.)%24.-12.
+
+class SlewTracker(threading.Thread):
+    """Follows one slew to a target until the mount has settled there.
+
+       The slew has finished when both axes are within tolerance of the
+       target and the mount moves not faster than the tracking error
+       (settle_rate) for settle_samples samples in a row. Then
+       callback(True) is called from the tracker thread and the event done
+       is set. After timeout seconds or cancel() callback(False) is called.
+    """
+    def __init__(self, mount, target_ra, target_dec, callback=None,
+                 interval=0.1, tolerance=2., settle_rate=1.5*SIDEREAL_RATE,
+                 settle_samples=2, window=0.1, timeout=600.):
+        """mount: Lx200Commands instance.
+           target_ra in hours, target_dec in degrees.
+           interval: sampling interval in seconds.
+           tolerance: allowed distance per axis in arcseconds.
+           settle_rate: highest velocity of a settled mount in arcseconds
+                        per second.
+           window: time span of the velocity estimate in seconds.
+        """
+        super().__init__(daemon=True)
+        self.mount=mount
+        self.target_ra=target_ra
+        self.target_dec=target_dec
+        self.callback=callback
+        self.interval=interval
+        self.tolerance=tolerance
+        self.settle_rate=settle_rate
+        self.settle_samples=settle_samples
+        self.window=window
+        self.timeout=timeout
+
+        #Set when the slew has finished, was cancelled or timed out
+        self.done=threading.Event()
+        #True if the mount has settled on the target
+        self.finished=False
+        #Latest estimates (see update)
+        self.distance=None
+        self.velocity=None
+        self.eta=None
+
+        #Samples (time, ra, dec) of the velocity window
+        self._samples=deque()
+        self._settled=0
+        self._cancelled=threading.Event()
+
+    def cancel(self):
+        """Stops tracking. The slew itself is not stopped.
+        """
+        self._cancelled.set()
+
+    def run(self):
+        deadline=time.monotonic()+self.timeout
+        next_sample=time.monotonic()
+        while not self._cancelled.is_set() and time.monotonic()<deadline:
+            mount=self.mount
+            if mount.is_open and mount.connected:
+                mount.get_coordinates()
+                if mount.position is not None:
+                    self.update(time.monotonic(),mount.ra_float,
+                                mount.dec_float)
+                    if self._settled>=self.settle_samples:
+                        self._finish(True)
+                        return
+            next_sample+=self.interval
+            self._cancelled.wait(max(0.,next_sample-time.monotonic()))
+        self._finish(False)
+
+    def update(self, now, ra, dec):
+        """Adds a sample (ra in hours, dec in degrees) and updates
+           distance, velocity and eta.
+
+           distance: (ra, dec) to the target in arcseconds.
+           velocity: (ra, dec) in arcseconds per second.
+           eta: estimated seconds until arrival (None if unknown).
+        """
+        samples=self._samples
+        samples.append((now,ra,dec))
+        while len(samples)>2 and now-samples[1][0]>=self.window:
+            samples.popleft()
+        distance_ra=ra_difference(self.target_ra,ra)*15.*3600.
+        distance_dec=(self.target_dec-dec)*3600.
+        self.distance=(distance_ra,distance_dec)
+        if len(samples)<2:
+            self._settled=0
+            return
+        start,ra_start,dec_start=samples[0]
+        span=now-start
+        velocity_ra=ra_difference(ra,ra_start)*15.*3600./span
+        velocity_dec=(dec-dec_start)*3600./span
+        self.velocity=(velocity_ra,velocity_dec)
+        eta=max(self._axis_eta(distance_ra,velocity_ra),
+                self._axis_eta(distance_dec,velocity_dec))
+        self.eta=None if eta==float('inf') else eta
+        if (abs(distance_ra)<self.tolerance
+            and abs(distance_dec)<self.tolerance
+            and (velocity_ra**2+velocity_dec**2)**0.5<=self.settle_rate):
+            self._settled+=1
+        else:
+            self._settled=0
+
+    def _axis_eta(self, distance, velocity):
+        """Returns seconds until an axis arrives (inf if not approaching).
+        """
+        if abs(distance)<self.tolerance:
+            return 0.
+        if distance*velocity<=0:
+            return float('inf')
+        return distance/velocity
+
+    def _finish(self, finished):
+        self.finished=finished
+        if finished:
+            self.eta=0.
+        #Callback first, so a following slew is started before done is set
+        if self.callback is not None:
+            self.callback(finished)
+        self.done.set()
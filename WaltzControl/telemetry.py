@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import namedtuple
+
+#Immutable snapshot of the mount state.
+#ra, dec as formatted strings, ra_float in hours, dec_float in degrees,
+#ha_float in hours, timestamp as time.time() of the poll.
+MountState=namedtuple('MountState',['ra','dec','ra_float','dec_float',
+                                    'ha_float','timestamp','connected'])
+
+class TelemetryWorker(threading.Thread):
+    """Polls the mount coordinates in the background.
+
+       The latest coordinates are published as MountState snapshot,
+       which can be read without blocking.
+       Polls are sent with the lowest priority (TELEMETRY) if the mount
+       has a running dispatcher, so they never delay other commands.
+    """
+    def __init__(self, mount, interval=0.5):
+        """mount: Lx200Commands instance.
+           interval: polling interval in seconds.
+        """
+        super().__init__(daemon=True)
+        self.mount=mount
+        self.interval=interval
+
+        self._snapshot_lock=threading.Lock()
+        self._snapshot=MountState('','',0,0,0,0.,mount.connected)
+
+        self._wakeup=threading.Event()
+        self._stopped=threading.Event()
+
+    @property
+    def snapshot(self):
+        """Latest MountState.
+        """
+        with self._snapshot_lock:
+            return self._snapshot
+
+    def stop(self):
+        """Stops the worker after the current poll.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+
+    def run(self):
+        next_poll=time.monotonic()
+        while not self._stopped.is_set():
+            if time.monotonic()>=next_poll:
+                self.poll()
+                next_poll=time.monotonic()+self.interval
+            #Sleep until next poll or until stopped
+            self._wakeup.wait(max(0.,next_poll-time.monotonic()))
+            self._wakeup.clear()
+
+    def poll(self):
+        """Gets coordinates from the mount and publishes a new snapshot.
+        """
+        mount=self.mount
+        #Nothing to poll if connection is closed or lost.
+        #Polling is resumed when the connection is opened again.
+        if not mount.is_open or not mount.connected:
+            return
+        mount.get_coordinates()
+        #Hour angle in range [-12,12) (0 if no coordinates are available)
+        ha_float=0
+        position=mount.position
+        if position is not None:
+            ha_float=position.hour_angle(mount.LST_float)
+        snapshot=MountState(mount.ra,mount.dec,
+                            mount.ra_float,mount.dec_float,ha_float,
+                            time.time(),mount.connected)
+        with self._snapshot_lock:
+            self._snapshot=snapshot
@@ -18,7 +18,7 @@ alt_limit=calc_alt_limit(az)
 tree_limit=calc_tree_limit(az)
     
 #Calculate star_az and star_alt
-star_alt,star_az,_,__=equ_to_altaz(star_ha,star_dec)
+star_alt,star_az=equ_to_altaz(star_ha,star_dec)
 #Define star trajectory (dec stays constant, hour angle increases)
 traj_ha=np.arange(-11.999,11.999,0.05)
 traj_dec=np.ones(len(traj_ha))*star_dec
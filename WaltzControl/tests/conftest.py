@@ -0,0 +1,28 @@
+"""The modules of WaltzControl import each other without package prefix,
+   as when run from the WaltzControl directory.
+
+   The tests talk to the simulated mount (see mount_simulator), never to
+   a serial port.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+#Must be set before communication_commands is imported
+os.environ['WALTZ_SIMULATOR']='1'
+
+@pytest.fixture
+def mount():
+    """Lx200Commands connected to a fast MountSimulator in the same
+       process (115200 baud, no latency).
+    """
+    import lx200commands
+    import mount_simulator as ms
+    mount=lx200commands.Lx200Commands()
+    mount.simulator=ms.MountSimulator(slew_rate=20.)
+    mount.link=ms.Link(115200,0.,0.)
+    yield mount
+    mount.cancel_slew_tracking()
+    mount.close()
@@ -0,0 +1,54 @@
+"""Parsing of GR and GD responses as in Lx200Commands.get_coordinates
+   before lx200codec was introduced.
+
+   Reference of tests/test_lx200codec.py, also timed by bench_codec.py.
+"""
+
+def legacy_ra(unformated_ra):
+    """Parsing of GR responses as in get_coordinates before lx200codec.
+    """
+    if len(unformated_ra)==9:
+        ra='{}h{}m{}s'.format(unformated_ra[0:2],
+                              unformated_ra[3:5],
+                              unformated_ra[6:8])
+        ra_float=(int(unformated_ra[0:2])+
+                  int(unformated_ra[3:5])/60.+
+                  int(unformated_ra[6:8])/3600.)
+    elif len(unformated_ra)==8:
+        ra='{}h{}m'.format(unformated_ra[0:2],
+                           unformated_ra[3:7])
+        ra_float=(int(unformated_ra[0:2])+
+                  float(unformated_ra[3:7])/60.)
+    else:
+        ra=unformated_ra
+        ra_float=0
+    return ra_float,ra
+
+def legacy_dec(unformated_dec):
+    """Parsing of GD responses as in get_coordinates before lx200codec.
+    """
+    if len(unformated_dec)==10:
+        dec='''{}°{}'{}"'''.format(unformated_dec[0:3],
+                                   unformated_dec[4:6],
+                                   unformated_dec[7:9])
+        if unformated_dec[0]=='+':
+            dec_float=(int(unformated_dec[0:3])+
+                       int(unformated_dec[4:6])/60.+
+                       int(unformated_dec[7:9])/3600.)
+        elif unformated_dec[0]=='-':
+            dec_float=(int(unformated_dec[0:3])-
+                       int(unformated_dec[4:6])/60.-
+                       int(unformated_dec[7:9])/3600.)
+    elif len(unformated_dec)==7:
+        dec="""{}°{}'""".format(unformated_dec[0:3],
+                                unformated_dec[4:6])
+        if unformated_dec[0]=='+':
+            dec_float=(int(unformated_dec[0:3])+
+                       int(unformated_dec[4:6])/60.)
+        elif unformated_dec[0]=='-':
+            dec_float=(int(unformated_dec[0:3])-
+                       int(unformated_dec[4:6])/60.)
+    else:
+        dec=unformated_dec
+        dec_float=0
+    return dec_float,dec
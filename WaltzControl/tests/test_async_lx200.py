@@ -0,0 +1,97 @@
+"""Tests of the reply matching of async_lx200.AsyncLx200Client.
+"""
+import asyncio
+
+from async_lx200 import AsyncLx200Client
+
+async def start_server(replies):
+    """Starts a loopback controller answering each command with
+       replies[command] after a delay. replies: {command: (delay, reply)},
+       commands without entry are not answered.
+    """
+    async def handle(reader, writer):
+        buffer=b''
+        while True:
+            data=await reader.read(256)
+            if not data:
+                writer.close()
+                return
+            buffer+=data
+            while b'#' in buffer[1:]:
+                end=buffer.index(b'#',1)+1
+                command,buffer=buffer[:end],buffer[end:]
+                if command in replies:
+                    delay,reply=replies[command]
+                    asyncio.get_event_loop().call_later(delay,writer.write,
+                                                        reply)
+    server=await asyncio.start_server(handle,'127.0.0.1',0)
+    port=server.sockets[0].getsockname()[1]
+    client=await AsyncLx200Client.connect('socket://127.0.0.1:{}'.format(port),
+                                          response_timeout=0.2)
+    return server,client
+
+def test_late_reply_is_dropped():
+    async def scenario():
+        #GD is answered after its timeout, GR while GD is abandoned
+        server,client=await start_server({b'#:GD#':(0.3,b'+10*00:00#'),
+                                          b'#:GR#':(0.1,b'00:00:00#')})
+        async def later(inp, delay):
+            await asyncio.sleep(delay)
+            return await client.query(inp)
+        results=await asyncio.gather(client.query(b'#:GD#'),
+                                     later(b'#:GR#',0.25),
+                                     later(b'#:GR#',0.6))
+        await client.close()
+        server.close()
+        return results
+    assert asyncio.run(scenario())==['','00:00:00#','00:00:00#']
+
+def test_lost_reply_is_dropped():
+    async def scenario():
+        #GD is never answered
+        server,client=await start_server({b'#:GR#':(0.,b'00:00:00#')})
+        dec=await client.query(b'#:GD#')
+        #The abandoned GD is removed when the line stays quiet
+        await asyncio.sleep(0.3)
+        ra=await client.query(b'#:GR#')
+        await client.close()
+        server.close()
+        return dec,ra
+    assert asyncio.run(scenario())==('','00:00:00#')
+
+class FixedLst:
+    def hours(self):
+        return 5.
+
+def test_state_matches_telemetry():
+    async def scenario():
+        server,client=await start_server({b'#:GR#':(0.,b'00:00:00#'),
+                                          b'#:GD#':(0.,b'+10*30:00#')})
+        client.lst_engine=FixedLst()
+        state=await client.get_state()
+        await client.close()
+        server.close()
+        return state
+    state=asyncio.run(scenario())
+    assert state.connected
+    #Formatted as Lx200Commands.get_coordinates does for telemetry
+    assert (state.ra,state.dec)==('00h00m00s','+10°30\'00"')
+    #ra 0h is a valid reading
+    assert state.ra_float==0.
+    assert state.dec_float==10.5
+    assert state.ha_float==5.
+
+def test_refused_slew_is_read_completely():
+    async def scenario():
+        server,client=await start_server({
+            b'#:MS#':(0.02,b'1Object below limit#'),
+            b'#:GR#':(0.02,b'12:00:00#'),
+            b'#:GD#':(0.02,b'+10*00:00#')})
+        #GR is pending while the error message arrives
+        results=await asyncio.gather(client.slew_to_target(),
+                                     client.query(b'#:GR#'),
+                                     client.query(b'#:GD#'))
+        await client.close()
+        server.close()
+        return results
+    assert asyncio.run(scenario())==[False,'12:00:00#','+10*00:00#']
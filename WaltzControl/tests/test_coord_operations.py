@@ -0,0 +1,94 @@
+"""Tests of the limit tables and the setting and rising times of
+   coord_operations.
+"""
+import numpy as np
+import pytest
+
+from coord_operations import (LimitTable, alt_limits, alt_limit_table,
+                              tree_limits, tree_limit_table, calc_alt_limit,
+                              calc_tree_limit, check_coordinates, observable,
+                              calc_set_rise_times, approx_obs_time)
+
+def legacy_limit(limits, az):
+    """Limit as computed by calc_alt_limit and calc_tree_limit before
+       the LimitTable: maximum of the altitudes of the nearest breakpoints
+       above and below az (breakpoints equal to az excluded).
+    """
+    diff=limits[None,:,1]-np.asarray(az,dtype=float)[:,None]
+    up=np.where(diff>0,diff,np.inf).argmin(axis=1)
+    low=np.where(diff<0,diff,-np.inf).argmax(axis=1)
+    return np.maximum(limits[up,0],limits[low,0])
+
+@pytest.mark.parametrize('limits,table,function',
+                         [(alt_limits,alt_limit_table,calc_alt_limit),
+                          (tree_limits,tree_limit_table,calc_tree_limit)])
+def test_table_matches_legacy_limits(limits, table, function):
+    az=np.arange(-180,180,0.01)
+    assert np.array_equal(function(az),legacy_limit(limits,az))
+    #Exactly at the inner breakpoints
+    inner=np.sort(limits[:,1])[1:-1]
+    assert np.array_equal(table.lookup(inner),legacy_limit(limits,inner))
+    for value in np.concatenate((az[::97],inner)):
+        assert table.scalar(float(value))==table.lookup(value)[0]
+
+def test_unsorted_limits():
+    limits=np.array([[10.,-180.01],[20.,0.],[15.,10.],[10.,180.01]])
+    shuffled=LimitTable(limits[[2,0,3,1]])
+    az=np.arange(-20.,30.,0.5)
+    assert np.array_equal(shuffled.lookup(az),legacy_limit(limits,az))
+
+def test_check_coordinates():
+    #Cupboard limit at az 110 is about 20 degrees, horizon 12 elsewhere
+    assert check_coordinates(15.,0.)
+    assert not check_coordinates(11.,0.)
+    assert not check_coordinates(15.,110.)
+    assert check_coordinates(25.,110.)
+    assert not check_coordinates('15',0.)
+
+def brute_force_crossing(ha, dec, step=1e-4):
+    """Returns sidereal hours until the first change of observability
+       by sampling the diurnal arc (24 if there is none).
+    """
+    offsets=np.arange(step,24.,step)
+    visible=observable((ha+offsets+12.)%24.-12.,np.full(len(offsets),dec))
+    changed=np.flatnonzero(visible!=observable(np.array([ha]),
+                                               np.array([dec]))[0])
+    return offsets[changed[0]] if len(changed) else 24.
+
+def test_set_rise_times_match_sampled_arcs():
+    rng=np.random.default_rng(1)
+    ha=rng.uniform(-12.,12.,40)
+    dec=rng.uniform(-40.,90.,40)
+    set_time,rise_time=calc_set_rise_times(ha,dec)
+    visible=observable(ha,dec)
+    assert np.all(np.where(visible,rise_time,set_time)==0.)
+    for i in range(len(ha)):
+        expected=brute_force_crossing(ha[i],dec[i])
+        time=max(set_time[i],rise_time[i])
+        if expected==24.:
+            assert time==24.
+        else:
+            #Solar hours of the sidereal crossing within one sample
+            assert abs(time/0.9972695601852-expected)<=1e-4
+
+def test_set_rise_times_are_exact():
+    ha=np.array([-3.,0.,2.])
+    dec=np.array([0.,-20.,10.])
+    set_time,rise_time=calc_set_rise_times(ha,dec)
+    crossing=np.maximum(set_time,rise_time)/0.9972695601852
+    before=observable(ha+crossing-1e-6,dec)
+    after=observable(ha+crossing+1e-6,dec)
+    assert np.all(before!=after)
+
+def test_circumpolar_and_never_rising():
+    set_time,rise_time=calc_set_rise_times([0.,0.],[85.,-70.])
+    assert set_time[0]==24. and rise_time[0]==0.
+    assert set_time[1]==0. and rise_time[1]==24.
+    #Floats broadcast like arrays
+    set_time,rise_time=calc_set_rise_times(0.,[85.,-70.])
+    assert list(set_time)==[24.,0.]
+
+def test_approx_obs_time():
+    set_time,rise_time=calc_set_rise_times(-1.,30.)
+    assert approx_obs_time(-1.,30.)==float(set_time[0])
+    assert approx_obs_time(0.,-70.)==0
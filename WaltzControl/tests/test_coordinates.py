@@ -0,0 +1,37 @@
+"""Tests of the LST memo of coordinates.EquatorialPosition.
+"""
+import threading
+from math import degrees
+
+import pytest
+
+from coordinates import EquatorialPosition
+from coord_operations import equ_to_altaz
+
+def test_horizontal_matches_coord_operations():
+    position=EquatorialPosition.from_hours(3.,20.)
+    for lst in (0.,5.5,5.5,17.25):
+        ha=position.hour_angle(lst)
+        assert ha==pytest.approx((lst-3.+12.)%24.-12.)
+        alt,az=equ_to_altaz(ha,20.)
+        horizontal=position.horizontal(lst)
+        assert degrees(horizontal.alt)==pytest.approx(float(alt))
+        assert degrees(horizontal.az)==pytest.approx(float(az))
+
+def test_concurrent_lsts_do_not_mix():
+    position=EquatorialPosition.from_hours(3.,20.)
+    expected={lst:position.horizontal(lst).alt for lst in range(8)}
+    errors=[]
+    def poll(offset):
+        for i in range(5000):
+            lst=(i+offset)%8
+            if position.horizontal(lst).alt!=expected[lst]:
+                errors.append(lst)
+            if position.hour_angle(lst)!=(lst-3.+12.)%24.-12.:
+                errors.append(lst)
+    threads=[threading.Thread(target=poll,args=(k,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
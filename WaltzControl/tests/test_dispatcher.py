@@ -0,0 +1,37 @@
+"""Tests of dispatcher.CommandDispatcher and of the command path of
+   communication_commands with the simulated mount.
+"""
+import time
+
+def test_timed_out_request_is_not_sent_later(mount):
+    mount.start_dispatcher()
+    mount.response_timeout=0.05
+    dispatcher=mount.dispatcher
+    try:
+        #Keep the dispatcher from sending
+        with mount.port_lock:
+            assert dispatcher.request(b'#:Sd+10*00:00#')==''
+        #Wait until the queue is processed
+        assert dispatcher.request(b'#:GR#')!=''
+    finally:
+        mount.stop_dispatcher()
+    assert b'Sd' not in mount.simulator.counts
+
+def test_request_returns_response(mount):
+    mount.start_dispatcher()
+    try:
+        assert mount.query(b'#:Sd+10*00:00#')=='1'
+        assert mount.query(b'#:GD#').endswith('#')
+    finally:
+        mount.stop_dispatcher()
+
+def test_query_without_reply_does_not_wait(mount):
+    for dispatching in (False,True):
+        if dispatching:
+            mount.start_dispatcher()
+        start=time.monotonic()
+        assert mount.query(b'#:Mw#')==''
+        assert mount.query(b'#:Qw#')==''
+        assert time.monotonic()-start<0.5*mount.response_timeout
+    mount.stop_dispatcher()
+    assert mount.simulator.counts[b'Qw']==2
@@ -0,0 +1,49 @@
+"""Round trip tests of lx200codec.
+
+   Compares the codec with the parsing of Lx200Commands.get_coordinates
+   before the codec was introduced (lx200_legacy.legacy_ra, legacy_dec)
+   for random coordinates in all four LX200 formats.
+"""
+import random
+
+import pytest
+
+from lx200codec import decode_ra, decode_dec, encode_ra, encode_dec
+from lx200_legacy import legacy_ra, legacy_dec
+
+samples=2000
+
+#high precision, ra resolution in hours, dec resolution in degrees
+formats=((True,1/3600.,1/3600.),(False,1/600.,1/60.))
+
+def random_coordinates(seed):
+    rng=random.Random(seed)
+    return [(rng.uniform(0.,24.),rng.uniform(-90.,90.))
+            for i in range(samples)]
+
+@pytest.mark.parametrize('high,ra_step,dec_step',formats)
+def test_ra_round_trip(high, ra_step, dec_step):
+    for ra,dec in random_coordinates(1):
+        response=encode_ra(ra,high).decode()+'#'
+        ra_float,ra_string=decode_ra(response)
+        assert (ra_float,ra_string)==legacy_ra(response)
+        #Within half a step (modulo 24h)
+        assert abs((ra_float-ra+12.)%24.-12.)<=ra_step/2+1e-9
+        #Bytes responses decode like strings
+        assert decode_ra(response.encode())==(ra_float,ra_string)
+
+@pytest.mark.parametrize('high,ra_step,dec_step',formats)
+def test_dec_round_trip(high, ra_step, dec_step):
+    for ra,dec in random_coordinates(2):
+        response=encode_dec(dec,high).decode()+'#'
+        dec_float,dec_string=decode_dec(response)
+        legacy_float,legacy_string=legacy_dec(response)
+        assert dec_string==legacy_string
+        assert dec_float==pytest.approx(legacy_float,abs=1e-12)
+        assert abs(dec_float-dec)<=dec_step/2+1e-9
+        assert decode_dec(response.encode())==(dec_float,dec_string)
+
+@pytest.mark.parametrize('response',['','#','0','12:34#','ab:cd:ef#'])
+def test_unknown_responses(response):
+    assert decode_ra(response)[0] is None
+    assert decode_dec(response)[0] is None
@@ -0,0 +1,122 @@
+"""Tests of slew_planner and of slews via waypoints on the simulated
+   mount.
+"""
+import time
+
+import numpy as np
+
+from slew_planner import plan_slew, paths_clear, path_clear
+from coord_operations import (LimitTable, observable, altaz_to_equ,
+                              equ_to_altaz, alt_limit_table)
+from mount_simulator import MountSimulator
+from lst_engine import format_hours
+from coordinates import format_sexagesimal
+
+def random_pairs(count, seed=1):
+    """Returns start and target (ha, dec) arrays of safe positions.
+    """
+    rng=np.random.RandomState(seed)
+    ha=rng.uniform(-12.,12.,8*count)
+    dec=rng.uniform(-40.,90.,8*count)
+    safe=observable(ha,dec)
+    ha,dec=ha[safe][:2*count],dec[safe][:2*count]
+    return (ha[:count],dec[:count]),(ha[count:],dec[count:])
+
+def blocked_pairs(count):
+    (ha,dec),(target_ha,target_dec)=random_pairs(count)
+    blocked=~paths_clear(ha,dec,target_ha,target_dec,step=0.01)
+    return list(zip(ha[blocked],dec[blocked],target_ha[blocked],
+                    target_dec[blocked]))
+
+def test_safe_direct_slews_get_no_waypoints():
+    (ha,dec),(target_ha,target_dec)=random_pairs(100)
+    direct=paths_clear(ha,dec,target_ha,target_dec,step=0.01)
+    for i in np.flatnonzero(direct):
+        assert plan_slew(ha[i],dec[i],target_ha[i],target_dec[i])==[]
+
+def test_blocked_slews_get_safe_waypoints():
+    pairs=blocked_pairs(300)
+    assert pairs
+    for ha,dec,target_ha,target_dec in pairs:
+        waypoints=plan_slew(ha,dec,target_ha,target_dec)
+        assert waypoints
+        assert len(waypoints)<=2
+        points=[(ha,dec)]+waypoints+[(target_ha,target_dec)]
+        assert path_clear(points)
+        #Also with a finer sampling than the planner
+        points=np.array(points)
+        assert paths_clear(points[:-1,0],points[:-1,1],points[1:,0],
+                           points[1:,1],step=0.01).all()
+
+def test_unreachable_target_gives_none():
+    #Two separate observable wedges in the east, impossible elsewhere
+    table=LimitTable(np.array([[91.,-180.01],[91.,-170.],[0.,-170.],
+                               [0.,-100.],[91.,-100.],[91.,-80.],
+                               [0.,-80.],[0.,-10.],[91.,-10.],
+                               [91.,180.01]]))
+    ha,dec=altaz_to_equ(30.,-135.)
+    target_ha,target_dec=altaz_to_equ(30.,-45.)
+    assert plan_slew(float(ha),float(dec),float(target_ha),float(target_dec),
+                     table) is None
+
+def test_start_below_limit_slews_directly():
+    ha,dec=altaz_to_equ(5.,0.)
+    target_ha,target_dec=altaz_to_equ(60.,90.)
+    assert plan_slew(float(ha),float(dec),float(target_ha),
+                     float(target_dec))==[]
+
+def test_simulated_slew_stays_above_limits(mount):
+    ha,dec,target_ha,target_dec=min(blocked_pairs(300),
+                                    key=lambda pair: abs(pair[2]-pair[0]))
+    lst=mount.lst_engine.hours()
+    simulator=MountSimulator(ra=(lst-ha)%24.,dec=dec,slew_rate=20.)
+    mount.simulator=simulator
+    mount.set_target_ra_from_string(format_hours((lst-target_ha)%24.))
+    mount.set_target_dec_from_string(format_sexagesimal(target_dec,
+                                                        (' ',' ','')))
+    mount.send_target_coordinates_to_serial()
+    assert mount.slew_to_target()!=0
+    lowest=np.inf
+    deadline=time.monotonic()+30.
+    while not mount.slew_finished() and time.monotonic()<deadline:
+        position_ha=(simulator.lst()-simulator.ra+12.)%24.-12.
+        alt,az=equ_to_altaz(position_ha,simulator.dec)
+        lowest=min(lowest,float(alt-alt_limit_table.scalar(float(az))))
+        time.sleep(0.005)
+    assert mount.slew_finished()
+    #One slew per waypoint and the final slew to the target
+    assert simulator.counts[b'MS']>=2
+    #Above the limits up to the sampling of the planner
+    assert lowest>-0.05
+    mount.get_coordinates()
+    assert abs(mount.dec_float-mount.target_dec_float)<1/3600.
+
+def test_refused_slew_is_not_reported_finished(mount, monkeypatch):
+    assert mount.primary_mirror_pos()!=0
+    assert mount.slew_tracker.done.wait(30.)
+    assert mount.slew_finished()
+    #No safe path to the park position
+    monkeypatch.setattr(mount,'plan_slew',lambda: None)
+    assert mount.park_telescope()==0
+    assert mount.slew_tracker is None
+    assert not mount.slew_finished()
+
+def test_slew_refused_by_controller_is_dropped(mount, monkeypatch):
+    assert mount.primary_mirror_pos()!=0
+    assert mount.slew_tracker.done.wait(30.)
+    monkeypatch.setattr(mount.simulator,'_cmd_MS',
+                        lambda argument: b'1Object below limit#')
+    monkeypatch.setattr(mount,'plan_slew',lambda: [])
+    assert mount.park_telescope()==0
+    assert mount.slew_tracker is None
+    assert not mount.slew_finished()
+    #The error message is not taken as reply of the next command
+    assert mount.query(b'#:GR#').endswith('#')
+
+def test_refused_waypoint_drops_remaining_legs(mount, monkeypatch):
+    monkeypatch.setattr(mount.simulator,'_cmd_MS',
+                        lambda argument: b'1Object below limit#')
+    monkeypatch.setattr(mount,'plan_slew',lambda: [(-3.,40.),(-1.,40.)])
+    assert mount.park_telescope()==0
+    assert not mount.slew_legs
+    assert mount.slew_tracker is None
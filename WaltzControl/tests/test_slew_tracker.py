@@ -0,0 +1,93 @@
+"""Tests of slew_tracker.SlewTracker with the simulated mount.
+"""
+import threading
+import time
+
+from slew_tracker import SlewTracker, SIDEREAL_RATE, ra_difference
+from lst_engine import format_hours
+from coordinates import format_sexagesimal
+from mount_simulator import MountSimulator
+
+class FakeClock:
+    def __init__(self):
+        self.now=0.
+
+    def __call__(self):
+        return self.now
+
+def set_target(mount, ra, dec):
+    mount.set_target_ra_from_string(format_hours(ra%24.))
+    mount.set_target_dec_from_string(format_sexagesimal(dec,(' ',' ','')))
+    mount.send_target_coordinates_to_serial()
+
+def test_ra_difference_across_24h():
+    assert abs(ra_difference(0.01,23.99)-0.02)<1e-12
+    assert abs(ra_difference(23.99,0.01)+0.02)<1e-12
+
+def test_settles_when_simulated_slew_arrives():
+    clock=FakeClock()
+    simulator=MountSimulator(ra=2.,dec=20.,slew_rate=2.,clock=clock,
+                             check_limits=False)
+    simulator.handle(b'Sr 02:20:00')
+    simulator.handle(b'Sd +25*00:00')
+    assert simulator.handle(b'MS')==b'0'
+    tracker=SlewTracker(None,2.+1/3.,25.)
+    settled=None
+    while clock.now<20.:
+        clock.now+=0.1
+        tracker.update(clock.now,simulator.ra,simulator.dec)
+        if settled is None and tracker._settled>=tracker.settle_samples:
+            settled=clock.now
+        if abs(clock.now-1.)<1e-9:
+            #5 degrees per axis at 2 degrees per second
+            assert abs(tracker.eta-1.5)<0.1
+    #The mount tracks, so the target is kept after the slew
+    assert simulator.slew_end is not None
+    assert simulator.slew_end<settled<=simulator.slew_end+0.35
+    assert abs(tracker.distance[0])<2. and abs(tracker.distance[1])<2.
+
+def test_does_not_settle_while_drifting():
+    tracker=SlewTracker(None,3.,10.)
+    #Within the tolerance, but moving faster than settle_rate
+    rate=2*SIDEREAL_RATE/3600.
+    for i in range(10):
+        tracker.update(0.1*i,3.,10.-0.0005+rate*0.1*i)
+    assert tracker._settled==0
+    for i in range(10,14):
+        tracker.update(0.1*i,3.,10.)
+    assert tracker._settled>=tracker.settle_samples
+
+def test_tracker_reports_finished_slew(mount):
+    mount.get_coordinates()
+    set_target(mount,mount.ra_float+0.2,mount.dec_float+3.)
+    results=[]
+    mount.slew_to_target()
+    tracker=mount.slew_tracker
+    tracker.callback=results.append
+    assert tracker.done.wait(10.)
+    assert tracker.finished and mount.slew_finished()
+    assert time.monotonic()-mount.simulator.slew_end<1.
+    assert results==[True]
+
+def test_tracker_times_out(mount):
+    mount.get_coordinates()
+    results=[]
+    done=threading.Event()
+    def callback(finished):
+        results.append(finished)
+        done.set()
+    #No slew is started, so the mount never reaches the target
+    tracker=SlewTracker(mount,(mount.ra_float+1.)%24.,mount.dec_float,
+                        callback,timeout=0.3)
+    tracker.start()
+    assert tracker.done.wait(5.)
+    assert done.is_set() and results==[False]
+    assert not tracker.finished
+
+def test_cancel_stops_tracking(mount):
+    mount.get_coordinates()
+    tracker=SlewTracker(mount,(mount.ra_float+1.)%24.,mount.dec_float)
+    tracker.start()
+    tracker.cancel()
+    assert tracker.done.wait(2.)
+    assert not tracker.finished
@@ -0,0 +1,63 @@
+import threading
+import time
+
+class MoveHandle:
+    """Handle of a timed manual move.
+
+       The move has to be started already. The stop command is sent by a
+       timer thread at the deadline, so the caller is not blocked.
+       The move can be stopped earlier with cancel().
+    """
+    def __init__(self, stop, duration, on_stopped=None):
+        """stop: function sending the stop command.
+           duration: duration of movement in seconds.
+           on_stopped: optional function called after the stop
+                       command in the timer thread.
+        """
+        self.stop=stop
+        self.on_stopped=on_stopped
+        self.duration=duration
+        self.deadline=time.monotonic()+duration
+        self.stopped=threading.Event()
+        self.cancelled=False
+        self._lock=threading.Lock()
+        self._timer=threading.Timer(duration,self._expire)
+        self._timer.daemon=True
+        self._timer.start()
+
+    @property
+    def active(self):
+        """True until the move is stopped or cancelled.
+        """
+        return not self.stopped.is_set()
+
+    def cancel(self, send_stop=True):
+        """Stops the move now instead of at the deadline.
+
+           send_stop: Send the stop command (False if the caller
+                      stops the mount itself).
+           Returns False if the move was already stopped.
+        """
+        with self._lock:
+            if self.stopped.is_set():
+                return False
+            self._timer.cancel()
+            self.cancelled=True
+            if send_stop:
+                self.stop()
+            self.stopped.set()
+        return True
+
+    def wait(self, timeout=None):
+        """Waits until the move is stopped. Returns False on timeout.
+        """
+        return self.stopped.wait(timeout)
+
+    def _expire(self):
+        with self._lock:
+            if self.stopped.is_set():
+                return
+            self.stop()
+            self.stopped.set()
+        if self.on_stopped is not None:
+            self.on_stopped()
@@ -59,7 +59,7 @@ file_path=parrent_path / 'pointing_limits' / 'pointing_limits_alt_az.txt'
 
 #Transform coordinates
 for index in range(len(ha)):
-    (alt[index],az[index],dummy1,dummy2)=equ_to_altaz(ha[index],dec[index])
+    (alt[index],az[index])=equ_to_altaz(ha[index],dec[index])
     line="{}    {}    {}\n".format(alt[index],az[index],mode[index])
     #With automatically closes the file in the end
     with open(str(file_path), 'a') as writefile:
@@ -3,13 +3,17 @@ import time
 import datetime
 import locale
 import pathlib
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 import lx200commands as lx
-from plot_coords import plot_traj_limits_altaz_GUI, add_star_and_traj, add_current_pos
 from coord_operations import check_coordinates
+from coordinates import format_sexagesimal
+
+#Field separators of the pointing star files
+POINTING=(' ',' ','')
+
+#Interval in ms to check if a slew has finished.
+#Only reads the state of the slew tracker (no serial communication).
+SLEW_CHECK_INTERVAL=50
 
 class WaltzGUI(lx.Lx200Commands):
     def __init__(self, master):
@@ -326,10 +330,7 @@ class WaltzGUI(lx.Lx200Commands):
         #and positions globally
         self.canvas=False
         self.ax1=False
-        self.star_plot=False
-        self.traj_plot=False
-        self.pos_plot=False
-        self.ax2=False
+        self.live_plot=False
         
         #At first check if serial connection is open (also contains initial commands)
         self._respond_to_connection_state()
@@ -376,7 +377,8 @@ class WaltzGUI(lx.Lx200Commands):
         
         #Commands to be executed even without connection
         self.refresh_times()
-        self.initialize_plot()
+        #Plot as soon as the window is shown (matplotlib loads slowly)
+        self.master.after_idle(self.initialize_plot)
         
         #If connection is not open close program
         if not self.connected:
@@ -387,14 +389,20 @@ class WaltzGUI(lx.Lx200Commands):
         #This is the StringVar defining which initial setting the speed Radiobuttons have
         self.speed.set('Guide')
         
-        #Commands to be executed all the time (if connection is open)
-        self.display_coordinates()
-        self.refresh_target_alt_az_ha()
-        
         #Check for format of coordinates and toggle automatically
         #We always want format DEC=dd mm ss
+        self.get_coordinates()
         if len(self.dec)==7:
             super().toggle_precision()
+        
+        #Send all commands by priority and
+        #poll coordinates in the background from now on
+        self.start_dispatcher()
+        self.start_telemetry()
+        
+        #Commands to be executed all the time (if connection is open)
+        self.display_coordinates()
+        self.refresh_target_alt_az_ha()
     def _respond_to_connection_state(self):
         """ Checks connection to serial port.
             Print Warning if not and closes program.
@@ -470,44 +478,42 @@ class WaltzGUI(lx.Lx200Commands):
     def initialize_plot(self):
         """Refreshs Plot.
         """
+        #matplotlib is imported on first use only
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from plot_coords import plot_traj_limits_altaz_GUI, LiveAltAzPlot
         #Close all plots for safety reasons
         #plt.close('all')
         (fig,
          self.ax1) = plot_traj_limits_altaz_GUI(False,False,False,False)
         self.canvas = FigureCanvasTkAgg(fig, master = self.plot_frame)
         self.canvas._tkcanvas.grid(row=0,column=0)
+        #Markers are updated by blitting (limits are drawn only once)
+        self.live_plot=LiveAltAzPlot(self.ax1)
+        self.plot_star_and_traj()
         self.plot_current_pos()
         
     def plot_current_pos(self):
         """Overplots current position. Plot needs to already exist.
         """
-        #First remove existing pos_plot (if it exists)
-        if self.pos_plot:
-            self.pos_plot.pop(0).remove()
-        #Now add new pos_plot
-        self.pos_plot=add_current_pos(self.ax1,self.ha_float,self.dec_float)
-        self.canvas.draw()
-        self.master.after(1000,self.plot_current_pos)
+        if self.position is not None:
+            #Shares the memoized alt/az of the current LST
+            horizontal=self.position.horizontal(self.LST_float,self.site)
+            self.live_plot.set_current_altaz(horizontal.alt_degrees,
+                                             horizontal.az_degrees)
+        self.master.after(200,self.plot_current_pos)
         
     def plot_star_and_traj(self):
         """Overplots star position and trajectory. Plot need to already exist.
         
            Will be called periodically with refresh_target_alt_az_ha.
         """
-        #First remove existing star_plot/traj_plot (if they exists)
-        if self.star_plot:
-            self.star_plot.pop(0).remove()
-            self.traj_plot.pop(0).remove()
-            self.ax2.remove()
+        #Plot is not initialized yet
+        if not self.live_plot:
+            return 0
         if not self.target_ra_float or not self.target_dec_float:
+            self.live_plot.set_star(False,False)
             return 0
-        #Now add new_star_plot
-        (self.star_plot,
-         self.traj_plot,
-         self.ax2)=add_star_and_traj(self.ax1,
-                                     self.target_ha_float,
-                                     self.target_dec_float)
-        self.canvas.draw()
+        self.live_plot.set_star(self.target_ha_float,self.target_dec_float)
         
         
     
@@ -523,9 +529,11 @@ class WaltzGUI(lx.Lx200Commands):
         if not self.connected:
             return 0
         
-        self.get_coordinates()
-        self.RA_display.config(text=self.ra)
-        self.DEC_display.config(text=self.dec)
+        #Coordinates are polled by the telemetry worker
+        #Only read the latest snapshot here (never blocks)
+        state=self.mount_state()
+        self.RA_display.config(text=state.ra)
+        self.DEC_display.config(text=state.dec)
         if not self.connected:
             self._respond_to_connection_state()
 
@@ -606,13 +614,17 @@ class WaltzGUI(lx.Lx200Commands):
     def stop_move_east_buttonclick(self, event):
         super().stop_move_east()
         
+        
     def slew_to_target_buttonclick(self):
         """Slews to target.
            Target must be set before via set_target_dec_from_string and set_target_ra_from_string
         """
         super().set_target_coordinates()
         #Slew to target and wait for slew to finish
-        super().slew_to_target()
+        if super().slew_to_target()==0:
+            message="No safe slew path to the target found!"
+            messagebox.showwarning("Warning",message=message,parent=self.master)
+            return
         self.wait_for_slew_finish()
         
         #After slewing (and if something went wrong):
@@ -621,94 +633,47 @@ class WaltzGUI(lx.Lx200Commands):
         self.valid_target=[0,0]
         self.slew_target_button.config(state='disabled')
     
-    #def continue_slew(self,initial_target_ra, initial_target_dec):
-        """ Continues slewing after possible initial slew to medium position.
-            Performs slewing if no slew to medium position is necessary.
-        """
-        #Check if slew is finished. Default Value of slew_done=True,
-        #so it will also be True if no slew to medium position was necessary.)
-        #if self.slew_done:
-            #Set the initial target coordinates as normal target coordinates again
-            #super().set_target_ra_from_string(initial_target_ra)
-            #super().set_target_dec_from_string(initial_target_dec)
-            #Slew to target
-            #super().slew_to_target()
-            #Wait for the slew to finish (disables all buttons etc.)
-            #self.wait_for_slew_finish()
-        #else:
-            #If previous slew is not finished the funcion will call itself every second.
-            #self.master.after(1000, self.continue_slew, initial_target_ra, initial_target_dec)
-        
-    def park_telescope_buttonclick(self,counter=1,park=True):
+    def park_telescope_buttonclick(self,park=True):
         """Parks telescope and waits for slew to finish.
            
-           counter counts if parking is executed the first or 
-           second time.
            park specifies if controller gets a parking command 
-           or if the function just waits until first slew has finished.
+           or if the function just waits until the slew has finished.
+           A single slew is enough, since park_telescope aims at the
+           meridian at the predicted arrival time.
         """
-        #We need to call park telescope twice 
-        #because the tracking will change RA while DEC is still adjusting
-        #Park telescope for the first time
-        if counter==1:
-            #If parking is activated
-            if park:
-                print('Slew to Park Position the first time')
-                #Slew telescope to parking position
-                super().park_telescope()
-                self.refresh_target_alt_az_ha(call_itself=False)
-            #Start waiting: Call wait_for_slew_finish with call_itself=False
-            #So the funtion will just check if slew has finished
-            if not self.wait_for_slew_finish(call_itself=False):
-                #If slew has not yet finished
-                print('Waiting for First Parking to finish')
-                #Call the park funtion after 1 sec with counter=1 and slew=False
-                #So it will be in counter=1 loop but will not send 
-                #a park command to the controller
-                self.master.after(1000,self.park_telescope_buttonclick,
-                                  1,False)
+        if park:
+            print('Slew to Park Position')
+            #Slew telescope to parking position
+            if super().park_telescope()==0:
+                message="No safe slew path to the park position found!"
+                messagebox.showwarning("Warning",message=message,
+                                       parent=self.master)
                 return 0
-            else:
-                #If slewing has finished
-                #Disable all buttons (need because it will otherwise wait
-                #for one second until it disables again)
-                self.disable_all_buttons()
-                print('Finished First Parking')
-                #Call park function again after 1 second but enter counter=2 loop
-                #Also activate parking again with park=True
-                #Useful to wait one second as safetiy that slewing has stopped
-                self.master.after(1000,self.park_telescope_buttonclick,
-                                  2,True)
-                return 0
-        #Second Parking loop
-        if counter==2:
-            if park:
-                #If parking is activated
-                print('Slew to Park Position the second time')
-                #Slew telescope to parking position
-                super().park_telescope()
-                self.refresh_target_alt_az_ha(call_itself=False)
-                #Wait again as above. But call counter=2 fpr second parking loop
-            if not self.wait_for_slew_finish(call_itself=False):
-                print('Waiting for Second Parking to finish')
-                self.master.after(1000,self.park_telescope_buttonclick,
-                                  2,False)
-                return 0
-            else:
-                #When slewing is done
-                print('Finished Second Parking')
-                #Show message box to tell user to shut off the controller
-                message=("Turn off the telescope controller to stop tracking"+
+            self.refresh_target_alt_az_ha(call_itself=False)
+        #Start waiting: Call wait_for_slew_finish with call_itself=False
+        #So the funtion will just check if slew has finished
+        if not self.wait_for_slew_finish(call_itself=False):
+            #Check again without sending a park command to the controller
+            self.master.after(SLEW_CHECK_INTERVAL,
+                              self.park_telescope_buttonclick,False)
+            return 0
+        print('Finished Parking')
+        #Show message box to tell user to shut off the controller
+        message=("Turn off the telescope controller to stop tracking"+
                  " and remain in park position!")
-                messagebox.showinfo("Information",message=message,parent=self.master)
-                return 0 
+        messagebox.showinfo("Information",message=message,parent=self.master)
+        return 0
         
     def primary_mirror_pos_buttonclick(self):
         """Slew Telescope to Primary Mirror Cover Position.
         
            Uses LX200Commands primary_mirror_pos.
         """
-        super().primary_mirror_pos()
+        if super().primary_mirror_pos()==0:
+            message="No safe slew path to the primary mirror cover position found!"
+            messagebox.showwarning("Warning",message=message,
+                                   parent=self.master)
+            return 0
         self.refresh_target_alt_az_ha(call_itself=False)
         self.wait_for_slew_finish()
         
@@ -717,7 +682,11 @@ class WaltzGUI(lx.Lx200Commands):
         
            Uses LX200Commands secondary_mirror_pos.
         """
-        super().secondary_mirror_pos()
+        if super().secondary_mirror_pos()==0:
+            message="No safe slew path to the secondary mirror cover position found!"
+            messagebox.showwarning("Warning",message=message,
+                                   parent=self.master)
+            return 0
         self.refresh_target_alt_az_ha(call_itself=False)
         self.wait_for_slew_finish()
         
@@ -854,7 +823,9 @@ class WaltzGUI(lx.Lx200Commands):
     def wait_for_slew_finish(self,call_itself=True):
         """Waits until coordinates equal target coordinates within tolerance.
            Disables all (except STOP) buttons until target coordinates are reached.
-           call_itself determines if funtion will call itself after 1 second.
+           call_itself determines if funtion will call itself after
+           SLEW_CHECK_INTERVAL ms. The check is cheap, since the slew tracker
+           samples the coordinates in the background (see track_slew).
            This is very useful to set to False if you want to call waiting from
            different function that should pause until waiting is over.
            
@@ -872,12 +843,13 @@ class WaltzGUI(lx.Lx200Commands):
             return True
         else:
             #If variable call_itself is true
-            #Calls itself after 1 second.
+            #Calls itself after SLEW_CHECK_INTERVAL.
             #After call is asigned to global variable waiting 
             #to stop it via stop_waiting.
             if call_itself:
                 global waiting
-                waiting=self.master.after(1000,self.wait_for_slew_finish)
+                waiting=self.master.after(SLEW_CHECK_INTERVAL,
+                                          self.wait_for_slew_finish)
             return False
     
     def stop_waiting(self):
@@ -885,6 +857,8 @@ class WaltzGUI(lx.Lx200Commands):
         
            Can be called in the menu.
         """
+        #Stop sampling the coordinates of the slew
+        super().cancel_slew_tracking()
         #First disable all buttons to avoid binding events more than once.
         self.disable_all_buttons()
         #Enable all buttons 
@@ -1008,23 +982,14 @@ class WaltzGUI(lx.Lx200Commands):
             print('Invalid Hiparcos number')
             return 0
         
-        #Format RA to hh mm ss
-        (RA_hours,h,rest)=self.ra.partition('h')
-        (RA_min,m,rest)=rest.partition('m')
-        (RA_sec,s,rest)=rest.partition('s')
-        RA_pointing="{} {} {}".format(RA_hours, RA_min, RA_sec)
-        
-        #Format DEC to +dd mm ss
-        (DEC_deg,grad,rest)=self.dec.partition('°')
-        (DEC_min,m,rest)=rest.partition("'")
-        (DEC_sec,s,rest)=rest.partition('"')
-        DEC_pointing="{} {} {}".format(DEC_deg, DEC_min, DEC_sec)
-        
-        #Format LST to hh mm ss
-        (LST_hours,h,rest)=self.LST.partition(':')
-        (LST_min,m,rest)=rest.partition(':')
-        (LST_sec,s,rest)=rest.partition(':')
-        LST_pointing="{} {} {}".format(LST_hours, LST_min, LST_sec)
+        position=self.position
+        if position is None:
+            print('No coordinates of the telescope available')
+            return 0
+        #Format RA to hh mm ss, DEC to +dd mm ss and LST to hh mm ss
+        RA_pointing=format_sexagesimal(position.ra_hours,POINTING,False)
+        DEC_pointing=format_sexagesimal(position.dec_degrees,POINTING)
+        LST_pointing=format_sexagesimal(self.LST_float,POINTING,False)
         
         #Get Date in Format dd.mm.yyyy (using locale module)
         today = datetime.date.today()
@@ -1048,11 +1013,9 @@ class WaltzGUI(lx.Lx200Commands):
             
         ### New Format File ###
         
-        #Format HA to hh mm ss
-        (HA_hours,h,rest)=self.ha.partition('h')
-        (HA_min,m,rest)=rest.partition('m')
-        (HA_sec,s,rest)=rest.partition('s')
-        HA_pointing="{} {} {}".format(HA_hours, HA_min, HA_sec)
+        #Format HA to +hh mm ss
+        HA_pointing=format_sexagesimal(position.hour_angle(self.LST_float),
+                                       POINTING)
         
         
         line=("{}    {}    {}    {}    {}    {}    {}    {}    {}"